@@ -100,6 +100,28 @@ def main() -> bool:
     #     scene_pos=None,
     #     users=2,
     #     requests=2,
+    #     engine="threads",
+    #     processes=1,
+    #     rate=None,
+    #     arrival="fixed",
+    #     expected_interval=None,
+    #     store="histogram",
+    #     mix=False,
+    #     journey=False,
+    #     think_time=None,
+    #     connect_timeout=None,
+    #     read_timeout=None,
+    #     live=False,
+    #     export=None,
+    #     warmup=None,
+    #     prewarm=False,
+    #     accept_encoding=None,
+    #     history=".scenery/load_history.sqlite3",
+    #     compare=None,
+    #     request_log=None,
+    #     coordinator=None,
+    #     find_capacity=False,
+    #     step_duration=10.0,
     #     log=args.log,
     #     mode="local",
     #     )
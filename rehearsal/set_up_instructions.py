@@ -29,3 +29,8 @@ def login(django_testcase, *, user_email, password):
 def create_some_instance(django_testcase, *, some_field):
     some_instance = SomeModel(some_field=some_field)
     some_instance.save()
+
+
+def set_header(testcase, *, name, value):
+    """Send a header with all the requests of the test case"""
+    testcase.headers[name] = value
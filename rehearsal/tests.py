@@ -1,20 +1,84 @@
 """Testcases"""
 
+import argparse
+import asyncio
+import collections
+import csv
+import dataclasses
+import datetime
+import gzip
 import http
+import io
+import json
+import multiprocessing
+import os
+import random
+import signal
+import socket
+import tempfile
+import threading
 import unittest
 import typing
+import zlib
 
 from scenery.response_checker import Checker
 import scenery.manifest
 from scenery.manifest_parser import ManifestParser
-from scenery.core import MetaTest
+from scenery.core import MetaTest, TestsRunner
 from scenery.method_builder import MethodBuilder
+from scenery.load_engine import (
+    DRAIN_CHUNK_SIZE,
+    ArrivalSchedule,
+    AsyncioEngine,
+    AsyncVirtualUser,
+    Feeder,
+    StagedArrivalSchedule,
+    ThreadsEngine,
+    Watchdog,
+    build_schedule,
+    classify_error,
+    content_decoder,
+    drain_response,
+    error_result,
+    prepare_take,
+    RawResponse,
+    read_response,
+    summarize_journey,
+)
+from scenery.load_metrics import (
+    ERROR_BODY_MAX,
+    ERRORS,
+    ErrorBodies,
+    HistogramRecorder,
+    LatencyHistogram,
+    LatencySamples,
+    LiveSlot,
+    LiveStats,
+    SamplesRecorder,
+    TimeSeries,
+    Transfer,
+    WARMUP,
+    export_series,
+)
+from scenery.load_capacity import CapacityStep, capacity, next_rate
+from scenery.load_distributed import Coordinator, LoadAgent, listen, parse_address, recv_frame, send_frame
+from scenery.load_log import LogFilter, RequestLog, analyze_log, encode_binary, read_log
+from scenery.load_history import LoadHistory, RunSummary, compare, percentile_interval, summarize_run
 import rehearsal
 from rehearsal.django_project.some_app.models import SomeModel
 from scenery.set_up_handler import SetUpHandler
-from scenery.common import DjangoFrontendTestCase, get_selenium_driver
+from scenery.common import DjangoFrontendTestCase, LoadTestCase, get_selenium_driver
 
 import django.http
+import requests
+import urllib3
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+RecorderT = typing.TypeVar("RecorderT", HistogramRecorder, SamplesRecorder)
 
 
 #####################
@@ -303,6 +367,149 @@ class TestManifest(unittest.TestCase):
             }
         )
 
+    def test_undeclared_feeder(self):
+        scene = {
+            "method": "GET",
+            "url": "https://www.example.com",
+            "data": {},
+            "url_parameters": {},
+            "query_parameters": {"q": scenery.manifest.Feedable("terms:q")},
+            "directives": [{"status_code": 200}],
+        }
+        d: scenery.manifest.ManifestDict = {
+            "set_up_class": [],
+            "set_up": [],
+            "cases": {"case_id": {}},
+            "scenes": [scene],
+            "manifest_origin": "origin",
+            "ttype": None,
+            "feeders": {"users": "users.csv"},
+        }
+        with self.assertRaisesRegex(ValueError, "'terms'"):
+            scenery.manifest.Manifest.from_formatted_dict(d)
+        d["feeders"] = {"terms": "terms.csv"}
+        manifest = scenery.manifest.Manifest.from_formatted_dict(d)
+        self.assertEqual(manifest.feeders, {"terms": "terms.csv"})
+
+
+class TestLoadProfile(unittest.TestCase):
+    def test_parse_duration(self):
+        parse_duration = scenery.manifest.LoadStage.parse_duration
+        self.assertEqual(parse_duration(30), 30)
+        self.assertEqual(parse_duration("90s"), 90)
+        self.assertEqual(parse_duration("2.5m"), 150)
+        self.assertEqual(parse_duration("1h"), 3600)
+        self.assertEqual(parse_duration("500ms"), 0.5)
+        with self.assertRaises(ValueError):
+            parse_duration("5 minutes")
+        with self.assertRaises(ValueError):
+            parse_duration(0)
+
+    def test_from_dict(self):
+        profile = scenery.manifest.LoadProfile.from_dict(
+            {
+                "stages": [
+                    {"duration": "10s", "users": 10},
+                    {"duration": "1m", "users": 10},
+                    {"duration": "10s", "users": 0},
+                ]
+            }
+        )
+        self.assertEqual(profile.executor, scenery.manifest.LoadExecutor.USERS)
+        self.assertEqual(profile.duration, 80)
+        self.assertEqual(profile.users, 10)
+
+        profile = scenery.manifest.LoadProfile.from_dict(
+            {"users": 50, "stages": [{"duration": 10, "rps": 100.5}]}
+        )
+        self.assertEqual(profile.executor, scenery.manifest.LoadExecutor.RPS)
+        self.assertEqual(profile.users, 50)
+
+        with self.subTest("mixed targets"):
+            with self.assertRaises(ValueError):
+                scenery.manifest.LoadProfile.from_dict(
+                    {"stages": [{"duration": 10, "users": 1}, {"duration": 10, "rps": 1}]}
+                )
+        with self.subTest("several targets"):
+            with self.assertRaises(ValueError):
+                scenery.manifest.LoadProfile.from_dict({"stages": [{"duration": 10, "users": 1, "rps": 1}]})
+        with self.subTest("no stages"):
+            with self.assertRaises(ValueError):
+                scenery.manifest.LoadProfile.from_dict({"users": 10})
+
+    def test_target_at(self):
+        profile = scenery.manifest.LoadProfile.from_dict(
+            {
+                "stages": [
+                    {"duration": 10, "users": 10},
+                    {"duration": 10, "users": 10},
+                    {"duration": 10, "users": 0},
+                ]
+            }
+        )
+        self.assertEqual(profile.target_at(0), 0)
+        self.assertEqual(profile.target_at(5), 5)
+        self.assertEqual(profile.target_at(15), 10)
+        self.assertEqual(profile.target_at(25), 5)
+        self.assertEqual(profile.target_at(30), 0)
+
+
+class TestSLO(unittest.TestCase):
+    def test_from_dict(self):
+        slo = scenery.manifest.SLO.from_dict({"p95": 300, "p99.9": 1000, "max_error_rate": 1, "min_throughput": 50})
+        self.assertEqual(slo.percentiles, {95: 300, 99.9: 1000})
+        self.assertEqual(slo.max_error_rate, 1)
+        self.assertEqual(slo.min_throughput, 50)
+
+        with self.assertRaises(ValueError):
+            scenery.manifest.SLO.from_dict({"p100": 300})
+        with self.assertRaises(ValueError):
+            scenery.manifest.SLO.from_dict({"max_latency": 300})
+        with self.assertRaises(ValueError):
+            scenery.manifest.SLO.from_dict({"p95": "fast"})
+
+    def test_from_steps(self):
+        steps = [
+            scenery.manifest.SLO({95: 300, 99: 1000}, max_error_rate=1, min_throughput=50),
+            scenery.manifest.SLO({95: 200}, max_error_rate=2),
+        ]
+        self.assertEqual(scenery.manifest.SLO.from_steps(steps), scenery.manifest.SLO({95: 500}, max_error_rate=3))
+        default = scenery.manifest.DEFAULT_SLO
+        self.assertEqual(scenery.manifest.SLO.from_steps([default] * 3), scenery.manifest.SLO({95: 1500, 99: 15000}))
+
+    def test_scene(self):
+        scene = scenery.manifest.Scene.from_dict(
+            {
+                "method": "GET",
+                "url": "https://www.example.com",
+                "directives": [],
+                "slo": {"p95": 300},
+            }
+        )
+        self.assertEqual(scene.slo, scenery.manifest.SLO({95: 300}))
+        self.assertEqual(scene.shoot(scenery.manifest.Case("a", {})).slo, scene.slo)
+
+    def test_weight(self):
+        d = {"method": "GET", "url": "https://www.example.com", "directives": []}
+        scene = scenery.manifest.Scene.from_dict(d | {"weight": 2.5})
+        self.assertEqual(scene.shoot(scenery.manifest.Case("a", {})).weight, 2.5)
+        with self.assertRaises(ValueError):
+            scenery.manifest.Scene.from_dict(d | {"weight": 0})
+
+
+class TestAbortPolicy(unittest.TestCase):
+    def test_from_dict(self):
+        policy = scenery.manifest.AbortPolicy.from_dict({"for": "30s", "p99": 2000, "max_error_rate": 50})
+        self.assertEqual(policy, scenery.manifest.AbortPolicy(30, {99: 2000}, 50))
+        self.assertEqual(scenery.manifest.AbortPolicy.from_dict({"max_error_rate": 5}).duration, 10)
+
+        with self.assertRaises(ValueError):
+            scenery.manifest.AbortPolicy.from_dict({"for": "30s"})
+        with self.assertRaises(ValueError):
+            scenery.manifest.AbortPolicy.from_dict({"p99": 2000, "max_latency": 300})
+        with self.assertRaises(ValueError):
+            scenery.manifest.AbortPolicy.from_dict({"max_error_rate": -1})
+
 
 class TestCheck(unittest.TestCase):
     def test(self):
@@ -343,6 +550,33 @@ class TestTake(unittest.TestCase):
         )
         self.assertEqual(take.method, http.HTTPMethod.GET)
 
+    def test_feed(self):
+        take = scenery.manifest.Take(
+            http.HTTPMethod.POST,
+            "https://www.example.com",
+            [],
+            {"email": scenery.manifest.Feedable("users:email"), "items": [scenery.manifest.Feedable("terms")]},
+            {},
+            {},
+        )
+        records = {"users": {"email": "a@example.com"}, "terms": {"q": "b"}}
+        fed = take.feed(records)
+        self.assertEqual(fed.data, {"email": "a@example.com", "items": [{"q": "b"}]})
+        self.assertEqual(fed.url, take.url)
+        self.assertIsInstance(take.data["email"], scenery.manifest.Feedable)
+        with self.assertRaises(ValueError):
+            scenery.manifest.Feedable("users:email:x")
+        with self.assertRaises(ValueError):
+            scenery.manifest.Feedable("users1")
+
+        take = scenery.manifest.Take(
+            http.HTTPMethod.GET, "https://www.example.com/search", [], {}, {"q": scenery.manifest.Feedable("terms:q")}, {}
+        )
+        self.assertEqual(take.url, "https://www.example.com/search?q={terms:q}")
+        fed = take.feed({"terms": {"q": "a b"}})
+        self.assertEqual(fed.url, "https://www.example.com/search?q=a+b")
+        self.assertEqual(fed.endpoint, take.endpoint)
+
 
 #################
 # MANIFEST PARSER
@@ -422,7 +656,11 @@ class TestManifestParser(unittest.TestCase):
                 # "set_up_test_data": [],
                 "set_up": [],
                 "set_up_class": [],
-                "ttype": None
+                "ttype": None,
+                "load": None,
+                "set_up_user": [],
+                "feeders": {},
+                "abort": None,
             },
         )
         d = {
@@ -444,7 +682,11 @@ class TestManifestParser(unittest.TestCase):
                 # "set_up_test_data": ["a", "b"],
                 "set_up": ["c", "d"],
                 "set_up_class": [],
-                "ttype": None
+                "ttype": None,
+                "load": None,
+                "set_up_user": [],
+                "feeders": {},
+                "abort": None,
             },
         )
 
@@ -523,6 +765,15 @@ class TestManifestParser(unittest.TestCase):
         with self.assertRaises(ValueError):
             ManifestParser.parse_dict(d)
 
+        load = {"stages": [{"duration": "1m", "users": 10}]}
+        d = {
+            "scene": {"method": "GET", "url": "https://www.example.com", "directives": []},
+            "manifest_origin": "origin",
+            "load": load,
+        }
+        manifest = ManifestParser.parse_dict(d)
+        self.assertEqual(manifest.load, scenery.manifest.LoadProfile.from_dict(load))
+
     def test_validate_yaml(self):
         # success
         manifest = {
@@ -532,6 +783,12 @@ class TestManifestParser(unittest.TestCase):
         }
         ManifestParser.validate_yaml(manifest)
 
+    def test_read_manifest_yaml_feed(self):
+        manifest = ManifestParser.read_manifest_yaml(
+            'feeders:\n  users: users.csv\nscene:\n  data:\n    email: !feed "users:email"\n'
+        )
+        self.assertEqual(manifest["scene"]["data"]["email"], scenery.manifest.Feedable("users:email"))
+
 
 #################
 # CHECKER
@@ -857,6 +1114,916 @@ class TestMethodBuilder(rehearsal.TestCaseOfBackendDjangoTestCase):
         self.assertTestPasses(self.django_testcase("test_2"))
 
 
+###############
+# LOAD ENGINE
+###############
+
+
+class TestLoadEngine(unittest.TestCase):
+    def read_response(self, raw: bytes) -> RawResponse:
+        async def read() -> RawResponse:
+            reader = asyncio.StreamReader()
+            reader.feed_data(raw)
+            reader.feed_eof()
+            return await read_response(reader)
+
+        return asyncio.run(read())
+
+    def test_read_response(self):
+        with self.subTest("content length"):
+            raw = b"HTTP/1.1 200 OK\r\nContent-Length: 5\r\n\r\nhello"
+            response = self.read_response(raw)
+            self.assertEqual(response[:2], (200, True))
+            self.assertEqual((response.body.size, response.body.head, response.body.decoded_size), (5, b"", None))
+
+        with self.subTest("chunked"):
+            raw = b"HTTP/1.1 404 Not Found\r\nTransfer-Encoding: chunked\r\n\r\n5\r\nhello\r\n1\r\n!\r\n0\r\n\r\n"
+            response = self.read_response(raw)
+            self.assertEqual(response[:2], (404, True))
+            self.assertEqual((response.body.size, response.body.head), (6, b"hello!"))
+
+        with self.subTest("gzip"):
+            body = gzip.compress(b"hello" * 1000)
+            raw = b"HTTP/1.1 200 OK\r\nContent-Encoding: gzip\r\nContent-Length: %d\r\n\r\n%s" % (len(body), body)
+            response = self.read_response(raw)
+            self.assertEqual((response.body.size, response.body.decoded_size), (len(body), 5000))
+
+        with self.subTest("large error body"):
+            raw = b"HTTP/1.1 500 Internal Server Error\r\nContent-Length: 200000\r\n\r\n" + b"x" * 200000
+            response = self.read_response(raw)
+            self.assertEqual((response.body.size, len(response.body.head)), (200000, ERROR_BODY_MAX))
+
+        with self.subTest("truncated"):
+            with self.assertRaises(asyncio.IncompleteReadError):
+                self.read_response(b"HTTP/1.1 200 OK\r\nContent-Length: 10\r\n\r\nhello")
+
+        with self.subTest("connection close"):
+            raw = b"HTTP/1.1 200 OK\r\nConnection: close\r\nContent-Length: 0\r\n\r\n"
+            self.assertEqual(self.read_response(raw)[:2], (200, False))
+
+        with self.subTest("until eof"):
+            raw = b"HTTP/1.0 200 OK\r\n\r\nhello"
+            response = self.read_response(raw)
+            self.assertEqual(response[:2], (200, False))
+            self.assertEqual(response.body.size, 5)
+
+        with self.subTest("headers"):
+            raw = b"HTTP/1.1 200 OK\r\nSet-Cookie: a=1\r\nSet-Cookie: b=2; Path=/\r\nContent-Length: 0\r\n\r\n"
+            response = self.read_response(raw)
+            self.assertEqual(
+                response.headers,
+                [("set-cookie", "a=1"), ("set-cookie", "b=2; Path=/"), ("content-length", "0")],
+            )
+
+        with self.subTest("closed"):
+            with self.assertRaises(ConnectionResetError):
+                self.read_response(b"")
+
+    def test_drain_response(self):
+        response = requests.Response()
+        response.raw = urllib3.HTTPResponse(io.BytesIO(b"x" * 200000), preload_content=False)
+        body = drain_response(response, keep=10)
+        self.assertEqual((body.size, body.head, body.decoded_size), (200000, b"x" * 10, None))
+
+        compressed = gzip.compress(b"error " * 1000)
+        response.headers["Content-Encoding"] = "gzip"
+        response.raw = urllib3.HTTPResponse(io.BytesIO(compressed), preload_content=False)
+        body = drain_response(response, keep=5)
+        self.assertEqual((body.size, body.decoded_size, body.head), (len(compressed), 6000, b"error"))
+
+        response.raw = urllib3.HTTPResponse(io.BytesIO(b"not gzip"), preload_content=False)
+        body = drain_response(response)
+        self.assertEqual((body.size, body.decoded_size), (8, None))
+
+    def test_content_decoder(self):
+        decompress = content_decoder("GZIP")
+        assert decompress is not None
+        self.assertEqual(b"".join(decompress(gzip.compress(b"hello"))), b"hello")
+        decompress = content_decoder("deflate")
+        assert decompress is not None
+        self.assertEqual(b"".join(decompress(zlib.compress(b"hello"))), b"hello")
+        self.assertIsNone(content_decoder("compress"))
+
+        # NOTE mad: a few KB inflating to 10MB are decoded by bounded pieces
+        decompress = content_decoder("gzip")
+        assert decompress is not None
+        pieces = [len(piece) for piece in decompress(gzip.compress(bytes(10_000_000)))]
+        self.assertEqual(sum(pieces), 10_000_000)
+        self.assertLessEqual(max(pieces), DRAIN_CHUNK_SIZE)
+
+    @unittest.skipIf(brotli is None, "brotli is not installed")
+    def test_brotli_decoder(self):
+        decompress = content_decoder("br")
+        assert decompress is not None
+        pieces = [len(piece) for piece in decompress(brotli.compress(bytes(10_000_000)))]
+        self.assertEqual(sum(pieces), 10_000_000)
+
+    def test_virtual_user_cookies(self):
+        user = AsyncVirtualUser("http://localhost:8000", {"sessionid": "x"})
+        self.assertEqual(user.cookie_header(), b"Cookie: sessionid=x\r\n")
+        user.update_cookies([("set-cookie", "csrftoken=y; Path=/"), ("content-length", "0")])
+        self.assertEqual(user.cookies, {"sessionid": "x", "csrftoken": "y"})
+        self.assertEqual(AsyncVirtualUser("http://localhost:8000", {}).cookie_header(), b"")
+
+    def test_pick(self):
+        takes = [
+            scenery.manifest.Take(http.HTTPMethod.GET, "https://www.example.com/a", [], {}, {}, {}, weight=3),
+            scenery.manifest.Take(http.HTTPMethod.GET, "https://www.example.com/b", [], {}, {}, {}),
+        ]
+        self.assertEqual(takes[0].endpoint, "GET https://www.example.com/a")
+
+        engine = ThreadsEngine(LoadTestCase(), takes)
+        random.seed(0)
+        picks = collections.Counter(engine.pick() for _ in range(4000))
+        self.assertAlmostEqual(picks[0] / 4000, 0.75, delta=0.05)
+
+        engine = ThreadsEngine(LoadTestCase(), takes[1:])
+        self.assertEqual({engine.pick() for _ in range(10)}, {0})
+
+    def test_feeder(self):
+        with tempfile.TemporaryDirectory() as folder:
+            csv_path = os.path.join(folder, "users.csv")
+            with open(csv_path, "w") as f:
+                f.write("email,password\na,1\nb,2\nc,3\n")
+            feeder = Feeder(csv_path)
+            self.assertEqual([feeder.next()["email"] for _ in range(4)], ["a", "b", "c", "a"])
+            feeder = Feeder(csv_path, processes=2, index=1)
+            self.assertEqual([feeder.next()["email"] for _ in range(2)], ["b", "b"])
+            with self.assertRaises(ValueError):
+                Feeder(csv_path, processes=4, index=3).next()
+
+            jsonl_path = os.path.join(folder, "terms.jsonl")
+            with open(jsonl_path, "w") as f:
+                f.write('{"q": "x"}\n\n{"q": "y"}\n')
+            feeder = Feeder(jsonl_path)
+            self.assertEqual([feeder.next() for _ in range(3)], [{"q": "x"}, {"q": "y"}, {"q": "x"}])
+
+            with self.assertRaises(ValueError):
+                Feeder(os.path.join(folder, "users.txt"))
+
+    def test_set_up_user(self):
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, "users.csv")
+            with open(path, "w") as f:
+                f.write("email\na\nb\n")
+            testcase = LoadTestCase()
+            testcase.session, testcase.headers = requests.Session(), {"Accept": "text/html"}
+            testcase.feeders = {"users": path}
+            testcase.set_up_user = [
+                scenery.manifest.SetUpInstruction(
+                    "set_header", {"name": "X-User", "value": scenery.manifest.Feedable("users:email")}
+                )
+            ]
+            take = scenery.manifest.Take(
+                http.HTTPMethod.GET, "https://www.example.com", [], {"email": scenery.manifest.Feedable("users:email")}, {}, {}
+            )
+            engine = ThreadsEngine(testcase, [take])
+
+            users = [engine.set_up_user() for _ in range(2)]
+            self.assertEqual([user.headers["X-User"] for user in users], ["a", "b"])
+            self.assertEqual(testcase.headers, {"Accept": "text/html"})
+            self.assertEqual(engine.user_takes(users[1].records)[0].data, {"email": "b"})
+
+    def test_watchdog(self):
+        def observe(watchdog: Watchdog, results: list[tuple[float, int]]) -> str | None:
+            # NOTE mad: pretend the run and the last check are old enough
+            watchdog.start -= 60
+            for elapsed_time, success in results:
+                watchdog.checked -= 60
+                watchdog.observe({"elapsed_time": elapsed_time, "success": success})
+            return watchdog.reason
+
+        policy = scenery.manifest.AbortPolicy(10, {99: 100}, 50, min_requests=4)
+
+        with self.subTest("within limits"):
+            self.assertIsNone(observe(Watchdog(policy), [(0.01, 1)] * 3 + [(0.01, 0)]))
+
+        with self.subTest("too few requests"):
+            self.assertIsNone(observe(Watchdog(policy), [(0.01, 0)] * 3))
+
+        with self.subTest("error rate"):
+            watchdog = Watchdog(policy)
+            reason = observe(watchdog, [(0.01, 1)] + [(0.01, 0)] * 3)
+            self.assertEqual(reason, "error rate 75.00% > 50% over the last 10s")
+            self.assertTrue(watchdog.tripped)
+
+        with self.subTest("percentile"):
+            reason = observe(Watchdog(policy), [(0.01, 1)] * 3 + [(0.2, 1)])
+            self.assertEqual(reason, "p99 200.00ms > 100ms over the last 10s")
+
+        with self.subTest("without policy"):
+            self.assertIsNone(observe(Watchdog(None), [(0.01, 0)] * 4))
+
+    def test_warmup(self):
+        take = scenery.manifest.Take(http.HTTPMethod.GET, "https://www.example.com", [], {}, {}, {})
+        result = {"timestamp": 0.0, "elapsed_time": 0.01, "status_code": 200, "success": 1}
+
+        testcase = LoadTestCase()
+        testcase.data = collections.defaultdict(HistogramRecorder)
+        testcase.warmup_requests, testcase.processes = 3, 2
+        engine = ThreadsEngine(testcase, [take])
+        self.assertEqual([engine.warming_up() for _ in range(3)], [True, True, False])
+        engine.record(take.endpoint, result, warmup=True)
+        engine.record(take.endpoint, result)
+        self.assertEqual({endpoint: len(recorder) for endpoint, recorder in testcase.data.items()}, {take.endpoint + WARMUP: 1, take.endpoint: 1})
+
+        testcase = LoadTestCase()
+        testcase.warmup_duration = 60
+        self.assertTrue(ThreadsEngine(testcase, [take]).warming_up())
+        self.assertFalse(ThreadsEngine(LoadTestCase(), [take]).warming_up())
+
+    def test_classify_error(self):
+        pool = urllib3.HTTPConnectionPool("localhost")
+        refused = urllib3.exceptions.NewConnectionError(
+            urllib3.connection.HTTPConnection("localhost"), "Failed to establish a new connection"
+        )
+        refused.__cause__ = ConnectionRefusedError(111, "Connection refused")
+        connection_error = requests.exceptions.ConnectionError(urllib3.exceptions.MaxRetryError(pool, "/", refused))
+        self.assertEqual(classify_error(connection_error), "refused")
+
+        timeout = requests.exceptions.ReadTimeout(urllib3.exceptions.ReadTimeoutError(pool, "/", "Read timed out."))
+        self.assertEqual(classify_error(timeout), "timeout")
+        self.assertEqual(classify_error(TimeoutError()), "timeout")
+
+        reset = urllib3.exceptions.ProtocolError("Connection aborted.", ConnectionResetError(104, "reset"))
+        self.assertEqual(classify_error(requests.exceptions.ConnectionError(reset)), "reset")
+        self.assertEqual(classify_error(asyncio.IncompleteReadError(b"", 10)), "reset")
+
+        self.assertEqual(classify_error(socket.gaierror(-2, "Name or service not known")), "dns")
+        self.assertEqual(classify_error(requests.exceptions.SSLError("certificate verify failed")), "tls")
+        self.assertEqual(classify_error(OSError("unreachable")), "other")
+
+        result = error_result(10.0, 0, ConnectionRefusedError(), intended=0.5)
+        self.assertEqual((result["status_code"], result["success"]), (0, False))
+        self.assertEqual(ERRORS[int(result["error"])], "refused")
+        self.assertEqual(summarize_journey([result])["error"], result["error"])
+
+    def test_summarize_journey(self):
+        steps = [
+            {"timestamp": 10.0, "elapsed_time": 0.1, "status_code": 200, "success": True, "send_delay": 0.5},
+            {"timestamp": 10.3, "elapsed_time": 0.2, "status_code": 403, "success": False},
+        ]
+        journey = summarize_journey(steps)
+        self.assertEqual(journey["timestamp"], 10.0)
+        self.assertAlmostEqual(journey["elapsed_time"], 0.3)
+        self.assertEqual(journey["status_code"], 403)
+        self.assertFalse(journey["success"])
+        self.assertEqual(journey["send_delay"], 0.5)
+        self.assertNotIn("client_cpu", journey)
+        self.assertTrue(summarize_journey(steps[:1])["success"])
+
+        steps[0]["client_cpu"], steps[1]["client_cpu"] = 0.001, 0.002
+        self.assertAlmostEqual(summarize_journey(steps)["client_cpu"], 0.003)
+
+    def test_prepare_take(self):
+        session = requests.Session()
+        session.headers.update({"X-Session": "1"})
+        session.cookies.set("sessionid", "x")
+        take = scenery.manifest.Take(http.HTTPMethod.POST, "http://localhost:8000/items", [], {"name": "a b"}, {}, {})
+
+        prepared = prepare_take(session, "", take, {"Accept": "text/html"})
+        self.assertEqual(prepared.url, "http://localhost:8000/items")
+        self.assertEqual(prepared.body, "name=a+b")
+        self.assertEqual(prepared.headers["Content-Length"], "8")
+        self.assertEqual((prepared.headers["X-Session"], prepared.headers["Accept"]), ("1", "text/html"))
+        self.assertNotIn("Cookie", prepared.headers)
+
+        session.cookies.set("csrftoken", "y")
+        request = prepared.copy()
+        request.prepare_cookies(session.cookies)
+        self.assertEqual(request.headers["Cookie"], "sessionid=x; csrftoken=y")
+        self.assertNotIn("Cookie", prepared.headers)
+
+        with self.assertRaises(NotImplementedError):
+            prepare_take(session, "", scenery.manifest.Take(http.HTTPMethod.PUT, "http://localhost:8000/items", [], {}, {}, {}), {})
+
+    def test_share_client_cpu(self):
+        takes = [
+            scenery.manifest.Take(http.HTTPMethod.GET, "https://www.example.com/a", [], {}, {}, {}),
+            scenery.manifest.Take(http.HTTPMethod.GET, "https://www.example.com/b", [], {}, {}, {}),
+        ]
+        result = {"timestamp": 0.0, "elapsed_time": 0.01, "status_code": 200, "success": 1}
+        testcase = LoadTestCase()
+        testcase.data = collections.defaultdict(HistogramRecorder)
+        testcase.base_url, testcase.headers = "https://www.example.com", {}
+        for key in [takes[0].endpoint] * 3 + [takes[1].endpoint, takes[1].endpoint + WARMUP]:
+            testcase.data[key].record(result)
+
+        AsyncioEngine(testcase, takes, journey="journey").share_client_cpu(1.0)
+        self.assertAlmostEqual(testcase.data[takes[0].endpoint].client_cpu, 0.6)
+        self.assertAlmostEqual(testcase.data[takes[1].endpoint].client_cpu, 0.2)
+        self.assertAlmostEqual(testcase.data["journey"].client_cpu, 0.8)
+        self.assertAlmostEqual(testcase.data["journey" + WARMUP].client_cpu, 0.2)
+
+    def test_staged_arrival_schedule(self):
+        profile = scenery.manifest.LoadProfile.from_dict(
+            {"stages": [{"duration": 10, "rps": 10}, {"duration": 10, "rps": 10}]}
+        )
+        def offset_of(schedule: StagedArrivalSchedule, arrivals: float) -> float:
+            offset = schedule.offset_of(arrivals)
+            assert offset is not None
+            return offset
+
+        schedule = StagedArrivalSchedule(profile)
+        # NOTE mad: 50 requests are expected during the ramp-up, reaching 10 rps
+        self.assertEqual(schedule.offset_of(0), 0)
+        self.assertAlmostEqual(offset_of(schedule, 50), 10)
+        self.assertAlmostEqual(offset_of(schedule, 12.5), 5)
+        self.assertAlmostEqual(offset_of(schedule, 60), 11)
+        self.assertIsNone(schedule.offset_of(150))
+
+        schedule = StagedArrivalSchedule(profile, scale=0.5)
+        self.assertAlmostEqual(offset_of(schedule, 25), 10)
+
+    def test_arrival_schedule(self):
+        schedule = ArrivalSchedule(rate=10, total=3)
+        intended = [schedule.next(), schedule.next(), schedule.next()]
+        self.assertIsNone(schedule.next())
+        first, second, third = typing.cast(list[float], intended)
+        self.assertAlmostEqual(second - first, 0.1)
+        self.assertAlmostEqual(third - first, 0.2)
+
+        schedule = ArrivalSchedule(rate=10, total=100, arrival="poisson")
+        intended = [schedule.next() for _ in range(100)]
+        self.assertEqual(intended, sorted(intended))
+
+        with self.assertRaises(ValueError):
+            ArrivalSchedule(rate=0, total=1)
+
+    def test_build_schedule(self):
+        testcase = LoadTestCase()
+        testcase.users, testcase.requests_per_user = 2, 5
+        self.assertIsNone(build_schedule(testcase))
+
+        # NOTE mad: --rate is the total rate, each of the processes sends its share
+        testcase.rate, testcase.processes = 30, 3
+        schedule = build_schedule(testcase)
+        assert isinstance(schedule, ArrivalSchedule)
+        self.assertEqual((schedule.rate, schedule.remaining), (10, 10))
+
+        testcase.load_profile = scenery.manifest.LoadProfile.from_dict({"stages": [{"duration": 10, "rps": 30}]})
+        staged = build_schedule(testcase)
+        assert isinstance(staged, StagedArrivalSchedule)
+        self.assertEqual(staged.offset_of(12.5), 5)
+
+
+################
+# LOAD METRICS
+################
+
+
+class TestLoadMetrics(unittest.TestCase):
+    def test_latency_samples(self):
+        samples = LatencySamples([3.0])
+        self.assertEqual(samples.percentiles(), {50: 3.0, 90: 3.0, 95: 3.0, 99: 3.0})
+        samples = LatencySamples(float(i) for i in range(1, 101))
+        self.assertEqual(samples.percentiles([50, 90]), {50: 50.0, 90: 90.0})
+        self.assertEqual(samples.histogram([0, 10, 50, float("inf")]), [9, 40, 51])
+
+        with self.subTest("corrected"):
+            samples = LatencySamples([1.0, 4.5])
+            self.assertEqual(sorted(samples.corrected(1.0).values), [1.0, 1.5, 2.5, 3.5, 4.5])
+            self.assertEqual(sorted(samples.corrected(0).values), [1.0, 4.5])
+
+    def test_samples_recorder(self):
+        recorder = SamplesRecorder()
+        recorder.record({"elapsed_time": 0.1, "status_code": 200, "success": True})
+        recorder.record({"elapsed_time": 0.3, "status_code": 500, "success": False})
+
+        other = SamplesRecorder()
+        other.record({"elapsed_time": 0.2, "status_code": 200, "success": True})
+        recorder.merge(other)
+
+        self.assertEqual(len(recorder), 3)
+        self.assertEqual(list(recorder.successes.values), [0.1, 0.2])
+        self.assertEqual(recorder.failures_status_codes, {500: 1})
+
+        with self.subTest("phases"):
+            recorder = SamplesRecorder()
+            phases = {"connect_time": 0.01, "ttfb": 0.05, "download_time": 0.02}
+            recorder.record({"elapsed_time": 0.1, "status_code": 200, "success": True, "new_connection": True, **phases})
+            recorder.record({"elapsed_time": 0.1, "status_code": 200, "success": True, "new_connection": False, **phases})
+            recorder.record({"elapsed_time": 0.1, "status_code": 500, "success": False, "new_connection": True, **phases})
+            self.assertEqual(recorder.phases["connect_time"].count, 1)
+            self.assertEqual(recorder.phases["ttfb"].count, 2)
+            self.assertEqual(recorder.phases["download_time"].max, 0.02)
+
+        with self.subTest("throughput"):
+            recorder = SamplesRecorder()
+            recorder.record({"timestamp": 10.0, "elapsed_time": 0.5, "status_code": 200, "success": True})
+            recorder.record({"timestamp": 11.0, "elapsed_time": 1.0, "status_code": 200, "success": True})
+            recorder.record({"timestamp": 12.0, "elapsed_time": 2.0, "status_code": 500, "success": False})
+            self.assertEqual(recorder.duration, 4.0)
+            self.assertEqual(recorder.throughput, 0.5)
+
+        with self.subTest("errors"):
+            recorder = SamplesRecorder()
+            recorder.record({"elapsed_time": 0.1, "status_code": 404, "success": False})
+            recorder.record({"elapsed_time": 5.0, "status_code": 0, "success": False, "error": ERRORS.index("timeout")})
+            self.assertEqual(len(recorder), 2)
+            self.assertEqual(recorder.failures_status_codes, {404: 1})
+            self.assertEqual(recorder.errors, {"timeout": 1})
+
+        with self.subTest("send delay"):
+            recorder = SamplesRecorder()
+            recorder.record({"elapsed_time": 1.0, "status_code": 200, "success": True, "send_delay": 2.0})
+            recorder.record({"elapsed_time": 0.5, "status_code": 200, "success": True})
+            # NOTE mad: the model of the run decides, not whether the first sample has a send delay
+            self.assertEqual(list(recorder.corrected(1.0).values), [1.0, 0.5])
+            recorder.open_model = True
+            self.assertEqual(list(recorder.corrected(1.0).values), [3.0, 0.5])
+
+    def test_latency_histogram(self):
+        histogram = LatencyHistogram()
+        for i in range(1, 1001):
+            histogram.record(i / 1000)
+
+        self.assertEqual(histogram.count, 1000)
+        self.assertEqual(histogram.min, 0.001)
+        self.assertEqual(histogram.max, 1.0)
+        for p, expected in {50: 0.5, 90: 0.9, 99: 0.99}.items():
+            self.assertAlmostEqual(histogram.percentile(p), expected, delta=expected / LatencyHistogram.SUB_BUCKETS)
+        self.assertEqual(histogram.count_between(0, 0.1), 99)
+
+        with self.subTest("merge"):
+            other = LatencyHistogram()
+            other.record(5.0, count=1000)
+            histogram.merge(other)
+            self.assertEqual(histogram.count, 2000)
+            self.assertEqual(histogram.max, 5.0)
+            self.assertAlmostEqual(histogram.percentile(75), 5.0, delta=5.0 / LatencyHistogram.SUB_BUCKETS)
+
+        with self.subTest("corrected"):
+            histogram = LatencyHistogram()
+            histogram.record(1.0)
+            histogram.record(4.5)
+            corrected = histogram.corrected(1.0)
+            self.assertEqual(corrected.count, 5)
+            self.assertAlmostEqual(corrected.percentile(50), 2.5, delta=2.5 / LatencyHistogram.SUB_BUCKETS)
+
+    def test_histogram_recorder(self):
+        recorder = HistogramRecorder()
+        recorder.record({"elapsed_time": 0.1, "status_code": 200, "success": True})
+        recorder.record({"elapsed_time": 0.2, "status_code": 201, "success": True})
+        recorder.record({"elapsed_time": 0.3, "status_code": 500, "success": False})
+        recorder.record({"elapsed_time": 0.3, "status_code": 404, "success": False})
+
+        self.assertEqual(len(recorder), 4)
+        self.assertEqual(recorder.successes.count, 2)
+        self.assertEqual(set(recorder.histograms), {"2xx", "4xx", "5xx"})
+        self.assertEqual(recorder.failures_status_codes, {500: 1, 404: 1})
+
+        self.assertEqual(recorder.corrected(0.1).count, 3)
+
+        other = HistogramRecorder()
+        other.open_model = True
+        other.record({"elapsed_time": 0.1, "status_code": 200, "success": True, "send_delay": 1.0, "new_connection": True})
+        other.record({"elapsed_time": 0.1, "status_code": 200, "success": True, "send_delay": 1.0, "new_connection": False})
+        recorder.merge(other)
+        self.assertEqual(len(recorder), 6)
+        self.assertTrue(recorder.open_model)
+        self.assertEqual(recorder.corrected(0.1).count, 4)
+        self.assertAlmostEqual(recorder.corrected(0.1).max, 1.1, delta=1.1 / LatencyHistogram.SUB_BUCKETS)
+        self.assertEqual(recorder.connections, {"new": 1, "reused": 1})
+
+        with self.subTest("throughput"):
+            recorder = HistogramRecorder()
+            recorder.record({"timestamp": 10.0, "elapsed_time": 0.5, "status_code": 200, "success": True})
+            recorder.record({"timestamp": 11.0, "elapsed_time": 1.0, "status_code": 200, "success": True})
+            other = HistogramRecorder()
+            other.record({"timestamp": 12.0, "elapsed_time": 2.0, "status_code": 500, "success": False})
+            recorder.merge(other)
+            self.assertEqual(recorder.duration, 4.0)
+            self.assertEqual(recorder.throughput, 0.5)
+
+        with self.subTest("phases"):
+            recorder = HistogramRecorder()
+            phases = {"connect_time": 0.01, "ttfb": 0.05, "download_time": 0.02}
+            recorder.record({"elapsed_time": 0.1, "status_code": 200, "success": True, "new_connection": True, **phases})
+            recorder.record({"elapsed_time": 0.1, "status_code": 200, "success": True, "new_connection": False, **phases})
+            recorder.record({"elapsed_time": 0.1, "status_code": 500, "success": False, "new_connection": True, **phases})
+            self.assertEqual(recorder.phases["connect_time"].count, 1)
+            self.assertEqual(recorder.phases["ttfb"].count, 2)
+            self.assertAlmostEqual(recorder.phases["download_time"].percentile(50), 0.02, places=3)
+
+        with self.subTest("errors"):
+            recorder = HistogramRecorder()
+            recorder.record({"elapsed_time": 0.1, "status_code": 404, "success": False})
+            recorder.record({"elapsed_time": 5.0, "status_code": 0, "success": False, "error": ERRORS.index("timeout")})
+            other = HistogramRecorder()
+            other.record({"elapsed_time": 0.1, "status_code": 0, "success": False, "error": ERRORS.index("refused")})
+            recorder.merge(other)
+            self.assertEqual(len(recorder), 3)
+            self.assertEqual(recorder.failures_status_codes, {404: 1})
+            self.assertEqual(recorder.errors, {"timeout": 1, "refused": 1})
+
+    def test_error_bodies(self):
+        random.seed(0)
+        sample = ErrorBodies(size=3)
+        for i in range(1000):
+            sample.offer(500, str(i).encode())
+        self.assertEqual(sample.seen, 1000)
+        self.assertEqual(len(sample.bodies), 3)
+        # NOTE mad: the first bodies are kept with a probability of 3 out of 1000
+        self.assertGreater(min(int(body) for _, body in sample.bodies), 10)
+
+        other = ErrorBodies(size=3)
+        other.offer(404, b"not found")
+        sample.merge(other)
+        self.assertEqual((sample.seen, len(sample.bodies)), (1001, 3))
+
+        empty = ErrorBodies(size=3)
+        empty.merge(other)
+        self.assertEqual((empty.seen, empty.bodies), (1, [(404, b"not found")]))
+
+        recorder = HistogramRecorder()
+        recorder.error_bodies.offer(503, b"unavailable")
+        merged = SamplesRecorder()
+        merged.merge(SamplesRecorder())
+        self.assertEqual(merged.error_bodies.seen, 0)
+        other_recorder = HistogramRecorder()
+        other_recorder.merge(recorder)
+        self.assertEqual(other_recorder.error_bodies.bodies, [(503, b"unavailable")])
+
+    def test_transfer(self):
+        results = [
+            {"elapsed_time": 0.1, "status_code": 200, "success": True, "response_size": 1000, "decoded_size": 4000},
+            {"elapsed_time": 0.1, "status_code": 200, "success": True, "response_size": 3000},
+            {"elapsed_time": 0.1, "status_code": 0, "success": False, "error": 0},
+        ]
+        def merged(recorder: RecorderT, other: RecorderT) -> RecorderT:
+            for result in results[:2]:
+                recorder.record(result)
+            other.record(results[2])
+            recorder.merge(other)
+            return recorder
+
+        for recorder in (
+            merged(HistogramRecorder(), HistogramRecorder()),
+            merged(SamplesRecorder(), SamplesRecorder()),
+        ):
+            with self.subTest(type(recorder).__name__):
+                self.assertEqual(recorder.transfer, Transfer(received=4000, encoded=1000, decoded=4000))
+                self.assertEqual(recorder.transfer.compression_ratio, 4.0)
+                self.assertEqual(recorder.sizes.count, 2)
+                self.assertAlmostEqual(recorder.sizes.percentile(99), 3000, delta=30)
+
+        self.assertIsNone(Transfer(received=10).compression_ratio)
+
+    def test_time_series(self):
+        series = TimeSeries()
+        series.record(100.2, 0.0005, True)
+        series.record(100.9, 0.03, False)
+        other = TimeSeries()
+        other.record(102.5, 20.0, True)
+        series.merge(other)
+
+        self.assertEqual(series.seconds, range(100, 103))
+        row = series.row(100)
+        self.assertEqual((row["requests"], row["failures"], row["lt_1ms"], row["lt_50ms"]), (2, 1, 1, 1))
+        self.assertAlmostEqual(row["mean_latency_ms"], 15.25)
+        self.assertEqual(series.row(101)["requests"], 0)
+        self.assertIsNone(series.row(101)["mean_latency_ms"])
+        self.assertEqual(series.row(102)["ge_10s"], 1)
+
+        results = [
+            {"timestamp": 100.0, "elapsed_time": 0.01, "status_code": 200, "success": 1},
+            {"timestamp": 101.5, "elapsed_time": 0.6, "status_code": 500, "success": 0},
+        ]
+        histogram_recorder, samples_recorder = HistogramRecorder(), SamplesRecorder()
+        for result in results:
+            histogram_recorder.record(result)
+            samples_recorder.record(result)
+        self.assertEqual(histogram_recorder.series.rows, samples_recorder.series.rows)
+
+        with tempfile.TemporaryDirectory() as folder:
+            csv_path = os.path.join(folder, "series.csv")
+            export_series({"GET /a": histogram_recorder}, csv_path)
+            with open(csv_path) as f:
+                rows = list(csv.DictReader(f))
+            self.assertEqual([(row["elapsed"], row["requests"], row["failures"]) for row in rows], [("0", "1", "0"), ("1", "0", "0"), ("2", "1", "1")])
+
+            jsonl_path = os.path.join(folder, "series.jsonl")
+            export_series({"GET /a": histogram_recorder}, jsonl_path)
+            with open(jsonl_path) as f:
+                rows = [json.loads(line) for line in f]
+            self.assertEqual(rows[2]["lt_1s"], 1)
+
+            with self.assertRaises(ValueError):
+                export_series({"GET /a": histogram_recorder}, os.path.join(folder, "series.txt"))
+
+    def test_live_stats(self):
+        stats = LiveStats()
+        for _ in range(3):
+            stats.start()
+        stats.record({"elapsed_time": 0.01, "success": 1})
+        stats.record({"elapsed_time": 0.02, "success": 0})
+        stats.slots.appendleft(LiveSlot(stats.slots[-1].second - 60, requests=100))
+        # NOTE mad: complete the current second, the snapshot only reads complete ones
+        stats.slots[-1].second -= 1
+
+        snapshot = stats.snapshot()
+        self.assertEqual(snapshot.in_flight, 1)
+        self.assertEqual((snapshot.rps, snapshot.requests, snapshot.failures), (2, 2, 1))
+        self.assertEqual(snapshot.error_rate, 50)
+        self.assertAlmostEqual(snapshot.successes.percentile(99), 0.01, delta=0.001)
+        self.assertEqual(stats.snapshot().in_flight, 1)
+
+        snapshot.merge(stats.snapshot())
+        self.assertEqual((snapshot.in_flight, snapshot.requests, snapshot.successes.count), (2, 4, 2))
+
+
+class TestLoadHistory(unittest.TestCase):
+    def summary(self, latency: float, count: int, duration: float, timestamp: float = 0.0, revision: str = "abc123") -> RunSummary:
+        successes = LatencyHistogram()
+        rng = random.Random(0)
+        for _ in range(count):
+            successes.record(latency * rng.uniform(0.5, 1.5))
+        return RunSummary("manifest", "GET /a", revision, timestamp, count, 0, duration, successes)
+
+    def test_histogram_bytes(self):
+        histogram = self.summary(0.1, 100, 1.0).successes
+        restored = LatencyHistogram.from_bytes(histogram.to_bytes())
+        self.assertEqual((restored.count, restored.min, restored.max), (histogram.count, histogram.min, histogram.max))
+        self.assertEqual(restored.percentile(95), histogram.percentile(95))
+
+    def test_percentile_interval(self):
+        histogram = self.summary(0.1, 1000, 1.0).successes
+        low, high = percentile_interval(histogram, 95)
+        self.assertLess(low, histogram.percentile(95))
+        self.assertGreater(high, histogram.percentile(95))
+
+    def test_compare(self):
+        baseline = self.summary(0.1, 1000, 10.0)
+        same = {comparison.metric: comparison.regression for comparison in compare(baseline, self.summary(0.1, 1000, 10.0))}
+        self.assertEqual(same, {"p95": False, "p99": False, "throughput": False})
+
+        slower = {comparison.metric: comparison for comparison in compare(baseline, self.summary(0.2, 500, 10.0))}
+        self.assertTrue(all(comparison.regression for comparison in slower.values()))
+        self.assertAlmostEqual(slower["throughput"].change, -50.0)
+
+    def test_summarize_run(self):
+        recorder = HistogramRecorder()
+        recorder.record({"timestamp": 1.0, "elapsed_time": 0.1, "status_code": 200, "success": True})
+        recorder.record({"timestamp": 2.0, "elapsed_time": 0.1, "status_code": 500, "success": False})
+        summaries = summarize_run("manifest", {"GET /a": recorder, "GET /a" + WARMUP: recorder, "GET /b": HistogramRecorder()}, "abc123", 0.0)
+        self.assertEqual([(summary.endpoint, summary.requests, summary.failures) for summary in summaries], [("GET /a", 2, 1)])
+
+    def test_history(self):
+        with tempfile.TemporaryDirectory() as folder:
+            history = LoadHistory(os.path.join(folder, "history", "load.sqlite3"))
+            history.save([self.summary(0.1, 100, 1.0, timestamp=1.0, revision="abc123")])
+            history.save([self.summary(0.2, 100, 1.0, timestamp=2.0, revision="def456+dirty")])
+            history.save([self.summary(0.3, 100, 1.0, timestamp=3.0, revision="abc123+dirty")])
+
+            latest = history.baseline("manifest", "GET /a")
+            assert latest is not None
+            self.assertEqual((latest.revision, latest.timestamp, latest.successes.count), ("abc123+dirty", 3.0, 100))
+            older = history.baseline("manifest", "GET /a", "abc123")
+            assert older is not None
+            self.assertEqual(older.revision, "abc123")
+            self.assertIsNone(history.baseline("manifest", "GET /a", "abc"))
+            self.assertIsNone(history.baseline("manifest", "GET /b"))
+            history.close()
+
+    def test_history_received_bytes(self):
+        baseline = dataclasses.replace(self.summary(0.1, 1000, 10.0), received_bytes=4_000_000)
+        current = dataclasses.replace(self.summary(0.1, 1000, 10.0), received_bytes=1_000_000)
+        size = compare(baseline, current)[-1]
+        self.assertEqual((size.metric, size.baseline, size.current, size.regression), ("size", 4.0, 1.0, False))
+        self.assertNotIn("size", [comparison.metric for comparison in compare(self.summary(0.1, 1000, 10.0), current)])
+
+        with tempfile.TemporaryDirectory() as folder:
+            history = LoadHistory(os.path.join(folder, "load.sqlite3"))
+            history.save([current])
+            restored = history.baseline("manifest", "GET /a")
+            assert restored is not None
+            self.assertEqual(restored.received_bytes, 1_000_000)
+            history.close()
+
+
+class TestLoadLog(unittest.TestCase):
+    results: list[dict[str, int | float]] = [
+        {"timestamp": 100.0, "elapsed_time": 0.25, "status_code": 200, "success": True, "new_connection": True, "connect_time": 0.125, "ttfb": 0.0625, "download_time": 0.0625, "response_size": 1200, "decoded_size": 4800},
+        {"timestamp": 110.0, "elapsed_time": 0.5, "status_code": 503, "success": False, "send_delay": 0.125, "response_size": 0},
+        {"timestamp": 130.0, "elapsed_time": 1.0, "status_code": 0, "success": False, "error": 0},
+    ]
+
+    def write(self, path: str) -> None:
+        log = RequestLog(path)
+        log.write("GET /a" + WARMUP, self.results[0])
+        log.write("GET /a", self.results[1])
+        log.write("POST /b", self.results[2])
+        log.close()
+
+    def test_read_log(self):
+        with tempfile.TemporaryDirectory() as folder:
+            for extension in (".bin", ".jsonl"):
+                path = os.path.join(folder, "requests" + extension)
+                self.write(path)
+                self.write(path)
+                records = list(read_log(path))
+                self.assertEqual([endpoint for endpoint, _ in records], ["GET /a" + WARMUP, "GET /a", "POST /b"] * 2)
+                self.assertEqual([result for _, result in records], self.results * 2)
+
+            path = os.path.join(folder, "requests.bin")
+            with open(path, "ab") as f:
+                f.write(b"truncated")
+            self.assertEqual(len(list(read_log(path))), 6)
+
+            with self.assertRaises(ValueError):
+                RequestLog(os.path.join(folder, "requests.txt"))
+
+            # NOTE mad: logs written before the header are rejected, not misread
+            path = os.path.join(folder, "headerless.bin")
+            with open(path, "wb") as f:
+                f.write(encode_binary("GET /a", self.results[0]))
+            with self.assertRaises(ValueError):
+                list(read_log(path))
+            with self.assertRaises(ValueError):
+                RequestLog(path)
+
+    def test_analyze_log(self):
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, "requests.bin")
+            self.write(path)
+
+            analysis = analyze_log(path, LogFilter())
+            self.assertEqual((analysis.records, analysis.matched), (3, 3))
+            self.assertEqual(analysis.data["POST /b"].errors, {"timeout": 1})
+
+            analysis = analyze_log(path, LogFilter(endpoints=["GET /a"]))
+            self.assertEqual(sorted(analysis.data), ["GET /a", "GET /a" + WARMUP])
+
+            analysis = analyze_log(path, LogFilter(statuses=["5xx", "timeout"]))
+            self.assertEqual(sorted(analysis.data), ["GET /a", "POST /b"])
+
+            analysis = analyze_log(path, LogFilter(since=5.0, until=datetime.datetime.fromtimestamp(120.0)))
+            self.assertEqual((analysis.matched, list(analysis.data)), (1, ["GET /a"]))
+
+            # NOTE mad: processes append their records by chunks, out of order
+            path = os.path.join(folder, "processes.bin")
+            log = RequestLog(path)
+            log.write("POST /b", self.results[2])
+            log.write("GET /a", self.results[1])
+            log.write("GET /a", self.results[0])
+            log.close()
+            analysis = analyze_log(path, LogFilter(since=5.0, until=15.0))
+            self.assertEqual((analysis.records, analysis.matched), (3, 1))
+
+
+class TestLoadCapacity(unittest.TestCase):
+    def test_next_rate(self):
+        self.assertEqual(next_rate([], start=10), 10)
+        self.assertEqual(next_rate([(10, True), (20, True)]), 40)
+        self.assertEqual(next_rate([(10, True), (20, True), (40, False)]), 30)
+        self.assertEqual(next_rate([(10, True), (20, True), (40, False), (30, False)]), 25)
+        self.assertIsNone(next_rate([(10, True), (20, False), (15, True), (17.5, True), (18.75, False)], precision=0.1))
+        self.assertEqual(next_rate([(10, False)]), 5)
+        self.assertIsNone(next_rate([(10, True), (20, True)], max_steps=2))
+        self.assertEqual(next_rate([], start=10, min_rate=20), 20)
+        self.assertEqual(next_rate([(10, False)], min_rate=8), 8)
+        self.assertIsNone(next_rate([(10, False), (8, False)], min_rate=8))
+
+    def test_measure(self):
+        slo = scenery.manifest.SLO(percentiles={95: 100}, max_error_rate=10)
+        recorder = HistogramRecorder()
+        recorder.open_model = True
+        for i in range(100):
+            recorder.record({"timestamp": i / 10, "elapsed_time": 0.01, "send_delay": 0.0, "status_code": 200, "success": True})
+        step = CapacityStep.measure(10, recorder, slo)
+        self.assertTrue(step.sustainable)
+        self.assertAlmostEqual(step.percentiles[95], 10, delta=0.1)
+
+        for i in range(20):
+            recorder.record({"timestamp": 9.9, "elapsed_time": 0.2, "send_delay": 0.0, "status_code": 500, "success": False})
+        self.assertEqual(CapacityStep.measure(10, recorder, slo).broken, ["error rate"])
+        self.assertEqual(CapacityStep.measure(20, recorder, slo).broken, ["error rate", "throughput"])
+
+        steps = [CapacityStep(10, 100, 10, 0, {}, []), CapacityStep(20, 200, 19, 0, {}, []), CapacityStep(40, 400, 25, 0, {}, ["p95"])]
+        self.assertIs(capacity(steps), steps[1])
+        self.assertIsNone(capacity(steps[2:]))
+
+
+class TestLoadProcesses(unittest.TestCase):
+    def test_gather_processes(self):
+        context = multiprocessing.get_context("fork")
+        results: multiprocessing.Queue = context.Queue()
+
+        def worker(latency: float) -> None:
+            recorder = HistogramRecorder()
+            recorder.record({"timestamp": 1.0, "elapsed_time": latency, "status_code": 200, "success": True})
+            results.put((os.getpid(), {"GET /a": recorder}, [], ["aborted"] if latency > 0.1 else []))
+
+        def crash() -> None:
+            os.kill(os.getpid(), signal.SIGKILL)
+
+        def crash_after_results() -> None:
+            worker(0.2)
+            results.close()
+            results.join_thread()
+            os._exit(1)
+
+        with self.subTest("merge"):
+            workers = [context.Process(target=worker, args=(latency,)) for latency in (0.1, 0.2)]
+            data, errors, aborts = TestsRunner._gather_processes(workers, results, "histogram")
+            self.assertEqual((len(data["GET /a"]), data["GET /a"].successes.max), (2, 0.2))
+            self.assertEqual((errors, aborts), ([], ["aborted"]))
+
+        with self.subTest("dead worker"):
+            workers = [context.Process(target=worker, args=(0.1,)), context.Process(target=crash)]
+            data, errors, aborts = TestsRunner._gather_processes(workers, results, "histogram")
+            self.assertEqual(len(data["GET /a"]), 1)
+            self.assertEqual(errors, [f"Worker process {workers[1].pid} died with exit code -9"])
+
+        with self.subTest("dead worker with results"):
+            workers = [context.Process(target=worker, args=(0.1,)), context.Process(target=crash_after_results)]
+            data, errors, aborts = TestsRunner._gather_processes(workers, results, "histogram")
+            self.assertEqual((len(data["GET /a"]), errors), (2, []))
+
+    def test_no_load_tests(self):
+        self.assertEqual(TestsRunner().run_loads_concurrently([], 2), ({}, [], []))
+
+
+class TestLoadDistributed(unittest.TestCase):
+    def test_parse_address(self):
+        self.assertEqual(parse_address("127.0.0.1:7913"), ("127.0.0.1", 7913))
+        self.assertEqual(parse_address("/tmp/agent.sock"), "/tmp/agent.sock")
+        self.assertEqual(parse_address("unix:agent.sock"), "agent.sock")
+
+    def test_frames(self):
+        left, right = socket.socketpair()
+        with left, right:
+            send_frame(left, ("result", {"a": b"x" * 100_000}, [], []), b"secret")
+            self.assertEqual(recv_frame(right, b"secret"), ("result", {"a": b"x" * 100_000}, [], []))
+            send_frame(left, ("hello", 1), b"other")
+            with self.assertRaises(ConnectionError):
+                recv_frame(right, b"secret")
+            left.close()
+            self.assertIsNone(recv_frame(right, b"secret"))
+
+    def test_agent_job_failure(self):
+        class FailingAgent(LoadAgent):
+            def run(self, *args: typing.Any) -> None:
+                self.send(("ready",))
+                raise RuntimeError("boom")
+
+        left, right = socket.socketpair()
+        with left, right:
+            thread = threading.Thread(target=FailingAgent(right, 1, b"secret").serve)
+            thread.start()
+            self.assertEqual(recv_frame(left, b"secret"), ("hello", 1))
+            send_frame(left, ("job", [], argparse.Namespace(), (0, 1), 1, False), b"secret")
+            self.assertEqual(recv_frame(left, b"secret"), ("ready",))
+            result = recv_frame(left, b"secret")
+            assert result is not None
+            self.assertEqual((result[0], result[1]), ("result", {}))
+            self.assertIn("RuntimeError: boom", result[2][0])
+            left.close()
+            thread.join()
+
+    def test_coordinator(self):
+        def agent(server: socket.socket, processes: int, latency: float, jobs: list) -> None:
+            connection, _ = server.accept()
+            with connection:
+                send_frame(connection, ("hello", processes), b"secret")
+                jobs.append(recv_frame(connection, b"secret"))
+                send_frame(connection, ("ready",), b"secret")
+                start = recv_frame(connection, b"secret")
+                assert start is not None and start[0] == "start"
+                recorder = HistogramRecorder()
+                recorder.record({"timestamp": 1.0, "elapsed_time": latency, "status_code": 200, "success": True})
+                send_frame(connection, ("live", (1000, 1.0, {})), b"secret")
+                send_frame(
+                    connection, ("result", {"GET /a": recorder}, [], ["aborted"] if processes == 2 else []), b"secret"
+                )
+
+        with tempfile.TemporaryDirectory() as folder:
+            addresses = [os.path.join(folder, "agent1.sock"), os.path.join(folder, "agent2.sock")]
+            jobs: list[list] = [[], []]
+            threads = []
+            for address, processes, latency, agent_jobs in zip(addresses, (1, 2), (0.1, 0.2), jobs):
+                server = listen(address)
+                self.addCleanup(server.close)
+                threads.append(threading.Thread(target=agent, args=(server, processes, latency, agent_jobs)))
+                threads[-1].start()
+
+            live_queue = multiprocessing.get_context("fork").Queue()
+            args = argparse.Namespace(store="histogram")
+            with Coordinator(addresses, b"secret") as coordinator:
+                self.assertEqual(coordinator.processes, 3)
+                data, errors, aborts = coordinator.run_load([], args, live_queue)
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual([agent_jobs[0][3:5] for agent_jobs in jobs], [((0, 1), 3), ((1, 3), 3)])
+        self.assertEqual((len(data["GET /a"]), data["GET /a"].successes.max), (2, 0.2))
+        self.assertEqual((errors, aborts), ([], ["aborted"]))
+        # NOTE mad: the processes of both agents have the same pid
+        live = [live_queue.get(timeout=1) for _ in addresses]
+        self.assertEqual(sorted(key for key, _, _ in live), [(address, 1000) for address in addresses])
+
+
 #################
 # SELENIUM
 #################
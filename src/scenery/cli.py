@@ -1,11 +1,18 @@
 import argparse
 import typing
-import statistics
 import collections
+import datetime
 import logging
+import math
+import multiprocessing
+import queue
+import re
+import threading
+import time
 
 from rich import box
 from rich.console import Console
+from rich.live import Live
 from rich.rule import Rule
 from rich.progress import Progress, BarColumn, TextColumn
 from rich.style import Style
@@ -18,6 +25,23 @@ from rich.panel import Panel
 import scenery.commands
 from scenery import logger, console
 from scenery.common import interpret
+from scenery.load_metrics import (
+    ERRORS,
+    LIVE_TICK,
+    LIVE_WINDOW,
+    SERIES_BUCKETS,
+    WARMUP,
+    ErrorBodies,
+    Latencies,
+    LiveSnapshot,
+    Recorder,
+    TimeSeries,
+)
+from scenery.load_capacity import CapacityStep, capacity
+from scenery.load_distributed import DEFAULT_AGENT_ADDRESS
+from scenery.load_history import Comparison, RunSummary
+from scenery.load_log import LOG_EXTENSIONS
+from scenery.manifest import DEFAULT_SLO, SLO, LoadStage
 
 
 
@@ -35,6 +59,8 @@ def parse_args() -> argparse.Namespace:
     subparsers = parser.add_subparsers(dest="command", help="Testing command to run")
     parse_integration_args(subparsers)
     parse_load_args(subparsers) 
+    parse_load_agent_args(subparsers)
+    parse_analyze_args(subparsers)
     parse_inspect_args(subparsers) 
 
     args = parser.parse_args()
@@ -106,6 +132,83 @@ def parse_arg_test_restriction(test_name_pattern: str|None) -> typing.Tuple[str|
         return None, None, None
 
 
+def parse_think_time(value: str) -> typing.Tuple[float, float]:
+    """Parse the --think-time argument, either `SECONDS` or `MIN-MAX`, into the bounds of the pause."""
+    low, _, high = value.partition("-")
+    try:
+        bounds = float(low), float(high or low)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid think time: {value!r}")
+    if not 0 <= bounds[0] <= bounds[1]:
+        raise argparse.ArgumentTypeError(f"invalid think time: {value!r}")
+    return bounds
+
+
+def parse_warmup(value: str) -> int | float:
+    """Parse the --warmup argument, either a number of requests (int) or a duration such as `30s` (float)."""
+    if value.isdigit():
+        return int(value)
+    try:
+        return LoadStage.parse_duration(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid warm-up: {value!r}")
+
+
+def parse_duration(value: str) -> float:
+    """Parse a duration argument, in seconds or with a unit such as `30s` or `2m`."""
+    try:
+        return LoadStage.parse_duration(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid duration: {value!r}")
+
+
+def parse_expected_interval(value: str) -> float:
+    """Parse the --expected-interval argument, a positive number of milliseconds."""
+    try:
+        interval = float(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid expected interval: {value!r}")
+    # NOTE mad: the coordinated omission correction back-fills latencies every interval, it needs a positive one
+    if not 0 < interval < math.inf:
+        raise argparse.ArgumentTypeError(f"invalid expected interval: {value!r}, expected a positive number of ms")
+    return interval
+
+
+def parse_export_path(value: str) -> str:
+    """Parse the --export argument, the path of a `.csv` or `.jsonl` file."""
+    if not value.endswith((".csv", ".jsonl")):
+        raise argparse.ArgumentTypeError(f"invalid export file: {value!r}, expected .csv or .jsonl")
+    return value
+
+
+def parse_request_log_path(value: str) -> str:
+    """Parse the --request-log argument, the path of a `.bin` or `.jsonl` file."""
+    if not value.endswith(LOG_EXTENSIONS):
+        raise argparse.ArgumentTypeError(f"invalid request log: {value!r}, expected .bin or .jsonl")
+    return value
+
+
+def parse_log_time(value: str) -> float | datetime.datetime:
+    """Parse the --since and --until arguments, either a duration such as `90s` (float) or an ISO date."""
+    try:
+        return LoadStage.parse_duration(value)
+    except ValueError:
+        pass
+    try:
+        return datetime.datetime.fromisoformat(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid time: {value!r}, expected a duration or an ISO date")
+
+
+def parse_status(value: str) -> str:
+    """Parse the --status argument, a status code (e.g. `503`), class (e.g. `5xx`) or class of errors."""
+    if len(value) == 3 and value[0].isdigit() and (value[1:].isdigit() or value[1:] == "xx"):
+        return value
+    if value in ERRORS:
+        return value
+    raise argparse.ArgumentTypeError(f"invalid status: {value!r}, expected e.g. 503, 5xx or one of {', '.join(ERRORS)}")
+
+
 def parse_integration_args(subparser: argparse._SubParsersAction) -> None:
     """Parse command line arguments."""
 
@@ -143,6 +246,193 @@ def parse_load_args(subparser: argparse._SubParsersAction) -> None:
 
     parser.add_argument('-u', '--users', type=int)
     parser.add_argument('-r', '--requests', type=int)
+    parser.add_argument(
+        '--engine',
+        choices=["threads", "asyncio"],
+        default="threads",
+        help="Simulate users with OS threads or with coroutines over keep-alive connections",
+    )
+    parser.add_argument(
+        '-p',
+        '--processes',
+        type=int,
+        default=1,
+        help="Split the users across this number of worker processes",
+    )
+    parser.add_argument(
+        '--rate',
+        type=float,
+        default=None,
+        help="Send requests at this total rate (requests per second), shared by the processes, instead of back to back, users bound the concurrency",
+    )
+    parser.add_argument(
+        '--arrival',
+        choices=["fixed", "poisson"],
+        default="fixed",
+        help="Distribution of the inter-arrival times with --rate",
+    )
+    parser.add_argument(
+        '--connect-timeout',
+        type=float,
+        default=None,
+        help="Seconds to wait for a connection to be established before recording a timeout (default: 10)",
+    )
+    parser.add_argument(
+        '--read-timeout',
+        type=float,
+        default=None,
+        help="Seconds to wait for a response before recording a timeout (default: 30)",
+    )
+    parser.add_argument(
+        '--expected-interval',
+        type=parse_expected_interval,
+        default=None,
+        help="Expected interval in ms between two requests of a user, used to correct latencies for coordinated omission (default: median latency)",
+    )
+    parser.add_argument(
+        '--store',
+        choices=["histogram", "samples"],
+        default="histogram",
+        help="Record results in fixed-memory histograms or keep every sample in typed arrays",
+    )
+    parser.add_argument(
+        '--warmup',
+        type=parse_warmup,
+        default=None,
+        help="Record the first requests apart, out of the SLO verdict: a number of requests (e.g. 100) or a duration (e.g. 30s)",
+    )
+    parser.add_argument(
+        '--prewarm',
+        action='store_true',
+        help="Open the connection of each user before its first request, so that it does not pay for the handshakes",
+    )
+    parser.add_argument(
+        '--accept-encoding',
+        default=None,
+        help="The Accept-Encoding header of the requests, e.g. 'gzip, br' or 'identity', to compare compressed and uncompressed runs",
+    )
+    parser.add_argument(
+        '--export',
+        type=parse_export_path,
+        default=None,
+        help="Write the requests, failures and latency histogram of each endpoint, second by second, to a .csv or .jsonl file",
+    )
+    parser.add_argument(
+        '--history',
+        default=".scenery/load_history.sqlite3",
+        help="SQLite file keeping the summary of each endpoint of each run (default: %(default)s)",
+    )
+    parser.add_argument(
+        '--compare',
+        nargs='?',
+        const="latest",
+        default=None,
+        metavar="BASELINE",
+        help="Flag significant p95, p99 or throughput regressions against the latest run of a git revision, or the latest run without revision",
+    )
+    parser.add_argument(
+        '--coordinator',
+        nargs='+',
+        default=None,
+        metavar="AGENT",
+        help="Run the load tests on these load agents, host:port or Unix socket paths, instead of local processes, "
+        "the agents sharing the secret of SCENERY_LOAD_SECRET",
+    )
+    parser.add_argument(
+        '--request-log',
+        type=parse_request_log_path,
+        default=None,
+        help="Append every request to a compact binary (.bin) or JSON lines (.jsonl) file, for scenery analyze",
+    )
+    parser.add_argument(
+        '--live',
+        action='store_true',
+        help="Show a dashboard of the rolling RPS, requests in flight, percentiles and error rate of each endpoint during the run",
+    )
+    workload = parser.add_mutually_exclusive_group()
+    workload.add_argument(
+        '--mix',
+        action='store_true',
+        help="Run all the scenes of the manifests at the same time, each request picking a scene by weight",
+    )
+    workload.add_argument(
+        '--journey',
+        action='store_true',
+        help="Have each user walk through the scenes of a case in order, with its own cookies",
+    )
+    workload.add_argument(
+        '--find-capacity',
+        action='store_true',
+        help="Raise the rate of each scene step by step, from --rate, then bisect to the highest one meeting its latency and error rate objectives",
+    )
+    parser.add_argument(
+        '--step-duration',
+        type=parse_duration,
+        default=10.0,
+        help="How long each step of --find-capacity lasts, e.g. 30s (default: 10s)",
+    )
+    parser.add_argument(
+        '--think-time',
+        type=parse_think_time,
+        default=None,
+        help="Pause of a user between two scenes of a journey, in seconds, either fixed or drawn between MIN-MAX",
+    )
+
+
+def parse_load_agent_args(subparser: argparse._SubParsersAction) -> None:
+    """Add the `load-agent` subcommand and its arguments."""
+    parser = subparser.add_parser(
+        'load-agent', help='Run the load tests of a coordinator sharing the secret of SCENERY_LOAD_SECRET'
+    )
+    add_common_arguments(parser)
+
+    parser.add_argument(
+        '--listen',
+        default=DEFAULT_AGENT_ADDRESS,
+        help="host:port or Unix socket path to wait for the coordinator on (default: %(default)s)",
+    )
+    parser.add_argument(
+        '-p',
+        '--processes',
+        type=int,
+        default=1,
+        help="Number of worker processes of the agent",
+    )
+
+
+def parse_analyze_args(subparser: argparse._SubParsersAction) -> None:
+    """Add the `analyze` subcommand and its arguments."""
+    parser = subparser.add_parser('analyze', help='Analyze the request log of load tests')
+    add_common_arguments(parser)
+
+    parser.add_argument('request_log', type=parse_request_log_path, help="The .bin or .jsonl request log")
+    parser.add_argument(
+        '--since',
+        type=parse_log_time,
+        default=None,
+        help="Start of the time window, a duration after the earliest request of the log (e.g. 90s) or an ISO date",
+    )
+    parser.add_argument(
+        '--until',
+        type=parse_log_time,
+        default=None,
+        help="End of the time window, a duration after the earliest request of the log (e.g. 5m) or an ISO date",
+    )
+    parser.add_argument(
+        '--endpoint',
+        dest="endpoints",
+        action='append',
+        default=[],
+        help="Only analyze this endpoint, e.g. 'GET /items', can be repeated",
+    )
+    parser.add_argument(
+        '--status',
+        dest="statuses",
+        type=parse_status,
+        action='append',
+        default=[],
+        help="Only analyze the requests with this status code (503), class (5xx) or class of errors (timeout), can be repeated",
+    )
 
 
 def parse_inspect_args(subparser: argparse._SubParsersAction) -> None:
@@ -156,7 +446,7 @@ def parse_inspect_args(subparser: argparse._SubParsersAction) -> None:
 # RICH HELPERS
 #################
 
-def table_from_dict(d: dict[str, typing.Any], col1_title : str = "", col2_title:str = "", title: str | None =None, formatting: dict[str, typing.Tuple[str, typing.Any]]={}) -> Table:
+def table_from_dict(d: typing.Mapping[typing.Any, typing.Any], col1_title : str = "", col2_title:str = "", title: str | None =None, formatting: dict[str, typing.Tuple[str, typing.Any]]={}) -> Table:
         
     show_header = col1_title != "" or col2_title != ""
     table = Table(title=title, box=box.ROUNDED, show_header=show_header)
@@ -178,16 +468,129 @@ def table_from_dict(d: dict[str, typing.Any], col1_title : str = "", col2_title:
     
     return table
 
-def histogram(x: typing.Iterable[int]) -> Progress:
-    """Display a histogram leveraging Rich progress bars and return a renderable object"""
+PHASES_LABELS = {"connect_time": "Connect", "ttfb": "TTFB", "download_time": "Download"}
+
+ERRORS_LABELS = {
+    "timeout": "Timeout",
+    "refused": "Connection refused",
+    "reset": "Connection reset",
+    "tls": "TLS",
+    "dns": "DNS",
+    "other": "Other",
+}
+
+def evaluate_slo(
+    slo: SLO, latencies: Latencies, error_rate: float, throughput: float
+) -> list[typing.Tuple[str, str, str, bool]]:
+    """Return the label, target, actual value and whether it is met of each objective.
+
+    Args:
+        slo (SLO): The objectives.
+        latencies (Latencies): The latencies the percentiles objectives are checked against.
+        error_rate (float): The share of failed requests, in %.
+        throughput (float): The number of successful requests per second.
+    """
+    objectives = []
+    for p, target in slo.percentiles.items():
+        label, target_repr = f"p{p:g}", f"<= {target:.2f}ms"
+        if latencies.count:
+            actual = latencies.percentile(p) * 1000
+            objectives.append((label, target_repr, f"{actual:.2f}ms", actual <= target))
+        else:
+            objectives.append((label, target_repr, "-", False))
+    if slo.max_error_rate is not None:
+        objectives.append(
+            ("Error rate", f"<= {slo.max_error_rate:.2f}%", f"{error_rate:.2f}%", error_rate <= slo.max_error_rate)
+        )
+    if slo.min_throughput is not None:
+        objectives.append(
+            ("Throughput", f">= {slo.min_throughput:.2f}/s", f"{throughput:.2f}/s", throughput >= slo.min_throughput)
+        )
+    return objectives
+
+
+def table_from_objectives(objectives: list[typing.Tuple[str, str, str, bool]]) -> Table:
+    """Display whether each objective is met."""
+    table = Table(title="SLO", box=box.ROUNDED)
+    table.add_column("Objective", style="cyan", no_wrap=True)
+    table.add_column("Target", justify="right")
+    table.add_column("Actual", justify="right")
+    table.add_column("", justify="center")
+    for label, target, actual, success in objectives:
+        emojy, _, color, _ = interpret(success)
+        table.add_row(label, target, f"[{color}]{actual}[/{color}]", emojy)
+    return table
+
+
+def table_from_errors(errors: typing.Mapping[str, int]) -> Table:
+    """Display the number of requests which got no response, by class of error."""
+    table = Table(box=box.ROUNDED)
+    table.add_column("Error of requests without response", style="cyan", no_wrap=True)
+    table.add_column("N", justify="right")
+    for error, n in errors.items():
+        table.add_row(ERRORS_LABELS[error], str(n))
+    return table
+
+
+# NOTE mad: error pages are mostly HTML, their text is shown without scripts, styles and tags,
+# the elements left open at the end of the sampled bytes included
+HTML_NOISE = re.compile(r"<(script|style)\b.*?(</\1>|$)|<[^>]*(>|$)", re.DOTALL | re.IGNORECASE)
+
+
+def table_from_error_bodies(error_bodies: ErrorBodies, width: int = 100) -> Table:
+    """Display the sample of the bodies of failed responses, the text of each on one line cut to `width` characters."""
+    table = Table(title=f"Sample of {error_bodies.seen} failed responses", box=box.ROUNDED)
+    table.add_column("Status", style="cyan", no_wrap=True)
+    table.add_column("Body", overflow="ellipsis", no_wrap=True)
+    for status_code, body in error_bodies.bodies:
+        text = " ".join(HTML_NOISE.sub(" ", body.decode("utf8", errors="replace")).split())
+        table.add_row(str(status_code), text[:width] or "(empty)")
+    return table
+
+
+def table_from_warmups(warmups: typing.Mapping[str, Recorder]) -> Table:
+    """Display a summary of the warm-up of each endpoint, which is left out of the SLO verdict."""
+    table = Table(title="Warm-up, out of the SLO verdict", box=box.ROUNDED)
+    table.add_column("Endpoint", style="cyan", no_wrap=True)
+    for column in ("Requests", "Failed", "New connections", "p50", "p99"):
+        table.add_column(column, justify="right")
+    for endpoint, recorder in warmups.items():
+        successes = recorder.successes
+        percentiles = [f"{successes.percentile(p) * 1000:.2f}ms" if successes.count else "-" for p in (50, 99)]
+        table.add_row(
+            endpoint,
+            str(len(recorder)),
+            str(len(recorder) - successes.count),
+            str(recorder.connections["new"]),
+            *percentiles,
+        )
+    return table
+
+
+def table_from_percentiles(columns: dict[str, dict[int, float]], title: str | None = None, unit: str = "ms") -> Table:
+    """Display percentiles side by side, one column per series of values, in ms unless another unit is given."""
+    table = Table(title=title, box=box.ROUNDED)
+    table.add_column("Percentile", style="cyan", no_wrap=True)
+    for col_title in columns:
+        table.add_column(col_title, justify="right")
+
+    ps = next(iter(columns.values()), {}).keys()
+    for p in ps:
+        label = f"[bold]p{p}[/bold]" if p == 99 else f"p{p}"
+        table.add_row(label, *(f"{values[p]:.2f}{unit}" for values in columns.values()))
+
+    return table
+
+def histogram(latencies: Latencies) -> Progress:
+    """Display a histogram of latencies leveraging Rich progress bars and return a renderable object"""
     # Calculate histogram data
-    max_val = max(x)
+    max_val = latencies.max * 1000
     
     bins = [
         (0, 50), 
         (50, 100), 
         (100, 200),
-        (100, 300),
+        (200, 300),
         (300, 500),
         (500, 750),
         (750, 1000),
@@ -195,14 +598,10 @@ def histogram(x: typing.Iterable[int]) -> Progress:
         (2000, 3000),
         (3000, max(max_val, 4000))]
 
-    histogram_data = []
-    # for i in range(bins):
-        # bin_start = min_val + i * bin_width
-        # bin_end = min_val + (i + 1) * bin_width
-    for i, (bin_start, bin_end) in enumerate(bins):
-        bin_count = sum(1 for t in x if bin_start <= t < bin_end or (i == len(bins)-1 and t == bin_end))
-        # bin_count = sum(1 for t in x if bin_start <= t < bin_end or (i == bins-1 and t == bin_end))
-        histogram_data.append((bin_start, bin_end, bin_count))
+    # NOTE mad: the last bin includes its upper bound
+    edges = [bin_start / 1000 for bin_start, _ in bins] + [float("inf")]
+    counts = latencies.histogram(edges)
+    histogram_data = [(bin_start, bin_end, count) for (bin_start, bin_end), count in zip(bins, counts)]
     
     max_count = sum(count for _, _, count in histogram_data) if histogram_data else 0
     completed_style = Style(color="white")
@@ -223,6 +622,141 @@ def histogram(x: typing.Iterable[int]) -> Progress:
     # Return the progress object itself (which is renderable)
     return progress
 
+
+SPARKS = " ▁▂▃▄▅▆▇█"
+SHADES = " ░▒▓█"
+
+
+def sparkline(values: list[float], style: str = "white") -> Text:
+    """Display values as a line of bars scaled to the largest one, non zero values are always visible."""
+    peak = max(values, default=0)
+    bars = "".join(
+        SPARKS[max(1, round(value / peak * (len(SPARKS) - 1)))] if value and peak else SPARKS[0]
+        for value in values
+    )
+    return Text(bars, style=style)
+
+
+def time_series(series: TimeSeries, width: int = 60) -> Table:
+    """Display the requests and failures per second over the run, and a heatmap of latencies.
+
+    Each column covers the same number of seconds, so that the run fits in `width` columns.
+    In the heatmap, the shade of a cell is the share of the requests of the column in the
+    latency bucket, so that latency shifts show whatever the throughput.
+    """
+    seconds = series.seconds
+    step = max(1, math.ceil(len(seconds) / width))
+    columns = [[series.row(second) for second in seconds[i:i + step]] for i in range(0, len(seconds), step)]
+
+    table = Table(title="Over time", box=None, show_header=False, padding=(0, 1))
+    table.add_column("", style="cyan", justify="right", no_wrap=True)
+    table.add_column("", no_wrap=True)
+
+    requests = [sum(row["requests"] for row in rows) / len(rows) for rows in columns]
+    failures = [sum(row["failures"] for row in rows) / len(rows) for rows in columns]
+    table.add_row(f"Requests/s ≤{max(requests, default=0):.0f}", sparkline(requests))
+    table.add_row(f"Failures/s ≤{max(failures, default=0):.0f}", sparkline(failures, style="red"))
+
+    counts = {bucket: [sum(row[bucket] for row in rows) for rows in columns] for bucket in SERIES_BUCKETS}
+    used = [bucket for bucket in SERIES_BUCKETS if any(counts[bucket])]
+    if used:
+        # NOTE mad: buckets are shown from the slowest to the fastest, empty ones at both ends are left out
+        buckets = SERIES_BUCKETS[SERIES_BUCKETS.index(used[0]):SERIES_BUCKETS.index(used[-1]) + 1]
+        for bucket in reversed(buckets):
+            cells = "".join(
+                SHADES[math.ceil(count / max(1, sum(rows["requests"] for rows in column)) * (len(SHADES) - 1))]
+                for count, column in zip(counts[bucket], columns)
+            )
+            label = bucket.replace("lt_", "<").replace("ge_", "≥")
+            table.add_row(label, Text(cells, style="yellow"))
+
+    end = f"{len(seconds)}s"
+    table.add_row("", "0s" + " " * max(len(columns) - 2 - len(end), 1) + end)
+    return table
+
+##################
+# LIVE DASHBOARD
+##################
+
+
+class LiveDashboard:
+    """Display the rolling statistics of the running load tests, refreshed every `LIVE_TICK` seconds.
+
+    The engines of all the processes put snapshots of their live statistics in `queue`, the
+    latest snapshot of each process is kept and the snapshots of an endpoint are merged.
+    Processes which did not publish for a while are considered done.
+
+    Usage:
+        with LiveDashboard() as dashboard:
+            ... # run load tests with `live_queue=dashboard.queue`
+    """
+
+    def __init__(self) -> None:
+        # NOTE mad: processes are forked so that they inherit the queue
+        self.queue = multiprocessing.get_context("fork").Queue()
+        # NOTE mad: local processes are keyed by pid, those of load agents by agent and pid
+        self.latest: dict[int | typing.Tuple[str, int], typing.Tuple[float, dict[str, LiveSnapshot]]] = {}
+        self.start = time.perf_counter()
+        self.stop = threading.Event()
+        self.live = Live(self.render(), console=console, auto_refresh=False)
+        self.thread = threading.Thread(target=self.refresh, daemon=True)
+
+    def __enter__(self) -> "LiveDashboard":
+        self.live.start()
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info: typing.Any) -> None:
+        self.stop.set()
+        self.thread.join()
+        self.update()
+        self.live.stop()
+        console.line()
+
+    def refresh(self) -> None:
+        """Update the dashboard every `LIVE_TICK` seconds until it is exited."""
+        while not self.stop.wait(LIVE_TICK):
+            self.update()
+
+    def update(self) -> None:
+        """Keep the latest snapshots published by each process and render them."""
+        while True:
+            try:
+                pid, sent, snapshots = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            self.latest[pid] = (sent, snapshots)
+        self.live.update(self.render(), refresh=True)
+
+    def render(self) -> Table:
+        """Return a table of the statistics of each endpoint, over the last seconds."""
+        now = time.time()
+        merged: dict[str, LiveSnapshot] = collections.defaultdict(LiveSnapshot)
+        for sent, snapshots in self.latest.values():
+            if now - sent > 2 * LIVE_TICK:
+                continue
+            for endpoint, snapshot in snapshots.items():
+                merged[endpoint].merge(snapshot)
+
+        elapsed = time.perf_counter() - self.start
+        table = Table(title=f"Live, last {LIVE_WINDOW}s ({elapsed:.0f}s elapsed)", box=box.ROUNDED)
+        table.add_column("Endpoint", style="cyan", no_wrap=True)
+        for column in ("RPS", "In flight", "p50", "p95", "p99", "Error rate"):
+            table.add_column(column, justify="right")
+
+        for endpoint, snapshot in sorted(merged.items()):
+            successes = snapshot.successes
+            percentiles = [f"{successes.percentile(p) * 1000:.2f}ms" if successes.count else "-" for p in (50, 95, 99)]
+            color = "red" if snapshot.failures else "green"
+            table.add_row(
+                endpoint,
+                str(snapshot.rps),
+                str(snapshot.in_flight),
+                *percentiles,
+                f"[{color}]{snapshot.error_rate:.2f}%[/{color}]",
+            )
+        return table
+
 ##################
 # COMMAND WRAPPER
 ##################
@@ -302,8 +836,32 @@ def report_integration(data: dict) -> bool:
 
 
 
-def report_load(data: dict, threshold_p95: int = 500, threshold_p99: int = 5000) -> bool:
+def report_load(
+    data: dict[str, Recorder],
+    slos: dict[str, SLO] | None = None,
+    expected_interval: float | None = None,
+    aborts: list[str] | None = None,
+) -> bool:
+    """Display the results of the load tests, one panel per endpoint.
+
+    Latency percentiles are shown both raw and corrected for coordinated omission,
+    the percentiles objectives are checked against the corrected ones.
+
+    Args:
+        data (dict[str, Recorder]): The results as collected in `LoadTestCase.data`, by endpoint.
+        slos (dict[str, SLO] | None): The objectives declared in the manifest, by endpoint.
+            Endpoints without objectives are checked against `DEFAULT_SLO`.
+        expected_interval (float | None): The expected interval between two requests of a user
+            in ms, used for the correction. Defaults to the median latency of the endpoint.
+        aborts (list[str] | None): Why load tests stopped before their end, their results
+            are then partial.
 
+    The results of the warm-up, recorded under the endpoints suffixed with `WARMUP`, are
+    summarized apart and left out of the verdict.
+
+    Returns:
+        bool: Whether all endpoints meet their objectives and no load test aborted.
+    """
     #####################
     # OUTPUT
     #####################
@@ -313,69 +871,101 @@ def report_load(data: dict, threshold_p95: int = 500, threshold_p99: int = 5000)
 
     console = Console()
 
-    for endpoint, requests_results in data.items():
+    warmups = {
+        endpoint.removesuffix(WARMUP): recorder for endpoint, recorder in data.items() if endpoint.endswith(WARMUP)
+    }
 
-        total_requests = len(requests_results)
-        if total_requests == 0:
+    for endpoint, recorder in data.items():
+
+        if endpoint.endswith(WARMUP):
             continue
 
-        successes = [r for r in requests_results if r["success"]]
-        failures = [r for r in requests_results if not r["success"] ]
+        total_requests = len(recorder)
+        if total_requests == 0:
+            continue
 
-        success_times = [r['elapsed_time']*1000 for r in successes]
-        error_times = [r['elapsed_time']*1000 for r in failures]
+        successes = recorder.successes
+        failures_status_codes = recorder.failures_status_codes
+        failed_requests = sum(failures_status_codes.values()) + sum(recorder.errors.values())
         
-        error_rate = (len(error_times) / total_requests) * 100 if total_requests > 0 else 0
+        error_rate = (failed_requests / total_requests) * 100 if total_requests > 0 else 0
         
         ep_analysis = {
             'total_requests': total_requests,
-            'successful_requests': len(success_times),
-            'failed_requests': len(error_times),
-            'error_rate': error_rate
+            'successful_requests': successes.count,
+            'failed_requests': failed_requests,
+            'error_rate': error_rate,
+            'duration': recorder.duration,
+            'throughput': recorder.throughput,
+            'new_connections': recorder.connections["new"],
+            'reused_connections': recorder.connections["reused"],
         }
-
-
-        
-        if success_times:
-            quantiles = statistics.quantiles(success_times, n=100)
-            # quantiles = statistics.quantiles(success_times, n=4)
-
-            p50 = statistics.median(success_times)
-            p90 = quantiles[90-1]
-            p95 = quantiles[95-1]
-            p99 = quantiles[99-1]
+        if recorder.client_cpu:
+            # NOTE mad: a usage close to 100% of a core means the load generator, not the server, is the bottleneck
+            ep_analysis['client_cpu_per_request'] = recorder.client_cpu / total_requests * 1000
+            ep_analysis['client_cpu_usage'] = recorder.client_cpu / recorder.duration * 100 if recorder.duration else 0.0
+        transfer = recorder.transfer
+        if transfer.received:
+            ep_analysis['transferred'] = transfer.received / 1e6
+            ep_analysis['bandwidth'] = transfer.received / 1e6 / recorder.duration if recorder.duration else 0.0
+        if transfer.compression_ratio is not None:
+            ep_analysis['compression_ratio'] = transfer.compression_ratio
+
+        percentiles_tables = []
+        corrected: Latencies = successes
+
+        if successes.count:
+            interval = expected_interval if expected_interval is not None else successes.percentile(50) * 1000
+            corrected = recorder.corrected(interval / 1000)
+
+            raw_percentiles = {p: t * 1000 for p, t in successes.percentiles().items()}
+            corrected_percentiles = {p: t * 1000 for p, t in corrected.percentiles().items()}
 
             ep_analysis.update({
-                'min_time': min(success_times),
-                'p50': p50,
-                'p90': p90,
-                'p95': p95,
-                '[bold]p99[/bold]': p99,
-                'max': max(success_times),
-
+                'min_time': successes.min * 1000,
+                'max': successes.max * 1000,
+                'expected_interval': interval,
             })
             
-            if len(success_times) > 1:
-                ep_analysis['stdev'] = statistics.stdev(success_times)
+            if successes.count > 1:
+                ep_analysis['stdev'] = successes.stdev * 1000
 
-            # TODO mad: confirm with sel
-            success = bool(p95 < threshold_p95)
-            success &= bool(p99 < threshold_p99)
+            percentiles_tables.append(
+                table_from_percentiles({"Raw": raw_percentiles, "Corrected": corrected_percentiles})
+            )
+
+            phases_percentiles = {
+                PHASES_LABELS[phase]: {p: t * 1000 for p, t in durations.percentiles().items()}
+                for phase, durations in recorder.phases.items()
+                if durations.count
+            }
+            if phases_percentiles:
+                percentiles_tables.append(table_from_percentiles(phases_percentiles, title="Phases"))
+
+        sizes = recorder.sizes
+        if sizes.count and sizes.max:
+            sizes_percentiles = {"Size": {p: size / 1000 for p, size in sizes.percentiles().items()}}
+            percentiles_tables.append(table_from_percentiles(sizes_percentiles, title="Response bodies", unit="KB"))
+
+        slo = (slos or {}).get(endpoint, DEFAULT_SLO)
+        objectives = evaluate_slo(slo, corrected, error_rate, recorder.throughput)
+        success = bool(successes.count) and all(met for *_, met in objectives)
 
-        else:
-            success = False
-        
         command_level_success &= success
 
         formatting = {
             "error_rate": ("{:.2f}%", None),
+            "duration": ("{:.2f}s", None),
+            "throughput": ("{:.2f}/s", None),
             "min_time": ("{:.2f}ms", None),
-            "p50": ("{:.2f}ms", None),
-            "p90": ("{:.2f}ms", None),
-            "p95": ("{:.2f}ms", None),
-            "[bold]p99[/bold]": ("[bold]{:.2f}ms[/bold]", None),
             "max": ("{:.2f}ms", None),
+            "expected_interval": ("{:.2f}ms", None),
             "stdev": ("{:.2f}ms", None),
+            "client_cpu_per_request": ("{:.3f}ms", None),
+            "client_cpu_usage": ("{:.1f}%", None),
+            "transferred": ("{:.3f}MB", None),
+            "bandwidth": ("{:.3f}MB/s", None),
+            "compression_ratio": ("{:.2f}x", None),
         }
          
 
@@ -387,30 +977,130 @@ def report_load(data: dict, threshold_p95: int = 500, threshold_p99: int = 5000)
             formatting,
             )
         
-        plot = histogram(success_times)
+        plots = []
+        if successes.count:
+            plots.append(Group(Text("\n"*1), histogram(successes)))
+        successes_columns = Columns([table, *percentiles_tables, *plots], equal=False, expand=True)
 
-        fmt_plot = Group(Text("\n"*1), plot)
-        successes_columns = Columns([table, fmt_plot], equal=False, expand=True)
+        objectives_table = table_from_objectives(objectives)
 
-        if failures:
-            failures_status_codes = collections.Counter([r["status_code"] for r in failures])        
-            failures_table = table_from_dict(
+        failures_tables = []
+        if failures_status_codes:
+            failures_tables.append(table_from_dict(
                 failures_status_codes, 
                 "Status code of failed requests", 
                 "N", 
                 "",
-                )
-            panel_content = Group(successes_columns, failures_table)
+                ))
+        if recorder.errors:
+            failures_tables.append(table_from_errors(recorder.errors))
+
+        if failures_tables:
+            panel_content = Group(successes_columns, Columns([objectives_table, *failures_tables]))
 
         else:
-            panel_content = Group(successes_columns)
+            panel_content = Group(successes_columns, objectives_table)
+
+        if recorder.error_bodies.bodies:
+            panel_content = Group(panel_content, table_from_error_bodies(recorder.error_bodies))
+
+        series = recorder.series
+        if series.rows:
+            panel_content = Group(panel_content, time_series(series))
 
         console.print(Panel(panel_content, title=f"{endpoint=}"))
+
+    if warmups:
+        console.print(table_from_warmups(warmups))
+
+    if aborts:
+        command_level_success = False
+        console.print(Panel("\n".join(aborts), title="Aborted, partial results", style="red"))
     
     return command_level_success
 
 
 
+def report_capacity(capacities: dict[str, list[CapacityStep]]) -> bool:
+    """Display the steps of the capacity search of each endpoint, from the lowest rate, and its capacity.
+
+    Latencies are measured from the intended send times of the requests.
+
+    Returns:
+        bool: Whether every endpoint sustained at least one rate.
+    """
+    success = True
+    for endpoint, steps in capacities.items():
+        best = capacity(steps)
+        success &= best is not None
+
+        table = Table(title="Steps", box=box.ROUNDED)
+        for column in ("Rate", "Throughput", "p50", "p95", "p99", "Errors"):
+            table.add_column(column, justify="right")
+        table.add_column("Objectives")
+        for step in sorted(steps, key=lambda step: step.rate):
+            emojy, _, color, _ = interpret(step.sustainable)
+            percentiles = [f"{step.percentiles[p]:.1f}ms" if p in step.percentiles else "-" for p in (50, 95, 99)]
+            table.add_row(
+                f"{step.rate:.1f}/s",
+                f"{step.throughput:.1f}/s",
+                *percentiles,
+                f"{step.error_rate:.2f}%",
+                f"{emojy} [{color}]{', '.join(step.broken)}[/{color}]",
+                style="bold" if step is best else None,
+            )
+
+        if best is None:
+            summary = Text("No sustainable rate, even the lowest one broke the objectives", style="red")
+        else:
+            summary = Text(f"Max sustainable throughput: {best.throughput:.2f}/s, at {best.rate:.2f} requests/s", style="green")
+        console.print(Panel(Group(table, summary), title=f"{endpoint=}"))
+
+    return success
+
+
+def report_comparison(comparisons: dict[str, typing.Tuple[RunSummary | None, list[Comparison]]]) -> bool:
+    """Display the p95, p99, throughput and response size of each endpoint against its baseline.
+
+    Args:
+        comparisons (dict): The baseline of each endpoint, None if there is none, and the comparisons to it.
+
+    Returns:
+        bool: Whether no metric significantly regressed.
+    """
+    table = Table(title="Comparison to the baseline", box=box.ROUNDED)
+    table.add_column("Endpoint", style="cyan", no_wrap=True)
+    table.add_column("Baseline")
+    table.add_column("Metric")
+    for column in ("Baseline", "Current", "Change"):
+        table.add_column(column, justify="right")
+    table.add_column("", justify="center")
+
+    success = True
+    for endpoint, (baseline, endpoint_comparisons) in comparisons.items():
+        if baseline is None:
+            table.add_row(endpoint, "-", "no baseline", "", "", "", "")
+            continue
+        run = f"{baseline.revision[:8]} {time.strftime('%Y-%m-%d %H:%M', time.localtime(baseline.timestamp))}"
+        for comparison in endpoint_comparisons:
+            unit = {"throughput": "/s", "size": "KB"}.get(comparison.metric, "ms")
+            emojy, _, color, _ = interpret(not comparison.regression)
+            table.add_row(
+                endpoint,
+                run,
+                comparison.metric,
+                f"{comparison.baseline:.2f}{unit}",
+                f"{comparison.current:.2f}{unit}",
+                f"[{color}]{comparison.change:+.1f}%[/{color}]",
+                emojy,
+            )
+            endpoint, run = "", ""
+            success &= not comparison.regression
+
+    Console().print(table)
+    return success
+
+
 def report_inspect(data: dict, code_threshold: int=300) -> bool:
 
     show_header = True
@@ -445,8 +1135,8 @@ def report_inspect(data: dict, code_threshold: int=300) -> bool:
 ###############
 
 
-def main() -> bool:
-
+def main() -> int:
+    """Run the command and return the exit code of the process, 0 when successful."""
     # out: dict[str, dict[str, int | str | dict[str, typing.Any]]] = {}
     success = True
     args = parse_args()
@@ -454,14 +1144,18 @@ def main() -> bool:
     logger.debug(args)
 
     success &= command(scenery.commands.scenery_setup)(args)
-    if args.command in ["integration", "load"]:
+    if args.command in ["integration", "load", "load-agent"]:
         success &= command(scenery.commands.django_setup)(args)
 
     if args.command == "integration":
         success &= command(scenery.commands.integration_tests)(args)
     elif args.command == "load":
         success &= command(scenery.commands.load_tests)(args)
+    elif args.command == "load-agent":
+        success &= command(scenery.commands.load_agent)(args)
+    elif args.command == "analyze":
+        success &= command(scenery.commands.analyze_log)(args)
     elif args.command == "inspect":
         success &= command(scenery.commands.inspect_code)(args)
 
-    return success
+    return 0 if success else 1
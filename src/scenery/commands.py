@@ -1,8 +1,10 @@
 import argparse
+import contextlib
 import importlib
 import os
 from pathlib import Path
 import sys
+import time
 import typing
 
 
@@ -126,22 +128,135 @@ def integration_tests(args: argparse.Namespace) -> bool:
 # LOAD TESTS
 ###################
 
+# The results, objectives and aborts of the load tests of a manifest
+LoadRun = typing.Tuple[dict, dict, list[str]]
+
+
 def load_tests(args: argparse.Namespace) -> bool:
     # NOTE mad: this needs to be loaded after scenery_setup and django_setup
-    from scenery.core import process_manifest_as_load_test
+    from scenery.core import (
+        process_manifest_as_capacity_search,
+        process_manifest_as_load_test,
+        process_manifests_as_mixed_load_test,
+    )
+    from scenery.load_history import LoadHistory, compare, git_revision, summarize_run
+    from scenery.load_metrics import Recorder, export_series
 
-    success = True
-    report_data : dict[str, typing.List] = {}
+    from scenery.load_distributed import Coordinator, load_secret
 
-    for filename in iter_on_manifests(args):        
-        results = process_manifest_as_load_test(filename, args=args)
-        file_level_success = scenery.cli.report_load(results)
+    coordinator = Coordinator(args.coordinator, load_secret()) if args.coordinator else None
+    dashboard = scenery.cli.LiveDashboard() if args.live else None
+    live_queue = dashboard.queue if dashboard else None
+
+    success = True
+    report_data : dict[str, Recorder] = {}
+
+    # NOTE mad: the history is only opened, and created, once a run is saved or compared
+    history: LoadHistory | None = None
+
+    def open_history() -> LoadHistory:
+        nonlocal history
+        if history is None:
+            history = LoadHistory(args.history)
+        return history
+
+    revision = git_revision() or "unknown"
+    baseline_revision = None
+    if args.compare not in (None, "latest"):
+        baseline_revision = git_revision(args.compare) or args.compare
+
+    def report(manifest: str, run: LoadRun) -> bool:
+        results, slos, aborts = run
+        file_level_success = scenery.cli.report_load(
+            results, slos, expected_interval=args.expected_interval, aborts=aborts
+        )
         report_data.update(results)
-        success &= file_level_success
+
+        summaries = summarize_run(manifest, results, revision, time.time())
+        if args.compare:
+            comparisons = {}
+            for summary in summaries:
+                baseline = open_history().baseline(manifest, summary.endpoint, baseline_revision)
+                comparisons[summary.endpoint] = (baseline, compare(baseline, summary) if baseline else [])
+            file_level_success &= scenery.cli.report_comparison(comparisons)
+
+        # NOTE mad: partial results of aborted runs would be misleading baselines
+        if aborts:
+            logger.warning(f"{manifest} aborted, not saved to {args.history}")
+        else:
+            open_history().save(summaries)
+        return file_level_success
+
+    # NOTE mad: with the live dashboard, reports are displayed once all manifests ran, not to
+    # interleave with it, and the runs which completed are still reported if a later one fails
+    deferred: list[typing.Tuple[str, LoadRun]] = []
+
+    def done(manifest: str, run: LoadRun) -> None:
+        nonlocal success
+        if dashboard:
+            deferred.append((manifest, run))
+        else:
+            success &= report(manifest, run)
+
+    capacities = {}
+    try:
+        with coordinator or contextlib.nullcontext(), dashboard or contextlib.nullcontext():
+            if args.find_capacity:
+                for filename in iter_on_manifests(args):
+                    capacities.update(process_manifest_as_capacity_search(filename, args, live_queue, coordinator))
+            elif args.mix:
+                filenames = list(iter_on_manifests(args))
+                manifest = "+".join(sorted(filename.replace(".yml", "") for filename in filenames))
+                done(manifest, process_manifests_as_mixed_load_test(filenames, args, live_queue, coordinator))
+            else:
+                for filename in iter_on_manifests(args):
+                    done(
+                        filename.replace(".yml", ""),
+                        process_manifest_as_load_test(filename, args=args, live_queue=live_queue, coordinator=coordinator),
+                    )
+    finally:
+        for manifest, run in deferred:
+            success &= report(manifest, run)
+        if history is not None:
+            history.close()
+
+    if args.find_capacity:
+        return scenery.cli.report_capacity(capacities)
+
+    if args.export:
+        export_series(report_data, args.export)
+        logger.info(f"time series exported to {args.export}")
 
     return success
 
 
+def load_agent(args: argparse.Namespace) -> bool:
+    """Serve the load tests of coordinators until interrupted."""
+    from scenery.load_distributed import load_secret, serve_agent
+
+    try:
+        serve_agent(args.listen, args.processes, load_secret())
+    except KeyboardInterrupt:
+        logger.info("load agent stopped")
+    return True
+
+
+def analyze_log(args: argparse.Namespace) -> bool:
+    """Report the results of the requests of a request log kept by the filters of the arguments."""
+    from scenery.load_log import LogFilter, analyze_log
+
+    log_filter = LogFilter(args.since, args.until, args.endpoints, args.statuses)
+    analysis = analyze_log(args.request_log, log_filter)
+    logger.info(f"{analysis.records=}")
+    logger.info(f"{analysis.matched=}")
+
+    if not analysis.matched:
+        logger.warning(f"no request of {args.request_log} matches the filters")
+        return False
+
+    return scenery.cli.report_load(dict(analysis.data))
+
+
 ###################
 # CODE
 ###################
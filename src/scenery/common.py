@@ -2,8 +2,10 @@
 
 import argparse
 from collections import Counter
+import multiprocessing.queues
 import os
 import logging
+import types
 import typing
 import unittest
 from typing import TypeVar, Union
@@ -18,6 +20,8 @@ from selenium.webdriver.chrome.options import Options
 # from selenium.webdriver.chrome.service import Service
 
 from scenery import console, logger
+from scenery.load_metrics import Recorder
+from scenery.manifest import AbortPolicy, LoadProfile, SetUpInstruction, SLO
 
 import yaml
 
@@ -82,9 +86,32 @@ class LoadTestCase(unittest.TestCase):
     session: requests.Session
     headers: dict[str, str]
     base_url: str
-    data: dict[str, typing.List[dict[str, int|float]]]
+    data: dict[str, Recorder]
     users:int
     requests_per_user:int
+    engine: str = "threads"
+    rate: float | None = None
+    arrival: str = "fixed"
+    store: str = "histogram"
+    load_profile: LoadProfile | None = None
+    # NOTE mad: defaults shared by all the subclasses are immutable, MetaTest gives each class its own
+    slos: typing.Mapping[str, SLO] = types.MappingProxyType({})
+    think_time: typing.Tuple[float, float] = (0.0, 0.0)
+    connect_timeout: float | None = 10.0
+    read_timeout: float | None = 30.0
+    set_up_user: typing.Sequence[SetUpInstruction] = ()
+    feeders: typing.Mapping[str, str] = types.MappingProxyType({})
+    records: typing.Mapping[str, dict] = types.MappingProxyType({})
+    warmup_duration: float = 0.0
+    warmup_requests: int = 0
+    prewarm: bool = False
+    accept_encoding: str | None = None
+    abort_policy: AbortPolicy | None = None
+    abort_reason: str | None = None
+    live_queue: multiprocessing.queues.Queue | None = None
+    request_log: str | None = None
+    process_index: int = 0
+    processes: int = 1
 
 
 SceneryTestCaseTypes = Union[DjangoBackendTestCase, DjangoFrontendTestCase, RemoteBackendTestCase, RemoteFrontendTestCase, LoadTestCase]
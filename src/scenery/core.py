@@ -1,14 +1,24 @@
 """Build the tests from the Manifest, discover & run tests."""
 
 import argparse
+import collections
+import dataclasses
+import math
+import multiprocessing
+import multiprocessing.queues
 import os
+from queue import Empty
 import sys
 # import io
-from typing import Tuple #, cast, Type
+import typing
+from typing import Sequence, Tuple #, cast, Type
 import unittest
 
 from scenery import logger
-from scenery.manifest import Manifest
+from scenery.manifest import DEFAULT_SLO, Manifest, SLO, Take
+from scenery.load_capacity import CAPACITY_START_RATE, CapacityStep, next_rate
+from scenery.load_distributed import Coordinator
+from scenery.load_metrics import RECORDERS, WARMUP, Recorder
 from scenery.method_builder import MethodBuilder
 from scenery.manifest_parser import ManifestParser
 from scenery.common import (
@@ -57,6 +67,19 @@ class MetaTest(type):
         driver: webdriver.Chrome | None=None,
         users: int | None=None,
         requests_per_user: int | None=None,
+        engine: str | None=None,
+        rate: float | None=None,
+        arrival: str | None=None,
+        store: str | None=None,
+        mix: bool=False,
+        journey: bool=False,
+        think_time: Tuple[float, float] | None=None,
+        connect_timeout: float | None=None,
+        read_timeout: float | None=None,
+        warmup: int | float | None=None,
+        prewarm: bool=False,
+        accept_encoding: str | None=None,
+        request_log: str | None=None,
     ) -> "MetaTest":
         """Responsible for building the TestCase class.
 
@@ -64,6 +87,18 @@ class MetaTest(type):
             clsname (str): The name of the class being created.
             bases (tuple): The base classes of the class being created.
             manifest (Manifest): The manifest containing test cases and scenes.
+            mix (bool): For load tests, build a single `test_mix` sending all the takes
+                at the same time instead of one test per take.
+            journey (bool): For load tests, build one `test_journey_<case_id>` per case, in which
+                each user walks through the scenes in order, instead of one test per take.
+            think_time (tuple[float, float] | None): For journeys, the bounds in seconds of the
+                pause of a user between two scenes.
+            warmup (int | float | None): For load tests, the number of requests (int) or the
+                seconds (float) at the start of the run recorded apart from the results.
+            prewarm (bool): For load tests, open the connections of each user before its first request.
+            accept_encoding (str | None): For load tests, the Accept-Encoding header of the requests,
+                e.g. 'gzip' or 'identity', instead of the one of the manifest or of the engine.
+            request_log (str | None): For load tests, the `.bin` or `.jsonl` file every result is appended to.
 
         Returns:
             type: A new test class with dynamically created test methods.
@@ -85,10 +120,43 @@ class MetaTest(type):
             "setUp": setUp,
             "mode": mode,
         }
+        if manifest.load:
+            cls_attrs["load_profile"] = manifest.load
+            cls_attrs["users"] = manifest.load.users
+        if manifest.set_up_user:
+            cls_attrs["set_up_user"] = list(manifest.set_up_user)
+        if manifest.feeders:
+            cls_attrs["feeders"] = dict(manifest.feeders)
+        if manifest.abort:
+            cls_attrs["abort_policy"] = manifest.abort
         if users:
             cls_attrs["users"] = users
         if requests_per_user:
             cls_attrs["requests_per_user"] = requests_per_user
+        if engine:
+            cls_attrs["engine"] = engine
+        if rate:
+            cls_attrs["rate"] = rate
+        if arrival:
+            cls_attrs["arrival"] = arrival
+        if store:
+            cls_attrs["store"] = store
+        if think_time:
+            cls_attrs["think_time"] = think_time
+        if connect_timeout:
+            cls_attrs["connect_timeout"] = connect_timeout
+        if read_timeout:
+            cls_attrs["read_timeout"] = read_timeout
+        if isinstance(warmup, int):
+            cls_attrs["warmup_requests"] = warmup
+        elif warmup:
+            cls_attrs["warmup_duration"] = warmup
+        if prewarm:
+            cls_attrs["prewarm"] = prewarm
+        if accept_encoding:
+            cls_attrs["accept_encoding"] = accept_encoding
+        if request_log:
+            cls_attrs["request_log"] = request_log
 
         if bases == (DjangoFrontendTestCase,) or bases == (RemoteFrontendTestCase,):
             # NOTE mad: used to close the driver
@@ -99,6 +167,9 @@ class MetaTest(type):
         # Add test_* functions
         ####################################
 
+        slos: dict[str, SLO] = {}
+        mixed_takes = []
+        journeys: dict[str, list[Take]] = collections.defaultdict(list)
         for case_id, scene_pos, take in manifest.iter_on_takes(
             only_url,
             only_case_id,
@@ -112,11 +183,28 @@ class MetaTest(type):
             ] :
                 test = MethodBuilder.build_test_integration(take)
             elif bases == (LoadTestCase,):
-                test = MethodBuilder.build_test_load(take)
+                if take.slo:
+                    slos[take.endpoint] = take.slo
+                if mix:
+                    mixed_takes.append(take)
+                    continue
+                if journey:
+                    journeys[case_id].append(take)
+                    continue
+                test = MethodBuilder.build_test_load([take])
             else:
                 raise NotImplementedError(bases)
             cls_attrs.update({f"test_case_{case_id}_scene_{scene_pos}": test})
 
+        if mixed_takes:
+            cls_attrs["test_mix"] = MethodBuilder.build_test_load(mixed_takes)
+        for case_id, takes in journeys.items():
+            # NOTE mad: load tests classes are named after their manifest
+            journey_name = f"journey {clsname.removesuffix('.load')}:{case_id}"
+            cls_attrs[f"test_journey_{case_id}"] = MethodBuilder.build_test_load(takes, journey_name)
+            slos[journey_name] = SLO.from_steps([take.slo or DEFAULT_SLO for take in takes])
+        cls_attrs["slos"] = slos
+
         test_cls = super().__new__(cls, clsname, bases, cls_attrs)
         return test_cls  
 
@@ -125,6 +213,10 @@ class MetaTest(type):
 ########################
 
 
+# NOTE mad: how often, in seconds, the results of worker processes are polled for dead workers
+GATHER_TICK = 1.0
+
+
 
 class TestsRunner:
     """
@@ -176,7 +268,137 @@ class TestsRunner:
         results = self.runner.run_suite(tests_discovered)
         return results
 
+    def run_load_in_processes(
+        self, test: LoadTestCase, processes: int, indices: range | None = None
+    ) -> Tuple[dict, list[str], list[str]]:
+        """
+        Run a load test split across several worker processes and merge their results.
 
+        The users of the test are spread as evenly as possible between the processes,
+        each of them running the test with its own share of users. When the test follows
+        a load profile, every process runs its share of the stages instead. Processes are
+        forked so that they inherit the scenery and django set-up of the parent.
+
+        Args:
+            test (LoadTestCase): The load test to run.
+            processes (int): The number of worker processes.
+            indices (range | None): The indices of the processes to run here, all by default,
+                the others running elsewhere, e.g. on load agents.
+
+        Returns:
+            Tuple[dict, list[str], list[str]]: The merged `LoadTestCase.data`, the tracebacks of the errors
+            raised in the workers and the reasons why workers aborted, each of them watching its own requests.
+        """
+        context = multiprocessing.get_context("fork")
+        queue = context.Queue()
+
+        def worker(users: int, index: int) -> None:
+            test.users = users
+            test.process_index, test.processes = index, processes
+            test_result = self.run(test)
+            errors = [traceback for _, traceback in test_result.errors]
+            queue.put((os.getpid(), dict(test.data), errors, [test.abort_reason] if test.abort_reason else []))
+
+        shares = [test.users // processes + (i < test.users % processes) for i in range(processes)]
+        if test.load_profile is not None:
+            shares = [max(users, 1) for users in shares]
+        workers = [
+            context.Process(target=worker, args=(users, index))
+            for index, users in enumerate(shares)
+            if users > 0 and index in (indices or range(processes))
+        ]
+        return self._gather_processes(workers, queue, test.store)
+
+    def run_load(
+        self, test: LoadTestCase, processes: int, indices: range | None = None
+    ) -> Tuple[dict, list[str], list[str]]:
+        """Run a load test, split across worker processes if more than one, and return its data, errors and abort reasons."""
+        if processes > 1:
+            return self.run_load_in_processes(test, processes, indices)
+        test_result = self.run(test)
+        errors = [traceback for _, traceback in test_result.errors]
+        return test.data, errors, [test.abort_reason] if test.abort_reason else []
+
+    def run_loads_concurrently(
+        self, tests: list[LoadTestCase], processes: int, indices: range | None = None
+    ) -> Tuple[dict, list[str], list[str]]:
+        """
+        Run several load tests at the same time and merge their results.
+
+        Each test runs in its own forked process, and is itself split across `processes`
+        worker processes if more than one, so that the endpoints of different manifests
+        are loaded together.
+
+        Args:
+            tests (list[LoadTestCase]): The load tests to run.
+            processes (int): The number of worker processes of each test.
+            indices (range | None): The indices of the worker processes to run here, all by default.
+
+        Returns:
+            Tuple[dict, list[str], list[str]]: The merged `LoadTestCase.data`, the tracebacks of the errors
+            raised in the tests and the reasons why tests aborted.
+        """
+        if not tests:
+            return {}, [], []
+        context = multiprocessing.get_context("fork")
+        queue = context.Queue()
+
+        def worker(test: LoadTestCase) -> None:
+            data, errors, aborts = self.run_load(test, processes, indices)
+            queue.put((os.getpid(), dict(data), errors, aborts))
+
+        workers = [context.Process(target=worker, args=(test,)) for test in tests]
+        return self._gather_processes(workers, queue, tests[0].store)
+
+    @staticmethod
+    def _gather_processes(
+        workers: Sequence[multiprocessing.process.BaseProcess], queue: multiprocessing.Queue, store: str
+    ) -> Tuple[dict, list[str], list[str]]:
+        """Start the worker processes and merge the results they put in the queue, with their pid.
+
+        The queue is polled every `GATHER_TICK` seconds, and workers which died without
+        putting their results, e.g. killed by the OOM killer or by a segfault, are reported
+        as errors instead of being waited for. Workers which put their results are not
+        reported, whatever their exit code.
+        """
+        for process in workers:
+            process.start()
+
+        # NOTE mad: the queue is emptied before joining, otherwise workers block on big payloads
+        data: dict[str, Recorder] = collections.defaultdict(RECORDERS[store])
+        errors: list[str] = []
+        aborts: list[str] = []
+        delivered: set[int | None] = set()
+        reported: set[int | None] = set()
+
+        def missing() -> list[multiprocessing.process.BaseProcess]:
+            return [process for process in workers if process.pid not in delivered | reported]
+
+        while missing():
+            # NOTE mad: workers flush their results before exiting, so once none was alive
+            # before polling, an empty queue means the missing results will never come
+            alive = any(process.is_alive() for process in workers)
+            try:
+                pid, worker_data, worker_errors, worker_aborts = queue.get(timeout=GATHER_TICK)
+            except Empty:
+                for process in missing():
+                    if process.exitcode not in (None, 0):
+                        reported.add(process.pid)
+                        errors.append(f"Worker process {process.pid} died with exit code {process.exitcode}")
+                if not alive and (lost := missing()):
+                    reported.update(process.pid for process in lost)
+                    errors.append(f"{len(lost)} worker processes exited without their results")
+                continue
+            delivered.add(pid)
+            for endpoint, recorder in worker_data.items():
+                data[endpoint].merge(recorder)
+            errors.extend(worker_errors)
+            aborts.extend(worker_aborts)
+
+        for process in workers:
+            process.join()
+
+        return data, errors, aborts
 
 
 class TestsDiscoverer:
@@ -203,6 +425,10 @@ class TestsDiscoverer:
     def folder(self) -> str:
         return os.environ["SCENERY_MANIFESTS_FOLDER"]
 
+    def parse_manifest(self, filename: str) -> Manifest:
+        """Return the manifest of a file of the manifests folder."""
+        return ManifestParser.parse_yaml_from_file(os.path.join(self.folder, filename))
+
     def integration_tests_from_manifest(
         self,
         filename: str,
@@ -333,15 +559,30 @@ class TestsDiscoverer:
         mode: str,
         users: int,
         requests_per_user: int,
+        engine: str = "threads",
+        rate: float | None = None,
+        arrival: str = "fixed",
+        store: str = "histogram",
         only_url: str | None = None,
         only_case_id: str | None = None,
         only_scene_pos: str | None = None,
+        mix: bool = False,
+        journey: bool = False,
+        think_time: Tuple[float, float] | None = None,
+        connect_timeout: float | None = None,
+        read_timeout: float | None = None,
+        warmup: int | float | None = None,
+        prewarm: bool = False,
+        accept_encoding: str | None = None,
+        request_log: str | None = None,
+        manifest: Manifest | None = None,
     ) -> unittest.TestSuite:
 
         test_suite = unittest.TestSuite()
 
-        # Parse manifest
-        manifest = ManifestParser.parse_yaml_from_file(os.path.join(self.folder, filename))
+        # Parse manifest, unless already parsed e.g. by the coordinator of load agents
+        if manifest is None:
+            manifest = self.parse_manifest(filename)
         manifest_name = filename.replace(".yml", "")
 
         cls = MetaTest(
@@ -353,7 +594,20 @@ class TestsDiscoverer:
             only_url=only_url,
             mode=mode,
             users=users,
-            requests_per_user=requests_per_user
+            requests_per_user=requests_per_user,
+            engine=engine,
+            rate=rate,
+            arrival=arrival,
+            store=store,
+            mix=mix,
+            journey=journey,
+            think_time=think_time,
+            connect_timeout=connect_timeout,
+            read_timeout=read_timeout,
+            warmup=warmup,
+            prewarm=prewarm,
+            accept_encoding=accept_encoding,
+            request_log=request_log,
         )
 
         # FIXME mad: type hinting mislead by metaclasses
@@ -440,16 +694,14 @@ def process_manifest_as_integration_test(
     return results
 
 
-def process_manifest_as_load_test(
-    manifest_filename: str, args: argparse.Namespace
-) -> dict:
-    results = {}
-
-    logger.info(f"{manifest_filename=}")
-
-    loader = TestsDiscoverer()
-    runner = TestsRunner()
-
+def load_tests_from_args(
+    loader: TestsDiscoverer,
+    manifest_filename: str,
+    args: argparse.Namespace,
+    mix: bool = False,
+    manifest: Manifest | None = None,
+) -> list[LoadTestCase]:
+    """Return the load tests of a manifest, parametrized by the command line arguments."""
     tests_suite = loader.load_tests_from_manifest(
         manifest_filename,
         mode=args.mode,
@@ -458,20 +710,188 @@ def process_manifest_as_load_test(
         only_scene_pos=args.scene_pos,
         users=args.users,
         requests_per_user=args.requests,
+        engine=args.engine,
+        rate=args.rate,
+        arrival=args.arrival,
+        store=args.store,
+        mix=mix,
+        journey=args.journey,
+        think_time=args.think_time,
+        connect_timeout=args.connect_timeout,
+        read_timeout=args.read_timeout,
+        warmup=args.warmup,
+        prewarm=args.prewarm,
+        accept_encoding=args.accept_encoding,
+        request_log=args.request_log,
+        manifest=manifest,
     )
-
+    tests = []
     for test in tests_suite:
         # NOTE mad: we build the suite in order to satisfy this
         assert isinstance(test, LoadTestCase)
+        tests.append(test)
+    return tests
+
+
+def process_manifest_as_load_test(
+    manifest_filename: str,
+    args: argparse.Namespace,
+    live_queue: multiprocessing.queues.Queue | None = None,
+    coordinator: Coordinator | None = None,
+) -> Tuple[dict, dict[str, SLO], list[str]]:
+    """Run the load tests of a manifest and return their results and objectives, by endpoint, and why they aborted.
+
+    Failed requests, including those which got no response, are part of the results. Tests
+    stopped early by the `abort` limits of the manifest still return their partial results.
+    With a `live_queue`, the engines publish their rolling statistics in it during the run.
+    With a `coordinator`, the tests are run by its load agents instead of local processes.
+
+    Raises:
+        RuntimeError: If a load test raised an error, with the tracebacks of the workers.
+    """
+    results = {}
+    slos: dict[str, SLO] = {}
+    aborts: list[str] = []
+
+    logger.info(f"{manifest_filename=}")
+
+    loader = TestsDiscoverer()
+    runner = TestsRunner()
+    manifest = loader.parse_manifest(manifest_filename)
 
-        test_result = runner.run(test)
-        if len(test_result.errors) == 0:
-            results.update(test.data)
+    for test in load_tests_from_args(loader, manifest_filename, args, manifest=manifest):
+
+        test.live_queue = live_queue
+        if coordinator is not None:
+            jobs = [(manifest_filename, manifest, test._testMethodName)]
+            data, errors, test_aborts = coordinator.run_load(jobs, args, live_queue)
         else:
-            print(test_result.errors)
-            raise Exception
+            data, errors, test_aborts = runner.run_load(test, args.processes)
 
-    return results
+        if len(errors) != 0:
+            raise RuntimeError(f"{test.id()} raised {len(errors)} error(s)\n" + "\n".join(errors))
+        results.update(data)
+        slos.update(test.slos)
+        aborts.extend(f"{test.id()}: {reason}" for reason in test_aborts)
+
+    return results, slos, aborts
 
 
+def process_manifests_as_mixed_load_test(
+    manifest_filenames: list[str],
+    args: argparse.Namespace,
+    live_queue: multiprocessing.queues.Queue | None = None,
+    coordinator: Coordinator | None = None,
+) -> Tuple[dict, dict[str, SLO], list[str]]:
+    """Run all the scenes of the manifests at the same time and return their results and objectives, by endpoint, and why they aborted.
 
+    Within a manifest, each request picks a scene by weight. Manifests keep their own
+    set up and load parameters and run concurrently, one process each. With a `live_queue`,
+    the engines publish their rolling statistics in it during the run. With a `coordinator`,
+    the tests are run by its load agents instead of local processes.
+
+    Raises:
+        RuntimeError: If a load test raised an error, with the tracebacks of the workers.
+    """
+    logger.info(f"{manifest_filenames=}")
+
+    loader = TestsDiscoverer()
+    runner = TestsRunner()
+
+    manifests = {manifest_filename: loader.parse_manifest(manifest_filename) for manifest_filename in manifest_filenames}
+    jobs = [
+        (manifest_filename, manifest, test)
+        for manifest_filename, manifest in manifests.items()
+        for test in load_tests_from_args(loader, manifest_filename, args, mix=True, manifest=manifest)
+    ]
+    tests = [test for *_, test in jobs]
+    slos = {endpoint: slo for test in tests for endpoint, slo in test.slos.items()}
+    for test in tests:
+        test.live_queue = live_queue
+
+    if coordinator is not None:
+        data, errors, aborts = coordinator.run_load(
+            [(manifest_filename, manifest, test._testMethodName) for manifest_filename, manifest, test in jobs],
+            args,
+            live_queue,
+        )
+    elif len(tests) == 1:
+        data, errors, aborts = runner.run_load(tests[0], args.processes)
+    else:
+        data, errors, aborts = runner.run_loads_concurrently(tests, args.processes)
+
+    if len(errors) != 0:
+        raise RuntimeError(f"{len(tests)} mixed load test(s) raised {len(errors)} error(s)\n" + "\n".join(errors))
+
+    return data, slos, aborts
+
+
+def process_manifest_as_capacity_search(
+    manifest_filename: str,
+    args: argparse.Namespace,
+    live_queue: multiprocessing.queues.Queue | None = None,
+    coordinator: Coordinator | None = None,
+) -> dict[str, list[CapacityStep]]:
+    """Search the highest arrival rate each scene of a manifest sustains and return the steps of the search, by endpoint.
+
+    Each test is run again and again in open model for `args.step_duration` seconds, starting at
+    `args.rate` if any, with `args.users` users bounding the concurrency, until `next_rate` ends
+    the search. Each user sends at least one request per step, so rates stay above `args.users`
+    per `args.step_duration` for steps not to outlast it. A step is sustainable when all its endpoints meet their latency and error rate
+    objectives and it did not abort. The `load` key of the manifest is ignored.
+
+    Raises:
+        ValueError: If `args.users` is not set.
+        RuntimeError: If a load test raised an error, with the tracebacks of the workers.
+    """
+    if not args.users:
+        raise ValueError("The capacity search needs a number of users, see -u/--users")
+
+    logger.info(f"{manifest_filename=}")
+
+    loader = TestsDiscoverer()
+    runner = TestsRunner()
+    manifest = dataclasses.replace(loader.parse_manifest(manifest_filename), load=None)
+    capacities: dict[str, list[CapacityStep]] = {}
+
+    for test in load_tests_from_args(loader, manifest_filename, args, manifest=manifest):
+        method_name = test._testMethodName
+        start = args.rate or CAPACITY_START_RATE
+        min_rate = args.users / args.step_duration
+        outcomes: list[typing.Tuple[float, bool]] = []
+        rate = next_rate(outcomes, start, min_rate=min_rate)
+
+        while rate is not None:
+            requests_per_user = max(1, math.ceil(rate * args.step_duration / args.users))
+            step_args = argparse.Namespace(**{**vars(args), "rate": rate, "requests": requests_per_user})
+            logger.info(f"{method_name} at {rate:.2f} requests/s")
+
+            if coordinator is not None:
+                data, errors, aborts = coordinator.run_load([(manifest_filename, manifest, method_name)], step_args, live_queue)
+            else:
+                [step_test] = [
+                    step_test
+                    for step_test in load_tests_from_args(loader, manifest_filename, step_args, manifest=manifest)
+                    if step_test._testMethodName == method_name
+                ]
+                step_test.live_queue = live_queue
+                data, errors, aborts = runner.run_load(step_test, args.processes)
+
+            if len(errors) != 0:
+                raise RuntimeError(f"{test.id()} raised {len(errors)} error(s)\n" + "\n".join(errors))
+
+            endpoint_steps = {
+                endpoint: CapacityStep.measure(rate, recorder, test.slos.get(endpoint, DEFAULT_SLO))
+                for endpoint, recorder in data.items()
+                if not endpoint.endswith(WARMUP) and len(recorder)
+            }
+            for endpoint, step in endpoint_steps.items():
+                step.broken.extend(f"aborted: {reason}" for reason in aborts)
+                capacities.setdefault(endpoint, []).append(step)
+
+            # NOTE mad: the steps of all the endpoints of a test are sustainable or not together
+            sustainable = bool(endpoint_steps) and all(step.sustainable for step in endpoint_steps.values())
+            outcomes.append((rate, sustainable))
+            rate = next_rate(outcomes, start, min_rate=min_rate)
+
+    return capacities
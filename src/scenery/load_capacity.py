@@ -0,0 +1,106 @@
+"""Search the highest arrival rate an endpoint sustains within its service level objectives."""
+
+from dataclasses import dataclass
+import typing
+
+from scenery.load_metrics import Recorder
+from scenery.manifest import SLO
+
+
+# NOTE mad: the rate is multiplied by CAPACITY_GROWTH until a step breaks the objectives, then the
+# interval between the last sustainable rate and the first broken one is halved until it is narrower
+# than CAPACITY_PRECISION of the broken rate, within CAPACITY_MAX_STEPS steps. Rates stay above the
+# lowest one a step can have without outlasting its duration, below which there is no sustainable rate
+CAPACITY_START_RATE = 10.0
+CAPACITY_GROWTH = 2.0
+CAPACITY_PRECISION = 0.05
+CAPACITY_MAX_STEPS = 20
+
+# NOTE mad: a rate is not sustained when the successful requests fall behind it, even though the
+# latencies of a short step may still meet the objectives
+CAPACITY_MIN_THROUGHPUT = 0.9
+
+
+@dataclass
+class CapacityStep:
+    """The results of an endpoint at an arrival rate of the capacity search.
+
+    Attributes:
+        rate (float): The arrival rate, in requests per second.
+        requests (int): The number of requests sent, warm-up aside.
+        throughput (float): The number of successful requests per second.
+        error_rate (float): The share of failed requests, in %.
+        percentiles (dict[int, float]): The latency percentiles in ms, measured from the intended send times.
+        broken (list[str]): The objectives not met, e.g. 'p95', sustainable when empty.
+    """
+
+    rate: float
+    requests: int
+    throughput: float
+    error_rate: float
+    percentiles: dict[int, float]
+    broken: list[str]
+
+    @property
+    def sustainable(self) -> bool:
+        """Whether the endpoint met all its objectives at the rate of the step."""
+        return not self.broken
+
+    @classmethod
+    def measure(cls, rate: float, recorder: Recorder, slo: SLO) -> "CapacityStep":
+        """Return the results of an endpoint at a rate, checked against the latency and error rate objectives.
+
+        The throughput objective is left out since it is bounded by the rate of the step, the
+        throughput should reach `CAPACITY_MIN_THROUGHPUT` of the rate instead.
+        """
+        requests = len(recorder)
+        successes = recorder.successes
+        error_rate = (requests - successes.count) / requests * 100 if requests else 0.0
+        # NOTE mad: open-model latencies, the expected interval is only used without send times
+        latencies = recorder.corrected(1 / rate)
+        percentiles = {p: t * 1000 for p, t in latencies.percentiles().items()} if latencies.count else {}
+
+        broken = [
+            f"p{p:g}"
+            for p, target in slo.percentiles.items()
+            if not latencies.count or latencies.percentile(p) * 1000 > target
+        ]
+        if slo.max_error_rate is not None and error_rate > slo.max_error_rate:
+            broken.append("error rate")
+        if recorder.throughput < CAPACITY_MIN_THROUGHPUT * rate:
+            broken.append("throughput")
+        return cls(rate, requests, recorder.throughput, error_rate, percentiles, broken)
+
+
+def next_rate(
+    outcomes: typing.Sequence[typing.Tuple[float, bool]],
+    start: float = CAPACITY_START_RATE,
+    growth: float = CAPACITY_GROWTH,
+    precision: float = CAPACITY_PRECISION,
+    max_steps: int = CAPACITY_MAX_STEPS,
+    min_rate: float = 0.0,
+) -> float | None:
+    """Return the rate of the next step of the search from the rates tried and whether they were sustainable, None once it is over.
+
+    Rates are kept above `min_rate`, the search is over once it is broken.
+    """
+    if not outcomes:
+        return max(start, min_rate)
+    if len(outcomes) >= max_steps:
+        return None
+    broken = [rate for rate, sustainable in outcomes if not sustainable]
+    if not broken:
+        return outcomes[-1][0] * growth
+    high = min(broken)
+    if high <= min_rate:
+        return None
+    low = max((rate for rate, sustainable in outcomes if sustainable and rate < high), default=0.0)
+    if high - low <= precision * high:
+        return None
+    return max((low + high) / 2, min_rate)
+
+
+def capacity(steps: typing.Sequence[CapacityStep]) -> CapacityStep | None:
+    """Return the sustainable step with the highest throughput, None if no step was sustainable."""
+    sustainable = [step for step in steps if step.sustainable]
+    return max(sustainable, key=lambda step: step.throughput) if sustainable else None
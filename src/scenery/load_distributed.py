@@ -0,0 +1,361 @@
+"""Spread load tests over load agents, possibly on other machines, driven by a coordinator."""
+
+import argparse
+import collections
+import contextlib
+import hashlib
+import hmac
+import multiprocessing
+import multiprocessing.queues
+import os
+import pickle
+import queue
+import socket
+import struct
+import threading
+import time
+import traceback
+import typing
+
+from scenery import logger
+from scenery.load_metrics import LIVE_TICK, RECORDERS, Recorder
+from scenery.manifest import Manifest
+
+
+###################
+# PROTOCOL
+###################
+
+
+# NOTE mad: frames are pickled, so that manifests, arguments and recorders are shipped as they are,
+# and signed with a secret shared by the coordinator and its agents, payloads whose signature does not
+# match are never unpickled
+FRAME_HEADER = struct.Struct(">I")
+FRAME_DIGEST = hashlib.sha256
+FRAME_DIGEST_SIZE = FRAME_DIGEST().digest_size
+
+SECRET_VARIABLE = "SCENERY_LOAD_SECRET"
+
+DEFAULT_AGENT_ADDRESS = "127.0.0.1:7913"
+
+# NOTE mad: how long after all the agents are ready they start, so that the start frame reaches them
+START_DELAY = 0.5
+
+Address = str | typing.Tuple[str, int]
+
+# NOTE mad: a job is the filename of a manifest, the manifest as parsed by the coordinator and the name of a test method
+Job = typing.Tuple[str, Manifest, str]
+
+
+def load_secret() -> bytes:
+    """Return the secret shared by the coordinator and its agents, read from the `SCENERY_LOAD_SECRET` variable.
+
+    Raises:
+        ValueError: If the variable is not set or empty.
+    """
+    if not (secret := os.environ.get(SECRET_VARIABLE)):
+        raise ValueError(f"{SECRET_VARIABLE} must be set to the same secret for the coordinator and its load agents")
+    return secret.encode("utf8")
+
+
+def parse_address(value: str) -> Address:
+    """Return a `host:port` TCP address as a tuple, anything else being the path of a Unix socket."""
+    host, _, port = value.rpartition(":")
+    if host and port.isdigit() and "/" not in value:
+        return host, int(port)
+    return value.removeprefix("unix:")
+
+
+def connect(address: Address) -> socket.socket:
+    """Return a socket connected to a TCP or Unix address."""
+    if isinstance(address, tuple):
+        return socket.create_connection(address)
+    connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    connection.connect(address)
+    return connection
+
+
+def listen(address: Address) -> socket.socket:
+    """Return a socket listening on a TCP or Unix address, replacing a stale Unix socket."""
+    if isinstance(address, tuple):
+        return socket.create_server(address)
+    if os.path.exists(address):
+        os.unlink(address)
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(address)
+    server.listen()
+    return server
+
+
+def send_frame(connection: socket.socket, message: tuple, secret: bytes) -> None:
+    """Send a message prefixed by its length and signature."""
+    payload = pickle.dumps(message)
+    signature = hmac.digest(secret, payload, FRAME_DIGEST)
+    connection.sendall(FRAME_HEADER.pack(len(payload)) + signature + payload)
+
+
+def recv_exactly(connection: socket.socket, size: int) -> bytes | None:
+    """Return the next `size` bytes received, None if the peer closed the connection before."""
+    chunks = bytearray()
+    while len(chunks) < size:
+        chunk = connection.recv(size - len(chunks))
+        if not chunk:
+            return None
+        chunks += chunk
+    return bytes(chunks)
+
+
+def recv_frame(connection: socket.socket, secret: bytes) -> tuple | None:
+    """Return the next message received, None if the peer closed the connection.
+
+    Raises:
+        ConnectionError: If the message is not signed with the secret.
+    """
+    header = recv_exactly(connection, FRAME_HEADER.size + FRAME_DIGEST_SIZE)
+    if header is None:
+        return None
+    (size,) = FRAME_HEADER.unpack_from(header)
+    payload = recv_exactly(connection, size)
+    if payload is None:
+        return None
+    if not hmac.compare_digest(header[FRAME_HEADER.size:], hmac.digest(secret, payload, FRAME_DIGEST)):
+        raise ConnectionError("Frame with an invalid signature, the peer does not share the secret")
+    message: tuple = pickle.loads(payload)
+    return message
+
+
+###################
+# COORDINATOR
+###################
+
+
+class AgentConnection(typing.NamedTuple):
+    """A load agent the coordinator is connected to, named by its address."""
+
+    name: str
+    connection: socket.socket
+    processes: int
+
+
+class Coordinator:
+    """Run load tests on load agents and merge their results.
+
+    Each agent announces how many worker processes it runs. The processes of all the agents
+    are numbered in turn and split the users, stages and warm-up of a test as the processes of
+    a single machine would. For each test, the coordinator ships the parsed manifest, the name of
+    the test and the load arguments, waits for all the agents to be ready and has them start
+    at the same time. Agents stream the snapshots of their live statistics during the run,
+    then send their recorders, merged by endpoint. Frames are signed with a secret shared
+    by the coordinator and its agents.
+
+    Usage:
+        with Coordinator(["127.0.0.1:7913", "127.0.0.1:7914"]) as coordinator:
+            ... # run load tests with `coordinator=coordinator`
+
+    Args:
+        addresses (list[str]): The `host:port` or Unix socket path of each agent.
+        secret (bytes): The secret shared with the agents, see `load_secret`.
+    """
+
+    def __init__(self, addresses: list[str], secret: bytes) -> None:
+        self.secret = secret
+        self.agents: list[AgentConnection] = []
+        for address in addresses:
+            connection = connect(parse_address(address))
+            hello = recv_frame(connection, secret)
+            if hello is None or hello[0] != "hello":
+                raise ConnectionError(f"Load agent {address} did not say hello")
+            _, processes = hello
+            self.agents.append(AgentConnection(address, connection, processes))
+            logger.info(f"load agent {address} connected with {processes} process(es)")
+
+    def __enter__(self) -> "Coordinator":
+        return self
+
+    def __exit__(self, *exc_info: typing.Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Close the connections to the agents, which then wait for another coordinator."""
+        for agent in self.agents:
+            agent.connection.close()
+
+    @property
+    def processes(self) -> int:
+        """The number of worker processes of all the agents."""
+        return sum(agent.processes for agent in self.agents)
+
+    def run_load(
+        self, jobs: list[Job], args: argparse.Namespace, live_queue: multiprocessing.queues.Queue | None = None
+    ) -> typing.Tuple[dict, list[str], list[str]]:
+        """Run load tests on all the agents at the same time and return their data, errors and abort reasons.
+
+        Several jobs are run concurrently, as mixed workloads are. With a `live_queue`, the
+        snapshots streamed by the agents are put in it.
+        """
+        offset = 0
+        for agent in self.agents:
+            indices = (offset, offset + agent.processes)
+            send_frame(
+                agent.connection, ("job", jobs, args, indices, self.processes, live_queue is not None), self.secret
+            )
+            offset += agent.processes
+
+        errors: list[str] = []
+        for agent in self.agents:
+            reply = recv_frame(agent.connection, self.secret)
+            if reply is None:
+                errors.append(f"load agent {agent.name} disconnected")
+            elif reply[0] == "failed":
+                errors.append(f"load agent {agent.name}: {reply[1]}")
+        if errors:
+            for agent in self.agents:
+                with contextlib.suppress(OSError):
+                    send_frame(agent.connection, ("cancel",), self.secret)
+            return {}, errors, []
+
+        start_at = time.time() + START_DELAY
+        for agent in self.agents:
+            send_frame(agent.connection, ("start", start_at), self.secret)
+
+        results: list[typing.Tuple[dict, list[str], list[str]]] = []
+
+        def gather(agent: AgentConnection) -> None:
+            while (message := recv_frame(agent.connection, self.secret)) is not None:
+                if message[0] == "live" and live_queue is not None:
+                    # NOTE mad: the processes of different agents may have the same pid
+                    pid, sent, snapshots = message[1]
+                    live_queue.put(((agent.name, pid), sent, snapshots))
+                elif message[0] == "result":
+                    results.append(message[1:])
+                    return
+            results.append(({}, [f"load agent {agent.name} disconnected"], []))
+
+        threads = [threading.Thread(target=gather, args=(agent,)) for agent in self.agents]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        data: dict[str, Recorder] = collections.defaultdict(RECORDERS[args.store])
+        aborts: list[str] = []
+        for agent_data, agent_errors, agent_aborts in results:
+            for endpoint, recorder in agent_data.items():
+                data[endpoint].merge(recorder)
+            errors.extend(agent_errors)
+            aborts.extend(agent_aborts)
+        return data, errors, aborts
+
+
+###################
+# AGENT
+###################
+
+
+class LoadAgent:
+    """Run the load tests shipped by a coordinator over a connection, with its own worker processes.
+
+    Args:
+        connection (socket.socket): The connection to the coordinator.
+        processes (int): The number of worker processes of the agent.
+        secret (bytes): The secret shared with the coordinator, see `load_secret`.
+    """
+
+    def __init__(self, connection: socket.socket, processes: int, secret: bytes) -> None:
+        self.connection = connection
+        self.processes = processes
+        self.secret = secret
+        self.lock = threading.Lock()
+
+    def send(self, message: tuple) -> None:
+        """Send a message to the coordinator, from any thread."""
+        with self.lock:
+            send_frame(self.connection, message, self.secret)
+
+    def serve(self) -> None:
+        """Run the jobs of the coordinator until it closes the connection.
+
+        A job which fails once started is reported to the coordinator as the error of its run.
+        """
+        self.send(("hello", self.processes))
+        while (message := recv_frame(self.connection, self.secret)) is not None:
+            if message[0] != "job":
+                continue
+            _, jobs, args, (start, stop), processes, live = message
+            try:
+                self.run(jobs, args, range(start, stop), processes, live)
+            except Exception:
+                error = traceback.format_exc()
+                logger.error(f"job failed\n{error}")
+                self.send(("result", {}, [f"job failed\n{error}"], []))
+
+    def run(self, jobs: list[Job], args: argparse.Namespace, indices: range, processes: int, live: bool) -> None:
+        """Build the tests of the jobs, wait for the start of the coordinator, run them and send the results."""
+        try:
+            # NOTE mad: this needs to be loaded after scenery_setup and django_setup
+            from scenery.core import TestsDiscoverer, TestsRunner, load_tests_from_args
+
+            loader = TestsDiscoverer()
+            runner = TestsRunner()
+            tests = [
+                test
+                for manifest_filename, manifest, method_name in jobs
+                for test in load_tests_from_args(loader, manifest_filename, args, mix=args.mix, manifest=manifest)
+                if test._testMethodName == method_name
+            ]
+        except Exception:
+            self.send(("failed", traceback.format_exc()))
+            return
+        self.send(("ready",))
+
+        message = recv_frame(self.connection, self.secret)
+        if message is None or message[0] != "start":
+            return
+        _, start_at = message
+        logger.info(f"running {[test.id() for test in tests]} with processes {list(indices)} of {processes}")
+
+        live_queue = multiprocessing.get_context("fork").Queue() if live else None
+        for test in tests:
+            test.live_queue = live_queue
+        stop = threading.Event()
+
+        def forward() -> None:
+            assert live_queue is not None
+            while not stop.is_set() or not live_queue.empty():
+                try:
+                    self.send(("live", live_queue.get(timeout=LIVE_TICK)))
+                except queue.Empty:
+                    pass
+
+        forwarder = threading.Thread(target=forward, daemon=True)
+        if live_queue is not None:
+            forwarder.start()
+
+        time.sleep(max(0.0, start_at - time.time()))
+        if len(tests) == 1:
+            data, errors, aborts = runner.run_load(tests[0], processes, indices)
+        else:
+            data, errors, aborts = runner.run_loads_concurrently(tests, processes, indices)
+
+        stop.set()
+        if live_queue is not None:
+            forwarder.join()
+        self.send(("result", dict(data), errors, aborts))
+
+
+def serve_agent(address: str, processes: int, secret: bytes) -> None:
+    """Listen on an address and serve the coordinators one after the other, until interrupted.
+
+    A coordinator which fails, e.g. because it does not share the secret, is disconnected
+    and the agent waits for the next one.
+    """
+    with listen(parse_address(address)) as server:
+        logger.info(f"load agent listening on {address} with {processes} process(es)")
+        while True:
+            connection, _ = server.accept()
+            with connection:
+                try:
+                    LoadAgent(connection, processes, secret).serve()
+                except Exception:
+                    logger.error(f"coordinator failed\n{traceback.format_exc()}")
+            logger.info("coordinator disconnected")
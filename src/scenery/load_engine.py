@@ -0,0 +1,1421 @@
+"""Send the requests of a load test, simulating users either with threads or with coroutines."""
+
+import abc
+import asyncio
+import collections
+import contextlib
+import copy
+import csv
+import http
+import http.cookies
+import itertools
+import json
+import math
+import os
+import random
+import socket
+import ssl
+import threading
+import time
+import typing
+from urllib.parse import urlencode, urlsplit
+import zlib
+
+import requests
+import urllib3
+from requests.adapters import HTTPAdapter
+
+from scenery import logger
+from scenery.common import LoadTestCase
+from scenery.load_log import RequestLog
+from scenery.load_metrics import ERROR_BODY_MAX, ERRORS, LIVE_TICK, WARMUP, LiveStats
+from scenery.manifest import AbortPolicy, LoadExecutor, LoadProfile, SetUpInstruction, Take, feed_recursively
+from scenery.set_up_handler import SetUpHandler
+
+# NOTE mad: brotli is optional, br bodies are only counted as received when it is not installed
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+###################
+# SCHEDULE
+###################
+
+
+class ArrivalSchedule:
+    """Intended send times of the requests of an open-model load test.
+
+    Requests are scheduled at a fixed rate, or following a Poisson process with
+    the same mean rate, regardless of the response times. Users take the next
+    slot when they are free, so a slow server makes requests late rather than
+    reducing the offered load. The lateness is recorded with each result as
+    `send_delay`.
+
+    Args:
+        rate (float): The number of requests per second.
+        total (int): The total number of requests to schedule.
+        arrival (str): Either "fixed" or "poisson".
+    """
+
+    def __init__(self, rate: float, total: int, arrival: str = "fixed") -> None:
+        if rate <= 0:
+            raise ValueError(f"Arrival rate should be positive not '{rate}'")
+        self.rate = rate
+        self.remaining = total
+        self.arrival = arrival
+        self.lock = threading.Lock()
+        self.start = time.perf_counter()
+        self.offset = 0.0
+
+    def next(self) -> float | None:
+        """Return the `time.perf_counter` value at which the next request should be sent, None when done."""
+        with self.lock:
+            if self.remaining <= 0:
+                return None
+            self.remaining -= 1
+            intended = self.start + self.offset
+            if self.arrival == "poisson":
+                self.offset += random.expovariate(self.rate)
+            else:
+                self.offset += 1 / self.rate
+            return intended
+
+
+class StagedArrivalSchedule:
+    """Intended send times of the requests following the requests per second of a load profile.
+
+    The rate varies linearly within each stage, so the expected number of arrivals is
+    quadratic in time and is inverted exactly. Poisson arrivals are obtained by drawing
+    exponential increments of the expected number of arrivals (time rescaling).
+
+    Args:
+        profile (LoadProfile): The load profile, whose stages target requests per second.
+        arrival (str): Either "fixed" or "poisson".
+        scale (float): The share of the rate to schedule, e.g. when split across processes.
+    """
+
+    def __init__(self, profile: LoadProfile, arrival: str = "fixed", scale: float = 1.0) -> None:
+        self.profile = profile
+        self.arrival = arrival
+        self.scale = scale
+        self.lock = threading.Lock()
+        self.start = time.perf_counter()
+        self.arrivals = 0.0
+
+    def offset_of(self, arrivals: float) -> float | None:
+        """Return the time from the start at which `arrivals` requests are expected, None after the profile."""
+        elapsed, previous = 0.0, 0.0
+        for stage in self.profile.stages:
+            r0, r1 = previous * self.scale, stage.target * self.scale
+            stage_arrivals = (r0 + r1) / 2 * stage.duration
+            if arrivals < stage_arrivals:
+                if arrivals == 0:
+                    return elapsed
+                # NOTE mad: solves r0 * t + (r1 - r0) * t ** 2 / (2 * duration) = arrivals, stable when r1 == r0
+                a = (r1 - r0) / (2 * stage.duration)
+                return elapsed + 2 * arrivals / (r0 + math.sqrt(r0 * r0 + 4 * a * arrivals))
+            arrivals -= stage_arrivals
+            elapsed += stage.duration
+            previous = stage.target
+        return None
+
+    def next(self) -> float | None:
+        """Return the `time.perf_counter` value at which the next request should be sent, None when done."""
+        with self.lock:
+            offset = self.offset_of(self.arrivals)
+            if offset is None:
+                return None
+            self.arrivals += random.expovariate(1.0) if self.arrival == "poisson" else 1.0
+            return self.start + offset
+
+
+Schedule = ArrivalSchedule | StagedArrivalSchedule
+
+
+def build_schedule(testcase: LoadTestCase) -> Schedule | None:
+    """Return the schedule of an open-model load test, None for a closed-model one.
+
+    The rate of the test, or the requests per second of its stages, are totals over
+    the processes, each of them scheduling its share.
+    """
+    profile = testcase.load_profile
+    if profile is not None and profile.executor == LoadExecutor.RPS:
+        return StagedArrivalSchedule(profile, testcase.arrival, 1 / testcase.processes)
+    if testcase.rate:
+        return ArrivalSchedule(
+            testcase.rate / testcase.processes, testcase.users * testcase.requests_per_user, testcase.arrival
+        )
+    return None
+
+
+def is_open_model(testcase: LoadTestCase) -> bool:
+    """Whether the requests of a load test are scheduled at a rate rather than sent back to back by the users."""
+    profile = testcase.load_profile
+    if profile is not None:
+        return profile.executor == LoadExecutor.RPS
+    return bool(testcase.rate)
+
+
+def user_indices(testcase: LoadTestCase, profile: LoadProfile) -> range:
+    """Return the indices of the users a process runs when the stages of a profile target users.
+
+    User `i` is active while the target is above `i`, and users are dealt to the
+    processes in turn so that the sum over the processes follows the target.
+    """
+    return range(testcase.process_index, profile.users, testcase.processes)
+
+
+# NOTE mad: how often the number of active users is adjusted to the target of the stages
+STAGES_TICK = 0.1
+
+
+###################
+# WATCHDOG
+###################
+
+
+# NOTE mad: how often the watchdog checks the limits, sorting the latencies of the window
+WATCHDOG_TICK = 0.5
+
+
+class Watchdog:
+    """Stop a load run early when the requests of the last seconds cross the limits of the manifest.
+
+    The results of the requests are kept over a sliding window of `policy.duration` seconds and
+    checked every `WATCHDOG_TICK` seconds, once the run lasted as long as the window. The engines
+    stop sending requests as soon as the watchdog is tripped, and `reason` tells why.
+
+    Args:
+        policy (AbortPolicy | None): The limits, the watchdog never trips without.
+    """
+
+    def __init__(self, policy: AbortPolicy | None) -> None:
+        self.policy = policy
+        self.window: collections.deque[typing.Tuple[float, float, bool]] = collections.deque()
+        self.start = self.checked = time.perf_counter()
+        self.reason: str | None = None
+
+    @property
+    def tripped(self) -> bool:
+        """Whether the run should stop."""
+        return self.reason is not None
+
+    def observe(self, result: dict[str, int | float]) -> None:
+        """Add the result of a request to the window, and check the limits if it is time to."""
+        if self.policy is None or self.reason is not None:
+            return
+        now = time.perf_counter()
+        self.window.append((now, result['elapsed_time'], bool(result['success'])))
+        if now - self.checked < WATCHDOG_TICK:
+            return
+        self.checked = now
+        while self.window and self.window[0][0] < now - self.policy.duration:
+            self.window.popleft()
+        if now - self.start >= self.policy.duration and len(self.window) >= self.policy.min_requests:
+            self.reason = self.check(self.policy)
+
+    def check(self, policy: AbortPolicy) -> str | None:
+        """Return why the requests of the window cross the limits, None if they do not."""
+        over = f"over the last {policy.duration:g}s"
+        failures = sum(not success for _, _, success in self.window)
+        error_rate = failures / len(self.window) * 100
+        if policy.max_error_rate is not None and error_rate > policy.max_error_rate:
+            return f"error rate {error_rate:.2f}% > {policy.max_error_rate:g}% {over}"
+        latencies = sorted(latency for _, latency, _ in self.window)
+        for p, limit in policy.percentiles.items():
+            latency = latencies[max(1, math.ceil(p / 100 * len(latencies))) - 1] * 1000
+            if latency > limit:
+                return f"p{p:g} {latency:.2f}ms > {limit:g}ms {over}"
+        return None
+
+
+###################
+# FEEDERS
+###################
+
+
+class Feeder:
+    """Give each virtual user its own record, read lazily from a CSV or JSON lines file.
+
+    Records are read one at a time, the file being read again from the start once
+    all of them were given. With several processes, each of them only reads every
+    `processes`-th record, starting from its index, so that users of different
+    processes do not share records as long as there are enough of them.
+
+    Args:
+        path (str): The path of the `.csv`, `.jsonl` or `.ndjson` file.
+        processes (int): The number of processes sharing the records.
+        index (int): The index of the current process.
+
+    Raises:
+        ValueError: If the extension of the file is not supported.
+    """
+
+    def __init__(self, path: str, processes: int = 1, index: int = 0) -> None:
+        if not path.endswith((".csv", ".jsonl", ".ndjson")):
+            raise ValueError(f"Feeders read .csv, .jsonl or .ndjson files, not '{path}'")
+        self.path = path
+        self.processes, self.index = processes, index
+        self.lock = threading.Lock()
+        self.records = self._read()
+
+    def _read(self) -> typing.Iterator[dict]:
+        while True:
+            n_records = 0
+            with open(self.path, newline="") as f:
+                rows: typing.Iterable[dict]
+                if self.path.endswith(".csv"):
+                    rows = csv.DictReader(f)
+                else:
+                    rows = (json.loads(line) for line in f if line.strip())
+                for position, row in enumerate(rows):
+                    if position % self.processes == self.index:
+                        n_records += 1
+                        yield row
+            if n_records == 0:
+                raise ValueError(f"No record for process {self.index} in '{self.path}'")
+
+    def next(self) -> dict:
+        """Return the record of the next virtual user."""
+        with self.lock:
+            return next(self.records)
+
+
+###################
+# ENGINES
+###################
+
+
+class LoadEngine(abc.ABC):
+    """What the engines share: the test case and the takes its users send.
+
+    Each request of a user picks one of the takes according to their weights,
+    so that several scenes can be mixed in a single run. Results are recorded
+    by endpoint.
+
+    In journey mode, each iteration of a user sends all the takes in order instead,
+    pausing for a think time between them. The steps are recorded by endpoint and
+    the whole journey under its own name.
+
+    Each virtual user gets the next record of each feeder of the manifest and is set
+    up by its `set_up_user` instructions, so that users do not share one identity.
+
+    Users stop early once the `Watchdog` tripped on the abort limits of the manifest.
+
+    The iterations of the warm-up, either the first `warmup_requests` ones, shared between the
+    processes, or those starting in the first `warmup_duration` seconds, are recorded apart under
+    the endpoint suffixed with `WARMUP`, and not watched by the watchdog.
+
+    When the test case has a `live_queue`, rolling statistics of each endpoint are kept
+    along the results and published in the queue every `LIVE_TICK` seconds for the live dashboard.
+
+    When the test case has a `request_log`, every result is appended to it as well, with its endpoint.
+
+    The recorders of an open-model test are marked as such, so that their latencies are corrected
+    for coordinated omission from the intended send times.
+
+    Args:
+        testcase (LoadTestCase): The test case holding the load parameters and collecting the results.
+        takes (list[scenery.manifest.Take]): The requests to send.
+        journey (str | None): The name of the journey walked through the takes, if any.
+    """
+
+    def __init__(self, testcase: LoadTestCase, takes: list[Take], journey: str | None = None) -> None:
+        self.testcase = testcase
+        self.takes = takes
+        self.journey = journey
+        self.cum_weights = list(itertools.accumulate(take.weight for take in takes))
+        self.feeders = {
+            name: Feeder(path, testcase.processes, testcase.process_index)
+            for name, path in testcase.feeders.items()
+        }
+        self.watchdog = Watchdog(testcase.abort_policy)
+        self.open_model = is_open_model(testcase)
+        warmup, processes, index = testcase.warmup_requests, testcase.processes, testcase.process_index
+        self.warmup_requests = warmup // processes + (index < warmup % processes)
+        self.warmup_end = time.perf_counter() + testcase.warmup_duration
+        self.iterations = itertools.count()
+        self.live: dict[str, LiveStats] = {}
+        if testcase.live_queue is not None:
+            endpoints = [take.endpoint for take in takes] + ([journey] if journey else [])
+            self.live = {endpoint: LiveStats() for endpoint in endpoints}
+        self.request_log: RequestLog | None = None
+
+    def pick(self) -> int:
+        """Return the index of the take of the next request."""
+        if len(self.takes) == 1:
+            return 0
+        return random.choices(range(len(self.takes)), cum_weights=self.cum_weights)[0]
+
+    def set_up_user(self) -> LoadTestCase:
+        """Return a copy of the test case holding the session, headers and records of a new virtual user.
+
+        The `set_up_user` instructions are then run on this copy, their arguments fed
+        with the records of the user, e.g. to log it in with its own credentials.
+        """
+        user_case = copy.copy(self.testcase)
+        user_case.session = requests.Session()
+        user_case.session.cookies.update(self.testcase.session.cookies)
+        user_case.session.headers.update(self.testcase.session.headers)
+        user_case.headers = dict(self.testcase.headers)
+        user_case.records = {name: feeder.next() for name, feeder in self.feeders.items()}
+        for instruction in self.testcase.set_up_user:
+            args = feed_recursively(instruction.args, user_case.records)
+            SetUpHandler.exec_set_up_instruction(user_case, SetUpInstruction(instruction.command, args))
+        return user_case
+
+    def user_takes(self, records: typing.Mapping[str, dict]) -> list[Take]:
+        """Return the takes fed with the records of a virtual user."""
+        if not records:
+            return self.takes
+        return [take.feed(records) for take in self.takes]
+
+    def think_time(self) -> float:
+        """Return how long a user pauses, in seconds, between two steps of a journey."""
+        low, high = self.testcase.think_time
+        return random.uniform(low, high)
+
+    def warming_up(self) -> bool:
+        """Whether the iteration of a user starting now is part of the warm-up, from any thread."""
+        if self.warmup_requests:
+            return next(self.iterations) < self.warmup_requests
+        return time.perf_counter() < self.warmup_end
+
+    def start(self, endpoint: str) -> None:
+        """Count a request sent to an endpoint in the live statistics, if any."""
+        if self.live:
+            self.live[endpoint].start()
+
+    def record(
+        self, endpoint: str, result: dict[str, int | float], warmup: bool = False, body: bytes | None = None
+    ) -> None:
+        """Record the result of a request to an endpoint, from one thread at a time.
+
+        Results of the warm-up are recorded apart, the others are watched by the watchdog, journeys aside.
+        The `body` of a failed response, if any, is offered to the sample of error bodies of the endpoint.
+        """
+        key = endpoint + WARMUP if warmup else endpoint
+        recorder = self.testcase.data[key]
+        recorder.open_model = self.open_model
+        recorder.record(result)
+        if body is not None:
+            recorder.error_bodies.offer(int(result["status_code"]), body)
+        if self.request_log is not None:
+            self.request_log.write(key, result)
+        if not warmup and endpoint != self.journey:
+            self.watchdog.observe(result)
+        if self.live:
+            self.live[endpoint].record(result)
+
+    def publish(self) -> None:
+        """Put a snapshot of the live statistics of all the endpoints in the live queue."""
+        assert self.testcase.live_queue is not None
+        snapshots = {endpoint: stats.snapshot() for endpoint, stats in self.live.items()}
+        self.testcase.live_queue.put((os.getpid(), time.time(), snapshots))
+
+    @contextlib.contextmanager
+    def publishing(self) -> typing.Iterator[None]:
+        """Publish the live statistics from a background thread while running, if any."""
+        if not self.live:
+            yield
+            return
+        stop = threading.Event()
+
+        def publisher() -> None:
+            while not stop.wait(LIVE_TICK):
+                self.publish()
+
+        thread = threading.Thread(target=publisher, daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            stop.set()
+            thread.join()
+            self.publish()
+
+    @contextlib.contextmanager
+    def logging_requests(self) -> typing.Iterator[None]:
+        """Append the results to the request log of the test case while running, if any."""
+        if self.testcase.request_log is None:
+            yield
+            return
+        self.request_log = RequestLog(self.testcase.request_log)
+        try:
+            yield
+        finally:
+            self.request_log.close()
+            self.request_log = None
+
+    @abc.abstractmethod
+    def run(self) -> None:
+        """Send the requests of all the users and wait for them."""
+
+
+def summarize_journey(steps: list[dict[str, int | float]]) -> dict[str, int | float]:
+    """Return the end-to-end result of a journey from the results of its steps.
+
+    The latency of a journey is the sum of the latencies of its steps, think times excluded.
+    A journey stops at its first failed step, which gives its status code.
+    """
+    result: dict[str, int | float] = {
+        'timestamp': steps[0]['timestamp'],
+        'elapsed_time': sum(step['elapsed_time'] for step in steps),
+        'status_code': steps[-1]['status_code'],
+        'success': all(step['success'] for step in steps),
+    }
+    if 'send_delay' in steps[0]:
+        result['send_delay'] = steps[0]['send_delay']
+    if 'error' in steps[-1]:
+        result['error'] = steps[-1]['error']
+    if 'client_cpu' in steps[0]:
+        result['client_cpu'] = sum(step['client_cpu'] for step in steps)
+    return result
+
+
+def classify_error(error: BaseException) -> str:
+    """Return the class of the error raised by a request which got no response, one of `ERRORS`.
+
+    The errors of `requests` and `urllib3` wrap the original one, so the whole chain is
+    inspected, the socket level errors first.
+    """
+    chain: list[BaseException] = []
+    pending = [error]
+    while pending:
+        error = pending.pop()
+        if any(error is seen for seen in chain):
+            continue
+        chain.append(error)
+        pending.extend(arg for arg in error.args if isinstance(arg, BaseException))
+        pending.extend(
+            cause
+            for cause in (error.__cause__, error.__context__, getattr(error, "reason", None))
+            if isinstance(cause, BaseException)
+        )
+
+    def raised(*classes: type) -> bool:
+        return any(isinstance(error, classes) for error in chain)
+
+    if raised(socket.gaierror):
+        return "dns"
+    if raised(ConnectionRefusedError):
+        return "refused"
+    if raised(ssl.SSLError, requests.exceptions.SSLError, urllib3.exceptions.SSLError):
+        return "tls"
+    if raised(ConnectionResetError, ConnectionAbortedError, BrokenPipeError, asyncio.IncompleteReadError):
+        return "reset"
+    # NOTE mad: urllib3 makes NewConnectionError a ConnectTimeoutError for backward compatibility
+    if any(
+        isinstance(error, (TimeoutError, requests.exceptions.Timeout, urllib3.exceptions.TimeoutError))
+        and not isinstance(error, urllib3.exceptions.NewConnectionError)
+        for error in chain
+    ):
+        return "timeout"
+    return "other"
+
+
+def error_result(
+    timestamp: float, start_ns: int, error: BaseException, intended: float | None = None
+) -> dict[str, int | float]:
+    """Return the result of a request which got no response, with a status code 0 and the class of its error."""
+    kind = classify_error(error)
+    # NOTE mad: errors are counted by kind in the reports, logging each of them would flood
+    # the console under load
+    logger.debug(f"{kind=} {error=}")
+    result: dict[str, int | float] = {
+        'timestamp': timestamp,
+        'elapsed_time': (time.perf_counter_ns() - start_ns) / 1e9,
+        'status_code': 0,
+        'success': False,
+        'error': ERRORS.index(kind),
+    }
+    if intended is not None:
+        result['send_delay'] = start_ns / 1e9 - intended
+    return result
+
+
+# NOTE mad: response bodies are read by chunks of this size and discarded, only their size is kept
+DRAIN_CHUNK_SIZE = 1 << 16
+
+DECODE_ERRORS: typing.Tuple[typing.Type[Exception], ...] = (zlib.error,) + ((brotli.error,) if brotli else ())
+
+
+Decoder = typing.Callable[[bytes], typing.Iterator[bytes]]
+
+
+def zlib_decoder(decompressor: typing.Any) -> Decoder:
+    """Return a function decoding the successive chunks of a zlib stream by pieces of at most `DRAIN_CHUNK_SIZE` bytes."""
+    def decode(chunk: bytes) -> typing.Iterator[bytes]:
+        while chunk:
+            yield decompressor.decompress(chunk, DRAIN_CHUNK_SIZE)
+            chunk = decompressor.unconsumed_tail
+    return decode
+
+
+def brotli_decoder(decompressor: typing.Any) -> Decoder:
+    """Return a function decoding the successive chunks of a brotli stream, by pieces of about `DRAIN_CHUNK_SIZE` bytes.
+
+    The output of brotli before 1.2 cannot be limited, each chunk is then decoded at once.
+    """
+    if not hasattr(decompressor, "can_accept_more_data"):
+        def decode_at_once(chunk: bytes) -> typing.Iterator[bytes]:
+            yield decompressor.process(chunk)
+        return decode_at_once
+
+    def decode(chunk: bytes) -> typing.Iterator[bytes]:
+        # NOTE mad: once the output is limited, the rest is read with empty inputs until none is left
+        output = decompressor.process(chunk, output_buffer_limit=DRAIN_CHUNK_SIZE)
+        while output:
+            yield output
+            if decompressor.is_finished():
+                break
+            output = decompressor.process(b"", output_buffer_limit=DRAIN_CHUNK_SIZE)
+    return decode
+
+
+def content_decoder(content_encoding: str) -> Decoder | None:
+    """Return a function decoding the successive chunks of a body of a content encoding, None if not supported.
+
+    Each chunk is decoded by bounded pieces, so that highly compressed bodies do not inflate in memory.
+    """
+    content_encoding = content_encoding.strip().lower()
+    if content_encoding in ("gzip", "x-gzip"):
+        return zlib_decoder(zlib.decompressobj(16 + zlib.MAX_WBITS))
+    if content_encoding == "deflate":
+        return zlib_decoder(zlib.decompressobj())
+    if content_encoding == "br" and brotli is not None:
+        return brotli_decoder(brotli.Decompressor())
+    return None
+
+
+class DrainedBody:
+    """The size of a response body read by chunks and discarded, and its first bytes.
+
+    Content-encoded bodies (gzip, deflate, or br when `brotli` is installed) are decoded on the
+    fly to count their size once decoded, the first bytes kept are then decoded ones. The decoded
+    size of other bodies is None.
+
+    Args:
+        content_encoding (str): The Content-Encoding of the response, if any.
+        keep (int): How many bytes of the body to keep.
+    """
+
+    def __init__(self, content_encoding: str = "", keep: int = 0) -> None:
+        self.keep = keep
+        self.head = b""
+        self.size = 0
+        self.decompress = content_decoder(content_encoding) if content_encoding else None
+        self.decoded_size: int | None = None if self.decompress is None else 0
+
+    def feed(self, chunk: bytes) -> None:
+        """Count the next chunk of the body, and keep its first bytes if needed."""
+        self.size += len(chunk)
+        if self.decompress is None or self.decoded_size is None:
+            self._keep(chunk)
+            return
+        try:
+            for decoded in self.decompress(chunk):
+                self.decoded_size += len(decoded)
+                self._keep(decoded)
+        except DECODE_ERRORS as error:
+            logger.debug(f"content decoding {error=}")
+            self.decompress, self.decoded_size = None, None
+            self._keep(chunk)
+
+    def _keep(self, data: bytes) -> None:
+        if len(self.head) < self.keep:
+            self.head += data[:self.keep - len(self.head)]
+
+
+def response_result(
+    timestamp: float,
+    start_ns: int,
+    sent_ns: int,
+    first_byte_ns: int,
+    end_ns: int,
+    status_code: int,
+    connect_time_ns: int | None,
+    body: DrainedBody,
+    intended: float | None = None,
+) -> dict[str, int | float]:
+    """Return the result of a request which got a response, with its phases, sizes and status.
+
+    The `perf_counter_ns` times are those at which the request was started, sent on an open
+    connection, got the first byte of its response and got the last one. Both engines build
+    their results here so that they record the same fields.
+    """
+    success = 200 <= status_code < 300
+    if not success:
+        logger.debug(f"{status_code=} {body.head=}")
+    result: dict[str, int | float] = {
+        'timestamp': timestamp,
+        'elapsed_time': (end_ns - start_ns) / 1e9,
+        'status_code': status_code,
+        'success': success,
+        'new_connection': connect_time_ns is not None,
+        'connect_time': (connect_time_ns or 0) / 1e9,
+        'ttfb': (first_byte_ns - sent_ns) / 1e9,
+        'download_time': (end_ns - first_byte_ns) / 1e9,
+        'response_size': body.size,
+    }
+    if body.decoded_size is not None:
+        result['decoded_size'] = body.decoded_size
+    if intended is not None:
+        result['send_delay'] = start_ns / 1e9 - intended
+    return result
+
+
+###################
+# THREADS
+###################
+
+
+class TimedHTTPConnection(urllib3.connection.HTTPConnection):
+    """An HTTP connection remembering how long it took to be established, until the time is popped."""
+
+    connect_time_ns: int | None = None
+
+    def connect(self) -> None:
+        """Establish the connection and remember how long it took."""
+        start = time.perf_counter_ns()
+        super().connect()
+        self.connect_time_ns = time.perf_counter_ns() - start
+
+
+class TimedHTTPSConnection(urllib3.connection.HTTPSConnection):
+    """An HTTPS connection remembering how long it took to be established, TLS handshake included."""
+
+    connect_time_ns: int | None = None
+
+    def connect(self) -> None:
+        """Establish the connection, TLS handshake included, and remember how long it took."""
+        start = time.perf_counter_ns()
+        super().connect()
+        self.connect_time_ns = time.perf_counter_ns() - start
+
+
+class TimedHTTPConnectionPool(urllib3.HTTPConnectionPool):
+    """An HTTP connection pool whose connections record their connect time."""
+
+    ConnectionCls = TimedHTTPConnection
+
+
+class TimedHTTPSConnectionPool(urllib3.HTTPSConnectionPool):
+    """An HTTPS connection pool whose connections record their connect time."""
+
+    ConnectionCls = TimedHTTPSConnection
+
+
+class TimedHTTPAdapter(HTTPAdapter):
+    """An adapter whose connections record their connect time."""
+
+    def init_poolmanager(
+        self, connections: int, maxsize: int, block: bool = False, **pool_kwargs: typing.Any
+    ) -> None:
+        """Create the pool manager as `HTTPAdapter` does, with pools of timed connections."""
+        # NOTE mad: the stubs of requests leave the method of the parent untyped
+        init_poolmanager: typing.Callable[..., None] = super().init_poolmanager
+        init_poolmanager(connections, maxsize, block, **pool_kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": TimedHTTPConnectionPool,
+            "https": TimedHTTPSConnectionPool,
+        }
+
+
+def drain_response(response: requests.Response, keep: int = 0) -> DrainedBody:
+    """Read the body of a streamed response by chunks and return its sizes and its first `keep` bytes.
+
+    The body is read as received, before any content decoding, so that memory stays flat
+    whatever its size.
+    """
+    body = DrainedBody(response.headers.get("Content-Encoding", ""), keep)
+    for chunk in response.raw.stream(DRAIN_CHUNK_SIZE, decode_content=False):
+        body.feed(chunk)
+    return body
+
+
+def pop_connect_time(response: requests.Response) -> int | None:
+    """Return the connect time in ns of the connection of a streamed response, None if the connection was reused."""
+    connection = response.raw.connection
+    if not isinstance(connection, (TimedHTTPConnection, TimedHTTPSConnection)):
+        return None
+    connect_time_ns, connection.connect_time_ns = connection.connect_time_ns, None
+    return connect_time_ns
+
+
+def prewarm_session(session: requests.Session, base_url: str, connect_timeout: float | None = None) -> None:
+    """Open the keep-alive connection of a session to the origin of the load test before its first request.
+
+    The connection is opened by a HEAD request to the base URL, whatever its status, and its connect
+    time is dropped, so that the first request is recorded as reusing it. Errors are only logged,
+    the first request then opens the connection as usual.
+    """
+    try:
+        # NOTE mad: the response is streamed so that its connection, which holds the connect
+        # time, is only released to the pool once drained
+        response = session.head(
+            base_url, allow_redirects=False, stream=True, timeout=typing.cast(tuple[float, None], (connect_timeout, None))
+        )
+    except (requests.exceptions.RequestException, urllib3.exceptions.HTTPError) as error:
+        logger.warning(f"prewarm {error=}")
+        return
+    pop_connect_time(response)
+    drain_response(response)
+
+
+def prepare_take(
+    session: requests.Session, base_url: str, take: Take, headers: dict[str, str]
+) -> requests.PreparedRequest:
+    """Return the request of a take prepared once for a session, with its URL, encoded body and merged headers.
+
+    The cookies of the session are left out, since responses update them they are set on each copy sent.
+
+    Raises:
+        NotImplementedError: If the method of the take is neither GET nor POST.
+    """
+    if take.method not in (http.HTTPMethod.GET, http.HTTPMethod.POST):
+        raise NotImplementedError(take.method)
+    request = session.prepare_request(
+        requests.Request(take.method, base_url + take.url, data=take.data, headers=headers)
+    )
+    request.headers.pop("Cookie", None)
+    return request
+
+
+class ThreadVirtualUser(typing.NamedTuple):
+    """The session, takes and prepared requests owned by a virtual user of the threads engine.
+
+    The requests of the takes are prepared once for the user, and `settings` holds the
+    send settings (streaming, proxies, TLS verification) merged once for the origin.
+    """
+
+    session: requests.Session
+    takes: list[Take]
+    prepared: list[requests.PreparedRequest]
+    settings: typing.Mapping[str, typing.Any]
+
+
+class ThreadsEngine(LoadEngine):
+    """Simulate each user with an OS thread.
+
+    Each thread owns a `requests.Session`, initialized with the cookies and headers of the
+    test case session, with a single keep-alive connection since a user sends one request
+    at a time. Users send `requests_per_user` requests back to back.
+
+    The requests of the takes are prepared once per user and a copy, with the current cookies
+    of the session, is sent each time, so that bodies are not encoded nor headers merged again
+    in the hot loop. The CPU time of the thread spent on each request is recorded as `client_cpu`.
+
+    Args:
+        testcase (LoadTestCase): The test case holding the load parameters and collecting the results.
+        takes (list[scenery.manifest.Take]): The requests to send.
+    """
+
+    def __init__(self, testcase: LoadTestCase, takes: list[Take], journey: str | None = None) -> None:
+        super().__init__(testcase, takes, journey)
+        self.lock = threading.Lock()
+
+    def new_user(self) -> ThreadVirtualUser:
+        """Return a new virtual user, set up and fed."""
+        user_case = self.set_up_user()
+        session = user_case.session
+        adapter = TimedHTTPAdapter(pool_connections=1, pool_maxsize=1)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        if self.testcase.prewarm:
+            prewarm_session(session, self.testcase.base_url, self.testcase.connect_timeout)
+        takes = self.user_takes(user_case.records)
+        headers = user_case.headers
+        if self.testcase.accept_encoding is not None:
+            headers = {**headers, "Accept-Encoding": self.testcase.accept_encoding}
+        prepared = [prepare_take(session, self.testcase.base_url, take, headers) for take in takes]
+        # NOTE mad: responses are streamed, see make_request
+        settings = session.merge_environment_settings(self.testcase.base_url, {}, True, None, None)
+        return ThreadVirtualUser(session, takes, prepared, settings)
+
+    def make_request(
+        self, user: ThreadVirtualUser, index: int, intended: float | None = None
+    ) -> typing.Tuple[dict[str, int | float], bytes | None]:
+        """Send the prepared request of a take of the user and return response time, its phases and status.
+
+        The response is streamed so that the time to receive the headers and the time
+        to download the body are measured apart, and its body is drained and counted as
+        `response_size`. The first bytes of the body of a failed response are returned along
+        the result, None for successful ones. If an intended send time is provided, the delay
+        of the actual send is recorded as well. Requests which get no response, e.g. because
+        of a timeout, are recorded with the class of their error.
+        """
+        timestamp, start_ns, cpu_start_ns = time.time(), time.perf_counter_ns(), time.thread_time_ns()
+
+        request = user.prepared[index].copy()
+        request.prepare_cookies(user.session.cookies)
+        # NOTE mad: requests accepts None for either timeout, which its stubs do not tell
+        timeout = typing.cast(tuple[float, float], (self.testcase.connect_timeout, self.testcase.read_timeout))
+        try:
+            response = user.session.send(
+                request,
+                timeout=timeout,
+                **user.settings,
+            )
+            headers_ns = time.perf_counter_ns()
+            connect_time_ns = pop_connect_time(response)
+            success = 200 <= response.status_code < 300
+            body = drain_response(response, 0 if success else ERROR_BODY_MAX)
+        except (requests.exceptions.RequestException, urllib3.exceptions.HTTPError) as error:
+            failed = error_result(timestamp, start_ns, error, intended)
+            failed['client_cpu'] = (time.thread_time_ns() - cpu_start_ns) / 1e9
+            return failed, None
+        end_ns = time.perf_counter_ns()
+
+        # NOTE mad: requests sends once connected, so the time to first byte starts after the connect time
+        result = response_result(
+            timestamp,
+            start_ns,
+            start_ns + (connect_time_ns or 0),
+            headers_ns,
+            end_ns,
+            response.status_code,
+            connect_time_ns,
+            body,
+            intended,
+        )
+        result['client_cpu'] = (time.thread_time_ns() - cpu_start_ns) / 1e9
+        return result, None if result['success'] else body.head
+
+    def request(self, user: ThreadVirtualUser, intended: float | None = None) -> None:
+        """Send the request of a picked take and record its result."""
+        index = self.pick()
+        take = user.takes[index]
+        warmup = self.warming_up()
+        self.start(take.endpoint)
+        result, body = self.make_request(user, index, intended)
+
+        with self.lock:
+            self.record(take.endpoint, result, warmup, body)
+
+    def walk(self, user: ThreadVirtualUser, intended: float | None = None) -> None:
+        """Send the takes one after the other and record each step and the whole journey."""
+        assert self.journey is not None
+        steps: list[dict[str, int | float]] = []
+        bodies: list[bytes | None] = []
+        warmup = self.warming_up()
+        self.start(self.journey)
+        for index, take in enumerate(user.takes):
+            if steps:
+                time.sleep(self.think_time())
+            self.start(take.endpoint)
+            result, body = self.make_request(user, index, None if steps else intended)
+            steps.append(result)
+            bodies.append(body)
+            if not result['success']:
+                break
+
+        with self.lock:
+            for take, result, body in zip(self.takes, steps, bodies):
+                self.record(take.endpoint, result, warmup, body)
+            self.record(self.journey, summarize_journey(steps), warmup)
+
+    def iterate(self, user: ThreadVirtualUser, intended: float | None = None) -> None:
+        """Run one iteration of a user: a request, or a whole journey in journey mode."""
+        if self.journey is None:
+            self.request(user, intended)
+        else:
+            self.walk(user, intended)
+
+    def _worker_task(self, num_requests: int) -> None:
+        """Worker function executed by each thread."""
+        user = self.new_user()
+        for _ in range(num_requests):
+            if self.watchdog.tripped:
+                break
+            self.iterate(user)
+
+    def _scheduled_worker_task(self, schedule: Schedule) -> None:
+        """Worker function executed by each thread in open-model."""
+        user = self.new_user()
+        while not self.watchdog.tripped and (intended := schedule.next()) is not None:
+            time.sleep(max(0.0, intended - time.perf_counter()))
+            self.iterate(user, intended)
+
+    def _staged_worker_task(self, index: int, profile: LoadProfile, start: float) -> None:
+        """Worker function executed by each thread while the stages target at least its user."""
+        user = self.new_user()
+        while (elapsed := time.perf_counter() - start) < profile.duration and profile.target_at(elapsed) > index:
+            if self.watchdog.tripped:
+                break
+            self.iterate(user)
+
+    def run_stages(self, profile: LoadProfile) -> None:
+        """Start and stop threads so that the number of users follows the stages of the profile."""
+        start = time.perf_counter()
+        threads: dict[int, threading.Thread] = {}
+        while (elapsed := time.perf_counter() - start) < profile.duration and not self.watchdog.tripped:
+            target = profile.target_at(elapsed)
+            for index in user_indices(self.testcase, profile):
+                thread = threads.get(index)
+                if index < target and (thread is None or not thread.is_alive()):
+                    threads[index] = threading.Thread(target=self._staged_worker_task, args=(index, profile, start))
+                    threads[index].start()
+            time.sleep(STAGES_TICK)
+
+        for thread in threads.values():
+            thread.join()
+
+    def run(self) -> None:
+        """Start one thread per simulated user and wait for all of them."""
+        profile = self.testcase.load_profile
+        if profile is not None and profile.executor == LoadExecutor.USERS:
+            self.run_stages(profile)
+            return
+
+        target: typing.Callable[..., None]
+        args: tuple
+        if schedule := build_schedule(self.testcase):
+            target, args = self._scheduled_worker_task, (schedule,)
+        else:
+            target, args = self._worker_task, (self.testcase.requests_per_user,)
+
+        threads = []
+        for i in range(self.testcase.users):
+            thread = threading.Thread(target=target, args=args)
+            threads.append(thread)
+            thread.start()
+
+        for thread in threads:
+            thread.join()
+
+
+###################
+# ASYNCIO
+###################
+
+
+Connection = typing.Tuple[asyncio.StreamReader, asyncio.StreamWriter]
+
+
+class AsyncConnectionPool:
+    """Keep-alive HTTP/1.1 connections to a single origin.
+
+    At most `size` connections are checked out at the same time, callers
+    wait for a connection to be released otherwise.
+
+    Args:
+        base_url (str): The origin the connections are opened to.
+        size (int): The maximum number of connections.
+        connect_timeout (float | None): How long to wait for a connection to be established, in seconds.
+    """
+
+    def __init__(self, base_url: str, size: int, connect_timeout: float | None = None) -> None:
+        self.connect_timeout = connect_timeout
+        parts = urlsplit(base_url)
+        self.host = parts.hostname
+        self.ssl = ssl.create_default_context() if parts.scheme == "https" else None
+        self.port = parts.port or (443 if self.ssl else 80)
+        self.idle: list[Connection] = []
+        self.semaphore = asyncio.Semaphore(size)
+
+    async def open(self) -> typing.Tuple[Connection, int]:
+        """Open a new connection, not counted in the pool size, and return it with its connect time in ns."""
+        start = time.perf_counter_ns()
+        connection = await asyncio.wait_for(
+            asyncio.open_connection(self.host, self.port, ssl=self.ssl), self.connect_timeout
+        )
+        return connection, time.perf_counter_ns() - start
+
+    async def acquire(self) -> typing.Tuple[Connection, int | None]:
+        """Return an open connection and its connect time in ns, None if it is reused from a previous request."""
+        await self.semaphore.acquire()
+        while self.idle:
+            reader, writer = self.idle.pop()
+            if not writer.is_closing() and not reader.at_eof():
+                return (reader, writer), None
+            writer.close()
+        try:
+            return await self.open()
+        except BaseException:
+            self.semaphore.release()
+            raise
+
+    async def prewarm(self) -> None:
+        """Open one idle connection before the first request, errors are only logged."""
+        try:
+            connection, _ = await self.open()
+        except OSError as error:
+            logger.warning(f"prewarm {error=}")
+            return
+        self.idle.append(connection)
+
+    def release(self, connection: Connection, keep_alive: bool) -> None:
+        """Give back a connection to the pool, closing it if it cannot be reused."""
+        if keep_alive:
+            self.idle.append(connection)
+        else:
+            connection[1].close()
+        self.semaphore.release()
+
+    def close(self) -> None:
+        """Close all the idle connections."""
+        while self.idle:
+            _, writer = self.idle.pop()
+            writer.close()
+
+
+class AsyncVirtualUser:
+    """The connection pool, cookies and requests owned by a virtual user of the asyncio engine.
+
+    Cookies are initialized from the test case session and updated with the
+    `Set-Cookie` headers of the responses. As all requests go to a single origin,
+    their domain and path are not taken into account.
+
+    Args:
+        base_url (str): The origin the user sends requests to.
+        cookies (dict[str, str]): The initial cookies.
+        raw_requests (list[RawRequest]): The encoded requests of the takes, in the same order.
+        connect_timeout (float | None): How long to wait for a connection to be established, in seconds.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        cookies: dict[str, str],
+        raw_requests: "list[RawRequest] | None" = None,
+        connect_timeout: float | None = None,
+    ) -> None:
+        self.pool = AsyncConnectionPool(base_url, 1, connect_timeout)
+        self.cookies = dict(cookies)
+        self.raw_requests = raw_requests or []
+
+    def cookie_header(self) -> bytes:
+        """Return the `Cookie` header line to send, empty if there is no cookie."""
+        if not self.cookies:
+            return b""
+        value = "; ".join(f"{name}={value}" for name, value in self.cookies.items())
+        return f"Cookie: {value}\r\n".encode("latin-1")
+
+    def update_cookies(self, headers: list[typing.Tuple[str, str]]) -> None:
+        """Store the cookies set by a response."""
+        for name, value in headers:
+            if name == "set-cookie":
+                for morsel in http.cookies.SimpleCookie(value).values():
+                    self.cookies[morsel.key] = morsel.value
+
+
+class RawRequest(typing.NamedTuple):
+    """An HTTP/1.1 request encoded once, the head lacking its final empty line so that cookies can be added."""
+
+    head: bytes
+    body: bytes
+
+
+def build_raw_request(testcase: LoadTestCase, take: Take) -> RawRequest:
+    """Encode once the HTTP/1.1 request corresponding to a take.
+
+    Headers are taken from the test case, so that `set_up` instructions apply
+    to the virtual users, its Accept-Encoding last. Cookies are added by each user.
+    """
+    parts = urlsplit(testcase.base_url + take.url)
+    target = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+    body = urlencode(take.data, doseq=True).encode() if take.data else b""
+
+    headers = {
+        "Host": parts.netloc,
+        "User-Agent": "scenery",
+        "Accept": "*/*",
+        "Connection": "keep-alive",
+    }
+    if body:
+        headers["Content-Type"] = "application/x-www-form-urlencoded"
+        headers["Content-Length"] = str(len(body))
+    headers.update(testcase.headers)
+    if testcase.accept_encoding is not None:
+        headers["Accept-Encoding"] = testcase.accept_encoding
+
+    head = f"{take.method} {target} HTTP/1.1\r\n"
+    head += "".join(f"{name}: {value}\r\n" for name, value in headers.items())
+    return RawRequest(head.encode("latin-1"), body)
+
+
+class RawResponse(typing.NamedTuple):
+    """What the asyncio engine keeps from a response."""
+
+    status_code: int
+    keep_alive: bool
+    headers: list[typing.Tuple[str, str]]
+    first_byte_ns: int
+    body: DrainedBody
+
+
+async def drain_body(reader: asyncio.StreamReader, length: int | None, body: DrainedBody) -> None:
+    """Feed a body with `length` bytes read by chunks, until the end of the stream when None.
+
+    Raises:
+        asyncio.IncompleteReadError: If the stream ends before `length` bytes.
+    """
+    read = 0
+    while length is None or read < length:
+        chunk = await reader.read(DRAIN_CHUNK_SIZE if length is None else min(DRAIN_CHUNK_SIZE, length - read))
+        if not chunk:
+            if length is None:
+                break
+            raise asyncio.IncompleteReadError(body.head, length)
+        body.feed(chunk)
+        read += len(chunk)
+
+
+async def read_response(reader: asyncio.StreamReader) -> RawResponse:
+    """Read a full HTTP/1.1 response, whether the connection can be reused and its headers with lowercase names.
+
+    The `perf_counter_ns` time at which the status line was received is kept as the time of the first byte.
+    The body is drained by chunks and only its sizes are kept, with its first bytes when the response failed.
+    """
+    status_line = await reader.readline()
+    first_byte_ns = time.perf_counter_ns()
+    if not status_line:
+        raise ConnectionResetError("Connection closed before the response")
+    version, status, *_ = status_line.decode("latin-1").split(" ", 2)
+    status_code = int(status)
+
+    headers = []
+    while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+        name, _, value = line.decode("latin-1").partition(":")
+        headers.append((name.strip().lower(), value.strip()))
+    headers_dict = dict(headers)
+
+    keep_alive = version == "HTTP/1.1" and headers_dict.get("connection", "").lower() != "close"
+    body = DrainedBody(headers_dict.get("content-encoding", ""), 0 if 200 <= status_code < 300 else ERROR_BODY_MAX)
+
+    if headers_dict.get("transfer-encoding", "").lower() == "chunked":
+        while chunk_size := int((await reader.readline()).split(b";")[0], 16):
+            await drain_body(reader, chunk_size, body)
+            await reader.readexactly(2)
+        while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+            pass
+    elif "content-length" in headers_dict:
+        await drain_body(reader, int(headers_dict["content-length"]), body)
+    elif status_code < 200 or status_code in (204, 304):
+        pass
+    else:
+        await drain_body(reader, None, body)
+        keep_alive = False
+
+    return RawResponse(status_code, keep_alive, headers, first_byte_ns, body)
+
+
+class AsyncioEngine(LoadEngine):
+    """Simulate each user with a coroutine, all running in a single event loop.
+
+    Each virtual user owns a keep-alive connection and its cookies, and the requests
+    are encoded once for the whole run. Results are collected in the same format
+    as the `ThreadsEngine`, the CPU time of the event loop being split between the
+    endpoints once the run is over.
+
+    Args:
+        testcase (LoadTestCase): The test case holding the load parameters and collecting the results.
+        takes (list[scenery.manifest.Take]): The requests to send.
+    """
+
+    def __init__(self, testcase: LoadTestCase, takes: list[Take], journey: str | None = None) -> None:
+        super().__init__(testcase, takes, journey)
+        for take in takes:
+            if take.method not in (http.HTTPMethod.GET, http.HTTPMethod.POST):
+                raise NotImplementedError(take.method)
+        self.raw_requests = [build_raw_request(testcase, take) for take in takes]
+
+    async def new_user(self) -> AsyncVirtualUser:
+        """Return a new virtual user, set up and fed, with its own requests if needed."""
+        user_case, raw_requests = self.testcase, self.raw_requests
+        if self.feeders or self.testcase.set_up_user:
+            # NOTE mad: set up instructions may block the loop, e.g. to log the user in with requests
+            user_case = await asyncio.to_thread(self.set_up_user)
+            raw_requests = [build_raw_request(user_case, take) for take in self.user_takes(user_case.records)]
+        cookies = user_case.session.cookies.get_dict()
+        user = AsyncVirtualUser(user_case.base_url, cookies, raw_requests, self.testcase.connect_timeout)
+        if self.testcase.prewarm:
+            await user.pool.prewarm()
+        return user
+
+    async def make_request(
+        self, raw_request: RawRequest, user: AsyncVirtualUser, intended: float | None = None
+    ) -> typing.Tuple[dict[str, int | float], bytes | None]:
+        """Execute a single request and return response time, its phases and status.
+
+        The size of the body is recorded as `response_size`, and the first bytes of the body of a
+        failed response are returned along the result, None for successful ones. If an intended
+        send time is provided, the delay of the actual send is recorded as well. Requests which
+        get no response, e.g. because of a timeout, are recorded with the class of their error.
+        """
+        timestamp, start_ns = time.time(), time.perf_counter_ns()
+
+        try:
+            response, connect_time_ns, sent_ns = await self._exchange(raw_request, user)
+        except (OSError, asyncio.IncompleteReadError) as error:
+            return error_result(timestamp, start_ns, error, intended), None
+
+        end_ns = time.perf_counter_ns()
+        user.update_cookies(response.headers)
+
+        result = response_result(
+            timestamp,
+            start_ns,
+            sent_ns,
+            response.first_byte_ns,
+            end_ns,
+            response.status_code,
+            connect_time_ns,
+            response.body,
+            intended,
+        )
+        return result, None if result['success'] else response.body.head
+
+    async def _exchange(
+        self, raw_request: RawRequest, user: AsyncVirtualUser
+    ) -> typing.Tuple[RawResponse, int | None, int]:
+        """Send a request on a connection of the user and return its response, connect time and send time in ns."""
+        pool = user.pool
+        connection, connect_time_ns = await pool.acquire()
+        response = None
+        try:
+            try:
+                sent_ns = time.perf_counter_ns()
+                response = await self._send(raw_request, connection, user)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                if connect_time_ns is not None:
+                    raise
+                # NOTE mad: the server may have closed an idle keep-alive connection
+                connection[1].close()
+                connection, connect_time_ns = await pool.open()
+                sent_ns = time.perf_counter_ns()
+                response = await self._send(raw_request, connection, user)
+        finally:
+            pool.release(connection, response is not None and response.keep_alive)
+        return response, connect_time_ns, sent_ns
+
+    async def _send(self, raw_request: RawRequest, connection: Connection, user: AsyncVirtualUser) -> RawResponse:
+        reader, writer = connection
+        async with asyncio.timeout(self.testcase.read_timeout):
+            writer.write(raw_request.head + user.cookie_header() + b"\r\n" + raw_request.body)
+            await writer.drain()
+            return await read_response(reader)
+
+    async def request(self, user: AsyncVirtualUser, intended: float | None = None) -> None:
+        """Send the request of a picked take and record its result."""
+        index = self.pick()
+        warmup = self.warming_up()
+        self.start(self.takes[index].endpoint)
+        result, body = await self.make_request(user.raw_requests[index], user, intended)
+        self.record(self.takes[index].endpoint, result, warmup, body)
+
+    async def walk(self, user: AsyncVirtualUser, intended: float | None = None) -> None:
+        """Send the takes one after the other and record each step and the whole journey."""
+        assert self.journey is not None
+        steps: list[dict[str, int | float]] = []
+        bodies: list[bytes | None] = []
+        warmup = self.warming_up()
+        self.start(self.journey)
+        for take, raw_request in zip(self.takes, user.raw_requests):
+            if steps:
+                await asyncio.sleep(self.think_time())
+            self.start(take.endpoint)
+            result, body = await self.make_request(raw_request, user, None if steps else intended)
+            steps.append(result)
+            bodies.append(body)
+            if not result['success']:
+                break
+
+        for take, result, body in zip(self.takes, steps, bodies):
+            self.record(take.endpoint, result, warmup, body)
+        self.record(self.journey, summarize_journey(steps), warmup)
+
+    async def iterate(self, user: AsyncVirtualUser, intended: float | None = None) -> None:
+        """Run one iteration of a user: a request, or a whole journey in journey mode."""
+        if self.journey is None:
+            await self.request(user, intended)
+        else:
+            await self.walk(user, intended)
+
+    async def _user(self, num_requests: int) -> None:
+        user = await self.new_user()
+        try:
+            for _ in range(num_requests):
+                if self.watchdog.tripped:
+                    break
+                await self.iterate(user)
+        finally:
+            user.pool.close()
+
+    async def _scheduled_user(self, schedule: Schedule) -> None:
+        user = await self.new_user()
+        try:
+            while not self.watchdog.tripped and (intended := schedule.next()) is not None:
+                await asyncio.sleep(max(0.0, intended - time.perf_counter()))
+                await self.iterate(user, intended)
+        finally:
+            user.pool.close()
+
+    async def _staged_user(self, index: int, profile: LoadProfile, start: float) -> None:
+        user = await self.new_user()
+        try:
+            while (elapsed := time.perf_counter() - start) < profile.duration and profile.target_at(elapsed) > index:
+                if self.watchdog.tripped:
+                    break
+                await self.iterate(user)
+        finally:
+            user.pool.close()
+
+    async def _run_stages(self, profile: LoadProfile) -> None:
+        start = time.perf_counter()
+        tasks: dict[int, asyncio.Task] = {}
+        while (elapsed := time.perf_counter() - start) < profile.duration and not self.watchdog.tripped:
+            target = profile.target_at(elapsed)
+            for index in user_indices(self.testcase, profile):
+                task = tasks.get(index)
+                if index < target and (task is None or task.done()):
+                    if task is not None:
+                        # NOTE mad: re-raise the errors of a user before replacing it
+                        task.result()
+                    tasks[index] = asyncio.create_task(self._staged_user(index, profile, start))
+            await asyncio.sleep(STAGES_TICK)
+        await asyncio.gather(*tasks.values())
+
+    async def _run(self) -> None:
+        profile = self.testcase.load_profile
+        if profile is not None and profile.executor == LoadExecutor.USERS:
+            await self._run_stages(profile)
+            return
+
+        users: list[typing.Awaitable[None]]
+        if schedule := build_schedule(self.testcase):
+            users = [self._scheduled_user(schedule) for _ in range(self.testcase.users)]
+        else:
+            users = [self._user(self.testcase.requests_per_user) for _ in range(self.testcase.users)]
+        await asyncio.gather(*users)
+
+    def run(self) -> None:
+        """Run all the virtual users in a new event loop until they are done."""
+        cpu_start = time.thread_time()
+        asyncio.run(self._run())
+        self.share_client_cpu(time.thread_time() - cpu_start)
+
+    def share_client_cpu(self, cpu: float) -> None:
+        """Split the CPU time of the event loop between the endpoints by their number of requests.
+
+        Coroutines interleave on the loop, so the CPU time of a single request cannot be
+        told apart. A journey gets the shares of its steps.
+        """
+        data = self.testcase.data
+        endpoints = {take.endpoint for take in self.takes}
+        keys = [key for key in data if key.removesuffix(WARMUP) in endpoints]
+        total = sum(len(data[key]) for key in keys)
+        for key in keys:
+            share = cpu * len(data[key]) / total
+            data[key].client_cpu += share
+            if self.journey is not None:
+                data[self.journey + WARMUP if key.endswith(WARMUP) else self.journey].client_cpu += share
+
+
+ENGINES: dict[str, typing.Type[LoadEngine]] = {
+    "threads": ThreadsEngine,
+    "asyncio": AsyncioEngine,
+}
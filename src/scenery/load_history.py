@@ -0,0 +1,283 @@
+"""Keep the summaries of load runs in a SQLite file and compare runs to a baseline."""
+
+from dataclasses import dataclass
+import math
+import os
+import sqlite3
+import subprocess
+import typing
+
+from scenery.load_metrics import WARMUP, LatencyHistogram, Recorder
+
+
+###################
+# REVISION
+###################
+
+
+def git_revision(reference: str = "HEAD") -> str | None:
+    """Return the full hash of a git revision of the current directory, None outside of a repository.
+
+    The working tree is checked for uncommitted changes when the revision is `HEAD`,
+    the hash is then suffixed with `+dirty`.
+    """
+    try:
+        revision = subprocess.run(
+            ["git", "rev-parse", "--verify", "--quiet", f"{reference}^{{commit}}"],
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+        if reference == "HEAD" and subprocess.run(["git", "diff", "--quiet", "HEAD"], capture_output=True).returncode:
+            revision += "+dirty"
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return revision
+
+
+###################
+# SUMMARIES
+###################
+
+
+@dataclass
+class RunSummary:
+    """The summary of the results of an endpoint in a load run.
+
+    Attributes:
+        manifest (str): The name of the manifest, or of the manifests of a mixed workload.
+        endpoint (str): The endpoint, e.g. 'GET /items'.
+        revision (str): The git revision of the run, 'unknown' outside of a repository.
+        timestamp (float): When the run ended, in seconds since the epoch.
+        requests (int): The number of requests sent.
+        failures (int): The number of failed requests, including those without response.
+        duration (float): Seconds from the first request sent to the last response received.
+        successes (LatencyHistogram): The latencies of the successful requests.
+        received_bytes (int): The bytes of the response bodies as received.
+    """
+
+    manifest: str
+    endpoint: str
+    revision: str
+    timestamp: float
+    requests: int
+    failures: int
+    duration: float
+    successes: LatencyHistogram
+    received_bytes: int = 0
+
+    @classmethod
+    def from_recorder(
+        cls, manifest: str, endpoint: str, recorder: Recorder, revision: str, timestamp: float
+    ) -> "RunSummary":
+        """Return the summary of the results of an endpoint as recorded by the engines."""
+        successes = LatencyHistogram.of(recorder.successes)
+        requests = len(recorder)
+        return cls(
+            manifest,
+            endpoint,
+            revision,
+            timestamp,
+            requests,
+            requests - successes.count,
+            recorder.duration,
+            successes,
+            recorder.transfer.received,
+        )
+
+    @property
+    def throughput(self) -> float:
+        """Successful requests per second over the duration of the run."""
+        return self.successes.count / self.duration if self.duration else 0.0
+
+    def percentile(self, p: float) -> float | None:
+        """Return a percentile of the latencies of the successful requests in ms, None without any."""
+        return self.successes.percentile(p) * 1000 if self.successes.count else None
+
+    @property
+    def mean_size(self) -> float:
+        """The mean size of the response bodies as received, in KB."""
+        return self.received_bytes / self.requests / 1000 if self.requests else 0.0
+
+
+def summarize_run(manifest: str, data: dict[str, Recorder], revision: str, timestamp: float) -> list[RunSummary]:
+    """Return the summaries of the endpoints of a load run, warm-ups aside."""
+    return [
+        RunSummary.from_recorder(manifest, endpoint, recorder, revision, timestamp)
+        for endpoint, recorder in data.items()
+        if not endpoint.endswith(WARMUP) and len(recorder)
+    ]
+
+
+###################
+# COMPARISON
+###################
+
+
+# NOTE mad: the z-score of the two-sided 95% confidence intervals
+Z_95 = 1.96
+
+
+@dataclass
+class Comparison:
+    """A metric of an endpoint in the current run against the baseline.
+
+    Attributes:
+        metric (str): 'p95', 'p99', 'throughput' or 'size'.
+        baseline (float): The value of the baseline, in ms, requests per second or KB.
+        current (float): The value of the current run.
+        regression (bool): Whether the current run is significantly worse than the baseline.
+    """
+
+    metric: str
+    baseline: float
+    current: float
+    regression: bool
+
+    @property
+    def change(self) -> float:
+        """The relative change from the baseline, in %."""
+        return (self.current - self.baseline) / self.baseline * 100 if self.baseline else math.inf
+
+
+def percentile_interval(latencies: LatencyHistogram, p: float, z: float = Z_95) -> typing.Tuple[float, float]:
+    """Return a distribution-free confidence interval of a percentile of the latencies, in seconds.
+
+    The number of latencies below the `p`-th percentile follows a binomial distribution,
+    whose normal approximation gives the ranks, hence the percentiles, bounding the interval.
+    """
+    q = p / 100
+    half_width = z * math.sqrt(q * (1 - q) / latencies.count)
+    return latencies.percentile(max(q - half_width, 0.0) * 100), latencies.percentile(min(q + half_width, 1.0) * 100)
+
+
+def compare(baseline: RunSummary, current: RunSummary, z: float = Z_95) -> list[Comparison]:
+    """Compare the p95, p99 and throughput of an endpoint to those of a baseline.
+
+    A percentile regressed when the confidence intervals do not overlap and the current
+    one is above. The throughput regressed when the confidence intervals of the numbers of
+    successful requests, counted as Poisson processes, do not overlap and the current one is below.
+    The mean size of the response bodies is compared when both runs measured it, e.g. to compare
+    runs with and without compression, and never regresses.
+    """
+    comparisons = []
+    if baseline.successes.count and current.successes.count:
+        for p in (95, 99):
+            _, baseline_high = percentile_interval(baseline.successes, p, z)
+            current_low, _ = percentile_interval(current.successes, p, z)
+            comparisons.append(
+                Comparison(
+                    f"p{p}",
+                    baseline.successes.percentile(p) * 1000,
+                    current.successes.percentile(p) * 1000,
+                    current_low > baseline_high,
+                )
+            )
+
+    def bounds(summary: RunSummary) -> typing.Tuple[float, float]:
+        n, duration = summary.successes.count, summary.duration or math.inf
+        return (n - z * math.sqrt(n)) / duration, (n + z * math.sqrt(n)) / duration
+
+    baseline_low, _ = bounds(baseline)
+    _, current_high = bounds(current)
+    comparisons.append(Comparison("throughput", baseline.throughput, current.throughput, current_high < baseline_low))
+    if baseline.received_bytes and current.received_bytes:
+        comparisons.append(Comparison("size", baseline.mean_size, current.mean_size, False))
+    return comparisons
+
+
+###################
+# HISTORY
+###################
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS load_runs (
+    id INTEGER PRIMARY KEY,
+    manifest TEXT NOT NULL,
+    endpoint TEXT NOT NULL,
+    revision TEXT NOT NULL,
+    timestamp REAL NOT NULL,
+    requests INTEGER NOT NULL,
+    failures INTEGER NOT NULL,
+    duration REAL NOT NULL,
+    throughput REAL NOT NULL,
+    p50 REAL,
+    p95 REAL,
+    p99 REAL,
+    histogram BLOB NOT NULL,
+    received_bytes INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS load_runs_key ON load_runs (manifest, endpoint, revision, timestamp);
+"""
+
+
+class LoadHistory:
+    """The summaries of the load runs in a SQLite file, by manifest, endpoint, git revision and time.
+
+    Percentiles, throughput and received bytes are stored as columns so that the history can
+    be queried with SQL, the histogram of the latencies so that runs can be compared.
+
+    Args:
+        path (str): The SQLite file, created with its folder if needed.
+    """
+
+    def __init__(self, path: str) -> None:
+        if folder := os.path.dirname(path):
+            os.makedirs(folder, exist_ok=True)
+        self.connection = sqlite3.connect(path)
+        self.connection.executescript(SCHEMA)
+
+    def close(self) -> None:
+        """Close the connection to the SQLite file."""
+        self.connection.close()
+
+    def save(self, summaries: list[RunSummary]) -> None:
+        """Add the summaries of a run."""
+        with self.connection:
+            self.connection.executemany(
+                "INSERT INTO load_runs (manifest, endpoint, revision, timestamp, requests, failures, duration, "
+                "throughput, p50, p95, p99, histogram, received_bytes) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        summary.manifest,
+                        summary.endpoint,
+                        summary.revision,
+                        summary.timestamp,
+                        summary.requests,
+                        summary.failures,
+                        summary.duration,
+                        summary.throughput,
+                        summary.percentile(50),
+                        summary.percentile(95),
+                        summary.percentile(99),
+                        summary.successes.to_bytes(),
+                        summary.received_bytes,
+                    )
+                    for summary in summaries
+                ],
+            )
+
+    def baseline(self, manifest: str, endpoint: str, revision: str | None = None) -> RunSummary | None:
+        """Return the latest run of an endpoint, of a given revision if any, None if there is no such run.
+
+        Revisions are matched exactly, so that the runs of a dirty tree are not taken for those of its commit.
+        """
+        row: typing.Tuple[str, str, str, float, int, int, float, bytes, int] | None = self.connection.execute(
+            "SELECT manifest, endpoint, revision, timestamp, requests, failures, duration, histogram, received_bytes "
+            "FROM load_runs WHERE manifest = ? AND endpoint = ? AND (? IS NULL OR revision = ?) "
+            "ORDER BY timestamp DESC LIMIT 1",
+            (manifest, endpoint, revision, revision),
+        ).fetchone()
+        if row is None:
+            return None
+        manifest, endpoint, revision, timestamp, requests, failures, duration, histogram, received_bytes = row
+        return RunSummary(
+            manifest,
+            endpoint,
+            revision,
+            timestamp,
+            requests,
+            failures,
+            duration,
+            LatencyHistogram.from_bytes(histogram),
+            received_bytes,
+        )
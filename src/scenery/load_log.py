@@ -0,0 +1,313 @@
+"""Log every request of load tests to a file and analyze the logs offline."""
+
+from dataclasses import dataclass
+import datetime
+import json
+import math
+import mmap
+import os
+import struct
+import tempfile
+import typing
+
+from scenery.load_metrics import ERRORS, PHASES, WARMUP, HistogramRecorder, status_class
+
+
+###################
+# FORMAT
+###################
+
+
+# NOTE mad: a binary record is the timestamp, the latency, the send delay and the phases (NaN when
+# missing), the sizes of the body as received and decoded (NO_SIZE when unknown), the status code,
+# flags, the index of the error (NO_ERROR when none) and the length of the endpoint, followed by the
+# endpoint in UTF-8, i.e. 41 bytes plus the endpoint. Binary logs start with a header, the magic bytes
+# and the version of the format, so that logs of another format are rejected instead of misread
+HEADER = struct.Struct("<8sH")
+MAGIC = b"SCENERY\x00"
+VERSION = 1
+RECORD = struct.Struct("<dfffffIIHBBB")
+NO_ERROR = 0xFF
+NO_SIZE = 0xFFFFFFFF
+SIZES = ("response_size", "decoded_size")
+SUCCESS, CONNECTION_KNOWN, NEW_CONNECTION = 1, 2, 4
+
+LOG_EXTENSIONS = (".bin", ".jsonl")
+
+
+def encode_binary(endpoint: str, result: dict[str, int | float]) -> bytes:
+    """Return the binary record of the result of a request to an endpoint."""
+    name = endpoint.encode("utf8")[:255]
+    flags = SUCCESS if result["success"] else 0
+    if "new_connection" in result:
+        flags |= CONNECTION_KNOWN | (NEW_CONNECTION if result["new_connection"] else 0)
+    return RECORD.pack(
+        result["timestamp"],
+        result["elapsed_time"],
+        result.get("send_delay", math.nan),
+        *(result.get(phase, math.nan) for phase in PHASES),
+        *(min(int(result.get(size, NO_SIZE)), NO_SIZE) for size in SIZES),
+        int(result["status_code"]),
+        flags,
+        int(result.get("error", NO_ERROR)),
+        len(name),
+    ) + name
+
+
+def decode_binary(fields: tuple) -> dict[str, int | float]:
+    """Return the result of a request from the fields of its binary record, endpoint aside."""
+    timestamp, elapsed_time, send_delay, *values, status_code, flags, error, _ = fields
+    phases, sizes = values[:len(PHASES)], values[len(PHASES):]
+    result: dict[str, int | float] = {
+        "timestamp": timestamp,
+        "elapsed_time": elapsed_time,
+        "status_code": status_code,
+        "success": bool(flags & SUCCESS),
+    }
+    if not math.isnan(send_delay):
+        result["send_delay"] = send_delay
+    for phase, value in zip(PHASES, phases):
+        if not math.isnan(value):
+            result[phase] = value
+    for size, value in zip(SIZES, sizes):
+        if value != NO_SIZE:
+            result[size] = value
+    if flags & CONNECTION_KNOWN:
+        result["new_connection"] = bool(flags & NEW_CONNECTION)
+    if error != NO_ERROR:
+        result["error"] = error
+    return result
+
+
+def check_header(data: bytes) -> None:
+    """Check the first bytes of a binary log are the header of the current format.
+
+    Raises:
+        ValueError: If they are not, e.g. for a log written by a former version of scenery.
+    """
+    if len(data) < HEADER.size or data[:len(MAGIC)] != MAGIC:
+        raise ValueError("Not a binary request log, or one written before the logs had a header")
+    _, version = HEADER.unpack_from(data)
+    if version != VERSION:
+        raise ValueError(f"Binary request log of version {version}, expected version {VERSION}")
+
+
+def create_binary_log(path: str) -> None:
+    """Create a binary log with its header, if it does not exist, and check its header otherwise.
+
+    The file is created by linking a complete temporary one, so that the processes of a
+    load test can race to create it without any of them appending a record before the header.
+
+    Raises:
+        ValueError: If the file exists with another header.
+    """
+    fd, temporary = tempfile.mkstemp(dir=os.path.dirname(path) or ".")
+    try:
+        os.write(fd, HEADER.pack(MAGIC, VERSION))
+        os.fchmod(fd, 0o644)
+        os.close(fd)
+        os.link(temporary, path)
+    except FileExistsError:
+        pass
+    finally:
+        os.unlink(temporary)
+    with open(path, "rb") as f:
+        check_header(f.read(HEADER.size))
+
+
+def encode_json(endpoint: str, result: dict[str, int | float]) -> bytes:
+    """Return the JSON line of the result of a request to an endpoint."""
+    return (json.dumps({"endpoint": endpoint, **result}) + "\n").encode("utf8")
+
+
+###################
+# WRITER
+###################
+
+
+class RequestLog:
+    """An append-only log of the results of the requests, binary or JSON lines by the extension of its file.
+
+    Records are buffered and written by chunks of whole records, so that the processes of
+    a load test can append to the same file without interleaving their records.
+
+    Args:
+        path (str): The `.bin` or `.jsonl` file, created with its folder if needed.
+
+    Raises:
+        ValueError: If the extension of the file is neither `.bin` nor `.jsonl`, or if the
+            binary file exists in another format.
+    """
+
+    BUFFER_SIZE = 1 << 16
+
+    def __init__(self, path: str) -> None:
+        if not path.endswith(LOG_EXTENSIONS):
+            raise ValueError(f"Unsupported request log '{path}', expected .bin or .jsonl")
+        self.encode = encode_json if path.endswith(".jsonl") else encode_binary
+        if folder := os.path.dirname(path):
+            os.makedirs(folder, exist_ok=True)
+        if self.encode is encode_binary:
+            create_binary_log(path)
+        self.fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        self.buffer = bytearray()
+
+    def write(self, endpoint: str, result: dict[str, int | float]) -> None:
+        """Add the result of a request to an endpoint, from one thread at a time."""
+        self.buffer += self.encode(endpoint, result)
+        if len(self.buffer) >= self.BUFFER_SIZE:
+            self.flush()
+
+    def flush(self) -> None:
+        """Write the buffered records to the file."""
+        view = memoryview(self.buffer)
+        while view:
+            view = view[os.write(self.fd, view):]
+        view.release()
+        self.buffer.clear()
+
+    def close(self) -> None:
+        """Write the buffered records and close the file."""
+        self.flush()
+        os.close(self.fd)
+
+
+###################
+# READER
+###################
+
+
+def read_binary(buffer: mmap.mmap) -> typing.Iterator[typing.Tuple[str, dict[str, int | float]]]:
+    """Yield the endpoints and results of the records of a binary log, up to a truncated one.
+
+    Raises:
+        ValueError: If the log does not start with the header of the current format.
+    """
+    check_header(buffer[:HEADER.size])
+    endpoints: dict[bytes, str] = {}
+    offset, end = HEADER.size, len(buffer)
+    while offset + RECORD.size <= end:
+        fields = RECORD.unpack_from(buffer, offset)
+        offset += RECORD.size
+        length = fields[-1]
+        if offset + length > end:
+            break
+        name = buffer[offset:offset + length]
+        offset += length
+        endpoint = endpoints.get(name)
+        if endpoint is None:
+            endpoint = endpoints[name] = name.decode("utf8", errors="replace")
+        yield endpoint, decode_binary(fields)
+
+
+def read_jsonl(buffer: mmap.mmap) -> typing.Iterator[typing.Tuple[str, dict[str, int | float]]]:
+    """Yield the endpoints and results of the lines of a JSON lines log, up to a truncated one."""
+    for line in iter(buffer.readline, b""):
+        if not line.endswith(b"\n"):
+            break
+        result = json.loads(line)
+        yield result.pop("endpoint"), result
+
+
+def read_log(path: str) -> typing.Iterator[typing.Tuple[str, dict[str, int | float]]]:
+    """Yield the endpoints and results of the records of a log, one at a time from the memory-mapped file."""
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            yield from read_jsonl(buffer) if path.endswith(".jsonl") else read_binary(buffer)
+
+
+###################
+# ANALYSIS
+###################
+
+
+@dataclass
+class LogFilter:
+    """Which records of a log to analyze.
+
+    Attributes:
+        since (float | datetime.datetime | None): The start of the time window, either seconds
+            after the earliest record of the log or a date.
+        until (float | datetime.datetime | None): The end of the time window, likewise.
+        endpoints (list[str]): The endpoints to keep, with their warm-up, all if empty.
+        statuses (list[str]): The status codes (e.g. '503'), classes (e.g. '5xx') or classes of
+            errors (e.g. 'timeout') to keep, all if empty.
+    """
+
+    since: float | datetime.datetime | None = None
+    until: float | datetime.datetime | None = None
+    endpoints: typing.Sequence[str] = ()
+    statuses: typing.Sequence[str] = ()
+
+    @staticmethod
+    def bound(value: float | datetime.datetime | None, origin: float, default: float) -> float:
+        """Return a bound of the time window in seconds since the epoch."""
+        if value is None:
+            return default
+        if isinstance(value, datetime.datetime):
+            return value.timestamp()
+        return origin + value
+
+    @property
+    def relative(self) -> bool:
+        """Whether a bound of the time window is relative to the earliest record of the log."""
+        return any(isinstance(value, (int, float)) for value in (self.since, self.until))
+
+    def window(self, origin: float) -> typing.Tuple[float, float]:
+        """Return the time window in seconds since the epoch, relative bounds starting at `origin`."""
+        return self.bound(self.since, origin, -math.inf), self.bound(self.until, origin, math.inf)
+
+    def match(self, endpoint: str, result: dict[str, int | float]) -> bool:
+        """Whether a record has one of the endpoints and of the statuses, time window aside."""
+        if self.endpoints and endpoint.removesuffix(WARMUP) not in self.endpoints:
+            return False
+        if not self.statuses:
+            return True
+        if "error" in result:
+            return ERRORS[int(result["error"])] in self.statuses
+        status_code = int(result["status_code"])
+        return str(status_code) in self.statuses or status_class(status_code) in self.statuses
+
+
+@dataclass
+class LogAnalysis:
+    """The results of the records of a log kept by a filter, by endpoint.
+
+    Attributes:
+        data (dict[str, HistogramRecorder]): The results, by endpoint.
+        records (int): The number of records read.
+        matched (int): The number of records kept.
+    """
+
+    data: dict[str, HistogramRecorder]
+    records: int = 0
+    matched: int = 0
+
+
+def analyze_log(path: str, log_filter: LogFilter) -> LogAnalysis:
+    """Stream the records of a log kept by a filter into histograms, in constant memory whatever its size.
+
+    The log does not tell how the requests were sent, endpoints whose records have an intended
+    send time are taken as open-model ones. Relative bounds of the time window start at the earliest
+    record of the log, which is then read twice.
+    """
+    analysis = LogAnalysis({})
+    origin = 0.0
+    if log_filter.relative:
+        # NOTE mad: the processes of a load test append their records by chunks, so that the
+        # first record of the log is not the earliest one
+        origin = min((result["timestamp"] for _, result in read_log(path)), default=0.0)
+    start, end = log_filter.window(origin)
+    for endpoint, result in read_log(path):
+        analysis.records += 1
+        if not start <= result["timestamp"] <= end or not log_filter.match(endpoint, result):
+            continue
+        analysis.matched += 1
+        if endpoint not in analysis.data:
+            analysis.data[endpoint] = HistogramRecorder()
+        if "send_delay" in result:
+            analysis.data[endpoint].open_model = True
+        analysis.data[endpoint].record(result)
+    return analysis
@@ -0,0 +1,905 @@
+"""Record the results of load tests and compute statistics on them."""
+
+from array import array
+import bisect
+import collections
+import csv
+from dataclasses import dataclass, field
+import itertools
+import json
+import math
+import random
+import time
+import typing
+import zlib
+
+# NOTE mad: numpy is optional, statistics on samples are vectorized when it is installed
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+PERCENTILES = (50, 90, 95, 99)
+
+# NOTE mad: the phases of a request as measured by the engines, the connect time
+# only makes sense for the requests which opened a new connection
+PHASES = ("connect_time", "ttfb", "download_time")
+
+# NOTE mad: the classes of errors of the requests which got no response, the engines
+# record them by index with a status code 0
+ERRORS = ("timeout", "refused", "reset", "tls", "dns", "other")
+
+# NOTE mad: how many bodies of failed responses are sampled by endpoint, and how many bytes
+# of each are kept, so that they can be shown without keeping the responses
+ERROR_BODIES = 5
+ERROR_BODY_MAX = 1024
+
+
+###################
+# HISTOGRAM
+###################
+
+
+class LatencyHistogram:
+    """A fixed-memory log-linear histogram of latencies, in the spirit of HdrHistogram.
+
+    Latencies are recorded with a microsecond resolution. Up to `2 * SUB_BUCKETS` µs the buckets
+    are 1µs wide, then each power of two is split in `SUB_BUCKETS` buckets, which bounds
+    the relative error to `1 / SUB_BUCKETS`. Memory does not depend on the number of values
+    recorded and histograms can be merged, e.g. across processes.
+
+    Args:
+        max_latency (float): The largest latency in seconds that can be told apart,
+            larger ones are recorded in the last bucket.
+    """
+
+    SUB_BUCKETS = 128
+    # NOTE mad: values are counted in units of 1 / UNIT, i.e. microseconds of the latencies in seconds
+    UNIT = 1_000_000
+
+    def __init__(self, max_latency: float = 3600.0) -> None:
+        self.n_buckets = self._index(int(max_latency * self.UNIT)) + 1
+        self.counts = array("Q", bytes(8 * self.n_buckets))
+        self.count = 0
+        self.min = math.inf
+        self.max = 0.0
+        self.sum = 0.0
+        self.sum_of_squares = 0.0
+
+    @classmethod
+    def _index(cls, microseconds: int) -> int:
+        if microseconds < 2 * cls.SUB_BUCKETS:
+            return microseconds
+        exponent = microseconds.bit_length() - cls.SUB_BUCKETS.bit_length()
+        return cls.SUB_BUCKETS * (exponent + 1) + (microseconds >> exponent) - cls.SUB_BUCKETS
+
+    @classmethod
+    def _bounds(cls, index: int) -> typing.Tuple[int, int]:
+        """Return the range of microseconds `[lower, upper)` covered by a bucket."""
+        if index < 2 * cls.SUB_BUCKETS:
+            return index, index + 1
+        exponent, sub_index = divmod(index - cls.SUB_BUCKETS, cls.SUB_BUCKETS)
+        lower = (cls.SUB_BUCKETS + sub_index) << exponent
+        return lower, lower + (1 << exponent)
+
+    def record(self, latency: float, count: int = 1) -> None:
+        """Record a latency in seconds, possibly several times."""
+        index = min(self._index(int(latency * self.UNIT)), self.n_buckets - 1)
+        self.counts[index] += count
+        self.count += count
+        self.min = min(self.min, latency)
+        self.max = max(self.max, latency)
+        self.sum += latency * count
+        self.sum_of_squares += latency * latency * count
+
+    def merge(self, other: "LatencyHistogram") -> None:
+        """Add the values recorded by another histogram."""
+        for index, count in enumerate(other.counts):
+            if count:
+                self.counts[index] += count
+        self.count += other.count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self.sum += other.sum
+        self.sum_of_squares += other.sum_of_squares
+
+    def to_bytes(self) -> bytes:
+        """Return the histogram as compressed bytes, e.g. to be stored, see `from_bytes`."""
+        header = array("d", [self.count, self.min, self.max, self.sum, self.sum_of_squares])
+        return zlib.compress(header.tobytes() + self.counts.tobytes())
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "LatencyHistogram":
+        """Return the histogram encoded by `to_bytes`."""
+        raw = zlib.decompress(data)
+        header = array("d", raw[:40])
+        histogram = cls.__new__(cls)
+        histogram.counts = array("Q", raw[40:])
+        histogram.n_buckets = len(histogram.counts)
+        histogram.count = int(header[0])
+        histogram.min, histogram.max, histogram.sum, histogram.sum_of_squares = header[1:]
+        return histogram
+
+    @classmethod
+    def of(cls, latencies: "Latencies") -> "LatencyHistogram":
+        """Return latencies as a histogram, recording the samples if needed."""
+        if isinstance(latencies, LatencyHistogram):
+            return latencies
+        histogram = cls()
+        for latency in latencies.values:
+            histogram.record(latency)
+        return histogram
+
+    def buckets(self) -> typing.Iterator[typing.Tuple[float, int]]:
+        """Yield the representative latency in seconds and the count of each non empty bucket."""
+        for index, count in enumerate(self.counts):
+            if count:
+                lower, upper = self._bounds(index)
+                value = (lower + upper - 1) / 2 / self.UNIT
+                yield min(max(value, self.min), self.max), count
+
+    def percentile(self, p: float) -> float:
+        """Return the latency in seconds below which `p` percent of the values fall."""
+        if self.count == 0:
+            raise ValueError("No latency recorded")
+        rank = max(1, math.ceil(p / 100 * self.count))
+        seen = 0
+        for value, count in self.buckets():
+            seen += count
+            if seen >= rank:
+                return value
+        return self.max
+
+    def percentiles(self, ps: typing.Iterable[int] = PERCENTILES) -> dict[int, float]:
+        """Return several percentiles at once, in seconds."""
+        return {p: self.percentile(p) for p in ps}
+
+    @property
+    def mean(self) -> float:
+        """The mean latency in seconds."""
+        return self.sum / self.count
+
+    @property
+    def stdev(self) -> float:
+        """The sample standard deviation of the latencies in seconds."""
+        variance = (self.sum_of_squares - self.sum * self.sum / self.count) / (self.count - 1)
+        return math.sqrt(max(variance, 0.0))
+
+    def count_between(self, start: float, end: float) -> int:
+        """Return the number of latencies in `[start, end)`, in seconds, up to the bucket resolution."""
+        return self.histogram([start, end])[0]
+
+    def histogram(self, edges: typing.Sequence[float]) -> list[int]:
+        """Return the number of latencies between consecutive edges, in seconds, in a single pass."""
+        counts = [0] * (len(edges) - 1)
+        for value, count in self.buckets():
+            i = bisect.bisect_right(edges, value) - 1
+            if 0 <= i < len(counts):
+                counts[i] += count
+        return counts
+
+    def corrected(self, expected_interval: float) -> "LatencyHistogram":
+        """Return a copy corrected for coordinated omission.
+
+        A stalled request delays all the requests its user should have sent in the meantime,
+        which are then missing from the measurements. As in HdrHistogram, each latency `t`
+        larger than the expected interval between two requests of a user is complemented
+        with `t - interval`, `t - 2 * interval`, ... the latencies the missing requests
+        would have seen.
+        """
+        histogram = LatencyHistogram()
+        for value, count in self.buckets():
+            histogram.record(value, count)
+            missing = value - expected_interval
+            while expected_interval > 0 and missing >= expected_interval:
+                histogram.record(missing, count)
+                missing -= expected_interval
+        return histogram
+
+
+class SizeHistogram(LatencyHistogram):
+    """A fixed-memory log-linear histogram of sizes in bytes, whose first buckets are 1 byte wide.
+
+    Sizes are recorded, and read, where `LatencyHistogram` has latencies in seconds.
+
+    Args:
+        max_latency (float): The largest size in bytes that can be told apart,
+            larger ones are recorded in the last bucket.
+    """
+
+    UNIT = 1
+
+
+# NOTE mad: the results of the warm-up of a load test are recorded apart, under the endpoint with this suffix
+WARMUP = " (warm-up)"
+
+
+###################
+# TIME SERIES
+###################
+
+
+# NOTE mad: upper bounds in seconds of the latency buckets of the time series, coarse enough
+# to keep a histogram per second of long runs
+SERIES_EDGES = (0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1.0, 2.0, 5.0, 10.0)
+
+
+def format_latency(seconds: float) -> str:
+    """Return a latency in seconds as a short label, e.g. '500ms' or '2s'."""
+    return f"{seconds * 1000:g}ms" if seconds < 1 else f"{seconds:g}s"
+
+
+SERIES_BUCKETS = tuple(f"lt_{format_latency(edge)}" for edge in SERIES_EDGES) + (
+    f"ge_{format_latency(SERIES_EDGES[-1])}",
+)
+
+
+class TimeSeries:
+    """Results of the requests sent to an endpoint, second by second.
+
+    For each second, by the time the responses were received, the requests and the failed
+    ones are counted, the latencies summed and put in a coarse histogram bounded by `SERIES_EDGES`,
+    i.e. 136 bytes per second. Seconds are those of the epoch so that series recorded in
+    different processes can be merged.
+    """
+
+    WIDTH = 3 + len(SERIES_BUCKETS)
+
+    def __init__(self) -> None:
+        self.rows: dict[int, array] = {}
+
+    def record(self, end: float, latency: float, success: bool) -> None:
+        """Record a request answered at `end`, since the epoch, after `latency` seconds."""
+        second = int(end)
+        if second not in self.rows:
+            self.rows[second] = array("d", bytes(8 * self.WIDTH))
+        row = self.rows[second]
+        row[0] += 1
+        row[1] += not success
+        row[2] += latency
+        row[3 + bisect.bisect_right(SERIES_EDGES, latency)] += 1
+
+    def merge(self, other: "TimeSeries") -> None:
+        """Add the requests recorded by another series."""
+        for second, other_row in other.rows.items():
+            row = self.rows.setdefault(second, array("d", bytes(8 * self.WIDTH)))
+            for i, value in enumerate(other_row):
+                row[i] += value
+
+    @property
+    def seconds(self) -> range:
+        """Every second from the first response to the last one."""
+        return range(min(self.rows), max(self.rows) + 1) if self.rows else range(0)
+
+    def row(self, second: int) -> dict[str, typing.Any]:
+        """Return the statistics of a second, with no request if no response was received then."""
+        requests, failures, latencies, *buckets = self.rows.get(second, [0.0] * self.WIDTH)
+        return {
+            "timestamp": second,
+            "requests": int(requests),
+            "failures": int(failures),
+            "mean_latency_ms": latencies / requests * 1000 if requests else None,
+            **dict(zip(SERIES_BUCKETS, map(int, buckets))),
+        }
+
+
+def export_series(data: typing.Mapping[str, "Recorder"], path: str) -> None:
+    """Write the time series of the endpoints to a CSV or JSON lines file, one row per endpoint and second.
+
+    Rows also hold the seconds `elapsed` since the first response of the run, and seconds
+    without response are written with no request, so that the rows of an endpoint are contiguous.
+
+    Raises:
+        ValueError: If the extension of the file is neither `.csv` nor `.jsonl`.
+    """
+    series = {endpoint: recorder.series for endpoint, recorder in data.items()}
+    start = min((s.seconds.start for s in series.values() if s.rows), default=0)
+    rows = [
+        {"endpoint": endpoint, "elapsed": second - start, **s.row(second)}
+        for endpoint, s in series.items()
+        for second in s.seconds
+    ]
+
+    with open(path, "w", newline="") as f:
+        if path.endswith(".csv"):
+            writer = csv.DictWriter(f, fieldnames=["endpoint", "elapsed", *TimeSeries().row(0)])
+            writer.writeheader()
+            writer.writerows(rows)
+        elif path.endswith(".jsonl"):
+            f.writelines(json.dumps(row) + "\n" for row in rows)
+        else:
+            raise ValueError(f"Unsupported time series file '{path}', expected .csv or .jsonl")
+
+
+def status_class(status_code: int) -> str:
+    """Return the class of a status code, e.g. '2xx'."""
+    return f"{status_code // 100}xx"
+
+
+class ErrorBodies:
+    """A uniform sample of the bodies of the failed responses, with their status code.
+
+    At most `size` bodies are kept whatever the number of failures, each replacing a kept
+    one with the probability that keeps the sample uniform (reservoir sampling).
+
+    Args:
+        size (int): The number of bodies kept.
+    """
+
+    def __init__(self, size: int = ERROR_BODIES) -> None:
+        self.size = size
+        self.seen = 0
+        self.bodies: list[typing.Tuple[int, bytes]] = []
+
+    def offer(self, status_code: int, body: bytes) -> None:
+        """Count the body of a failed response, and keep it if drawn."""
+        self.seen += 1
+        if len(self.bodies) < self.size:
+            self.bodies.append((status_code, body))
+        elif (index := random.randrange(self.seen)) < self.size:
+            self.bodies[index] = (status_code, body)
+
+    def merge(self, other: "ErrorBodies") -> None:
+        """Keep a uniform sample of the bodies offered to both samples.
+
+        Each kept body is drawn from one sample or the other in proportion to the bodies
+        each was offered and not drawn yet.
+        """
+        mine, theirs = random.sample(self.bodies, len(self.bodies)), random.sample(other.bodies, len(other.bodies))
+        my_seen, their_seen = self.seen, other.seen
+        bodies: list[typing.Tuple[int, bytes]] = []
+        while len(bodies) < self.size and (mine or theirs):
+            if theirs and (not mine or random.random() < their_seen / (my_seen + their_seen)):
+                bodies.append(theirs.pop())
+                their_seen -= 1
+            else:
+                bodies.append(mine.pop())
+                my_seen -= 1
+        self.bodies = bodies
+        self.seen += other.seen
+
+
+@dataclass
+class Transfer:
+    """The bytes of the bodies of the responses of an endpoint.
+
+    Attributes:
+        received (int): The bytes of the bodies as received.
+        encoded (int): The bytes received of the content-encoded bodies, e.g. gzip.
+        decoded (int): The bytes of the content-encoded bodies once decoded.
+    """
+
+    received: int = 0
+    encoded: int = 0
+    decoded: int = 0
+
+    def record(self, result: dict[str, int | float]) -> None:
+        """Count the body of a response, as measured by the engines."""
+        self.received += int(result.get("response_size", 0))
+        if "decoded_size" in result:
+            self.encoded += int(result["response_size"])
+            self.decoded += int(result["decoded_size"])
+
+    def merge(self, other: "Transfer") -> None:
+        """Add the bytes counted by another transfer."""
+        self.received += other.received
+        self.encoded += other.encoded
+        self.decoded += other.decoded
+
+    @property
+    def compression_ratio(self) -> float | None:
+        """How many times smaller the content-encoded bodies were received than decoded, None without any."""
+        return self.decoded / self.encoded if self.encoded else None
+
+
+# NOTE mad: the largest response body told apart in the sizes histograms, 4 GiB as in the binary request logs
+MAX_RESPONSE_SIZE = float(1 << 32)
+
+
+class HistogramRecorder:
+    """Streaming results of the requests sent to an endpoint.
+
+    Latencies are kept in one `LatencyHistogram` per status class and the latencies of
+    successful requests measured from their intended send time, when they have one, in another
+    one, so that memory stays flat whatever the length of the run. The engines set `open_model`
+    when the requests were scheduled at a rate, the correction for coordinated omission then
+    uses the latter. The phases of successful requests
+    get a histogram each too. Requests are also counted by whether they opened a new connection
+    or reused one, and those which got no response by class of error. The `TimeSeries` of the
+    requests follows them second by second. The CPU time the engine spent on the requests
+    is summed in `client_cpu`, and the bodies of the failed responses are sampled in `error_bodies`.
+    The sizes of the response bodies, in bytes, get a histogram and their bytes are counted in `transfer`.
+    """
+
+    def __init__(self) -> None:
+        self.histograms: dict[str, LatencyHistogram] = {}
+        self.open_model = False
+        self.scheduled = LatencyHistogram()
+        self.phases = {phase: LatencyHistogram() for phase in PHASES}
+        self.status_codes: collections.Counter[int] = collections.Counter()
+        self.errors: collections.Counter[str] = collections.Counter()
+        self.connections: collections.Counter[str] = collections.Counter()
+        self.series = TimeSeries()
+        self.start = math.inf
+        self.end = -math.inf
+        self.client_cpu = 0.0
+        self.error_bodies = ErrorBodies()
+        self.sizes = SizeHistogram(MAX_RESPONSE_SIZE)
+        self.transfer = Transfer()
+
+    def record(self, result: dict[str, int | float]) -> None:
+        """Record the result of a request, as returned by the engines."""
+        if "timestamp" in result:
+            self.start = min(self.start, result["timestamp"])
+            self.end = max(self.end, result["timestamp"] + result["elapsed_time"])
+            end = result["timestamp"] + result["elapsed_time"]
+            self.series.record(end, result["elapsed_time"], bool(result["success"]))
+        if "error" in result:
+            key = "error"
+            self.errors[ERRORS[int(result["error"])]] += 1
+        else:
+            status_code = int(result["status_code"])
+            key = status_class(status_code)
+            self.status_codes[status_code] += 1
+        if key not in self.histograms:
+            self.histograms[key] = LatencyHistogram()
+        self.histograms[key].record(result["elapsed_time"])
+        if result["success"]:
+            # NOTE mad: the steps of an open-model journey after the first one have no intended send time
+            self.scheduled.record(result["elapsed_time"] + result.get("send_delay", 0.0))
+            for phase in PHASES:
+                if phase in result and (phase != "connect_time" or result["new_connection"]):
+                    self.phases[phase].record(result[phase])
+        if "new_connection" in result:
+            self.connections["new" if result["new_connection"] else "reused"] += 1
+        self.client_cpu += result.get("client_cpu", 0.0)
+        if "response_size" in result:
+            self.sizes.record(result["response_size"])
+            self.transfer.record(result)
+
+    def merge(self, other: "HistogramRecorder") -> None:
+        """Add the results recorded by another recorder."""
+        for key, histogram in other.histograms.items():
+            self.histograms.setdefault(key, LatencyHistogram()).merge(histogram)
+        self.open_model = self.open_model or other.open_model
+        self.scheduled.merge(other.scheduled)
+        for phase, histogram in other.phases.items():
+            self.phases[phase].merge(histogram)
+        self.status_codes.update(other.status_codes)
+        self.errors.update(other.errors)
+        self.connections.update(other.connections)
+        self.series.merge(other.series)
+        self.start = min(self.start, other.start)
+        self.end = max(self.end, other.end)
+        self.client_cpu += other.client_cpu
+        self.error_bodies.merge(other.error_bodies)
+        self.sizes.merge(other.sizes)
+        self.transfer.merge(other.transfer)
+
+    def __len__(self) -> int:
+        return sum(self.status_codes.values()) + sum(self.errors.values())
+
+    @property
+    def duration(self) -> float:
+        """Seconds from the first request sent to the last response received."""
+        return max(self.end - self.start, 0.0)
+
+    @property
+    def throughput(self) -> float:
+        """Successful requests per second over the duration of the run."""
+        return self.successes.count / self.duration if self.duration else 0.0
+
+    @property
+    def successes(self) -> LatencyHistogram:
+        """Latencies of the successful (2xx) requests."""
+        return self.histograms.get("2xx", LatencyHistogram())
+
+    @property
+    def failures_status_codes(self) -> collections.Counter[int]:
+        """Number of failed requests by status code."""
+        return collections.Counter(
+            {code: n for code, n in self.status_codes.items() if not 200 <= code < 300}
+        )
+
+    def corrected(self, expected_interval: float) -> LatencyHistogram:
+        """Latencies of the successful requests corrected for coordinated omission.
+
+        Open-model latencies are measured from the intended send time, otherwise
+        they are backfilled with the expected interval in seconds.
+        """
+        if self.open_model:
+            return self.scheduled
+        return self.successes.corrected(expected_interval)
+
+
+###################
+# SAMPLES
+###################
+
+
+class LatencySamples:
+    """Every latency recorded, in seconds, in a compact `array('d')`.
+
+    Offers the same statistics as `LatencyHistogram` but exact, computed with NumPy when
+    it is installed and with C-level sorting and bisection otherwise.
+
+    Args:
+        values (Iterable[float]): Initial latencies in seconds.
+    """
+
+    def __init__(self, values: typing.Iterable[float] = ()) -> None:
+        if np is not None and isinstance(values, np.ndarray):
+            values = values.astype(np.float64).tobytes()
+        self.values = array("d", values)
+        self._sorted: typing.Any = None
+
+    def _sorted_values(self) -> typing.Any:
+        if self._sorted is None:
+            if np is not None:
+                self._sorted = np.sort(np.frombuffer(self.values, dtype=np.float64))
+            else:
+                self._sorted = sorted(self.values)
+        return self._sorted
+
+    @property
+    def count(self) -> int:
+        """The number of latencies."""
+        return len(self.values)
+
+    @property
+    def min(self) -> float:
+        """The smallest latency."""
+        return float(self._sorted_values()[0])
+
+    @property
+    def max(self) -> float:
+        """The largest latency."""
+        return float(self._sorted_values()[-1])
+
+    @property
+    def mean(self) -> float:
+        """The mean latency."""
+        return math.fsum(self.values) / self.count
+
+    @property
+    def stdev(self) -> float:
+        """The sample standard deviation of the latencies."""
+        if np is not None:
+            return float(np.frombuffer(self.values, dtype=np.float64).std(ddof=1))
+        mean = self.mean
+        return math.sqrt(math.fsum((v - mean) ** 2 for v in self.values) / (self.count - 1))
+
+    def record(self, latency: float, count: int = 1) -> None:
+        """Record a latency in seconds, possibly several times."""
+        self.values.extend(itertools.repeat(latency, count))
+        self._sorted = None
+
+    def merge(self, other: "LatencySamples") -> None:
+        """Add the latencies of other samples."""
+        self.values.extend(other.values)
+        self._sorted = None
+
+    def percentile(self, p: float) -> float:
+        """Return the latency below which `p` percent of the values fall (nearest rank)."""
+        if self.count == 0:
+            raise ValueError("No latency recorded")
+        rank = max(1, math.ceil(p / 100 * self.count))
+        return float(self._sorted_values()[rank - 1])
+
+    def percentiles(self, ps: typing.Iterable[int] = PERCENTILES) -> dict[int, float]:
+        """Return several percentiles at once."""
+        return {p: self.percentile(p) for p in ps}
+
+    def histogram(self, edges: typing.Sequence[float]) -> list[int]:
+        """Return the number of latencies between consecutive edges."""
+        sorted_values = self._sorted_values()
+        if np is not None:
+            positions = np.searchsorted(sorted_values, edges, side="left")
+        else:
+            positions = [bisect.bisect_left(sorted_values, edge) for edge in edges]
+        return [int(end - start) for start, end in zip(positions[:-1], positions[1:])]
+
+    def count_between(self, start: float, end: float) -> int:
+        """Return the number of latencies in `[start, end)`."""
+        return self.histogram([start, end])[0]
+
+    def corrected(self, expected_interval: float) -> "LatencySamples":
+        """Return a copy corrected for coordinated omission, see `LatencyHistogram.corrected`."""
+        if expected_interval <= 0:
+            return LatencySamples(self.values)
+        if np is not None:
+            values = np.frombuffer(self.values, dtype=np.float64)
+            missing = np.maximum(np.floor(values / expected_interval) - 1, 0).astype(np.int64)
+            repeated = np.repeat(values, missing)
+            # NOTE mad: k-th missing value of each latency is latency - k * interval, k starting at 1
+            starts = np.repeat(np.cumsum(missing) - missing, missing)
+            k = np.arange(repeated.size) - starts + 1
+            return LatencySamples(np.concatenate([values, repeated - k * expected_interval]))
+        corrected = LatencySamples(self.values)
+        for latency in self.values:
+            missing = latency - expected_interval
+            while missing >= expected_interval:
+                corrected.values.append(missing)
+                missing -= expected_interval
+        return corrected
+
+
+class SamplesRecorder:
+    """Every result of the requests sent to an endpoint, stored column-wise.
+
+    Timestamps, latencies, send delays, phases and response sizes (in bytes) are kept in `array('d')`
+    and status codes in `array('H')`, i.e. 58 bytes per request, and statistics are vectorized with NumPy
+    when it is installed. Requests which got no response have a status code 0 and are
+    counted by class of error. The CPU time the engine spent on the requests is summed in
+    `client_cpu`, the bodies of the failed responses are sampled in `error_bodies` and their
+    bytes counted in `transfer`. The engines set `open_model` when the requests were scheduled at a rate.
+    Use it when every sample is needed, the `HistogramRecorder` otherwise.
+    """
+
+    def __init__(self) -> None:
+        self.open_model = False
+        self.timestamps = array("d")
+        self.latencies = array("d")
+        self.send_delays = array("d")
+        self.phase_columns = {phase: array("d") for phase in PHASES}
+        self.size_column = array("d")
+        self.status_codes = array("H")
+        self.errors: collections.Counter[str] = collections.Counter()
+        self.connections: collections.Counter[str] = collections.Counter()
+        self.client_cpu = 0.0
+        self.error_bodies = ErrorBodies()
+        self.transfer = Transfer()
+
+    def record(self, result: dict[str, int | float]) -> None:
+        """Record the result of a request, as returned by the engines."""
+        self.timestamps.append(result.get("timestamp", 0.0))
+        self.latencies.append(result["elapsed_time"])
+        self.send_delays.append(result.get("send_delay", math.nan))
+        for phase, column in self.phase_columns.items():
+            if phase == "connect_time" and not result.get("new_connection"):
+                column.append(math.nan)
+            else:
+                column.append(result.get(phase, math.nan))
+        self.size_column.append(result["response_size"] if "response_size" in result else math.nan)
+        self.transfer.record(result)
+        if "error" in result:
+            self.status_codes.append(0)
+            self.errors[ERRORS[int(result["error"])]] += 1
+        else:
+            self.status_codes.append(int(result["status_code"]))
+        if "new_connection" in result:
+            self.connections["new" if result["new_connection"] else "reused"] += 1
+        self.client_cpu += result.get("client_cpu", 0.0)
+
+    def merge(self, other: "SamplesRecorder") -> None:
+        """Add the results recorded by another recorder."""
+        self.open_model = self.open_model or other.open_model
+        self.timestamps.extend(other.timestamps)
+        self.latencies.extend(other.latencies)
+        self.send_delays.extend(other.send_delays)
+        for phase, column in other.phase_columns.items():
+            self.phase_columns[phase].extend(column)
+        self.size_column.extend(other.size_column)
+        self.status_codes.extend(other.status_codes)
+        self.errors.update(other.errors)
+        self.connections.update(other.connections)
+        self.client_cpu += other.client_cpu
+        self.error_bodies.merge(other.error_bodies)
+        self.transfer.merge(other.transfer)
+
+    def __len__(self) -> int:
+        return len(self.latencies)
+
+    @property
+    def duration(self) -> float:
+        """Seconds from the first request sent to the last response received."""
+        if not self.timestamps:
+            return 0.0
+        if np is not None:
+            timestamps = np.frombuffer(self.timestamps, dtype=np.float64)
+            ends = timestamps + np.frombuffer(self.latencies, dtype=np.float64)
+            return float(ends.max() - timestamps.min())
+        return max(map(sum, zip(self.timestamps, self.latencies))) - min(self.timestamps)
+
+    @property
+    def throughput(self) -> float:
+        """Successful requests per second over the duration of the run."""
+        return self.successes.count / self.duration if self.duration else 0.0
+
+    def _success_mask(self) -> typing.Any:
+        if np is not None:
+            codes = np.frombuffer(self.status_codes, dtype=np.uint16)
+            return (codes >= 200) & (codes < 300)
+        return [200 <= code < 300 for code in self.status_codes]
+
+    def _select(self, column: array, mask: typing.Any) -> typing.Any:
+        if np is not None:
+            return np.frombuffer(column, dtype=np.float64)[mask]
+        return itertools.compress(column, mask)
+
+    @property
+    def successes(self) -> LatencySamples:
+        """Latencies of the successful (2xx) requests."""
+        return LatencySamples(self._select(self.latencies, self._success_mask()))
+
+    @property
+    def phases(self) -> dict[str, LatencySamples]:
+        """Durations of each phase of the successful requests, not measured ones excluded."""
+        mask = self._success_mask()
+        phases = {}
+        for phase, column in self.phase_columns.items():
+            durations = self._select(column, mask)
+            if np is not None:
+                durations = durations[~np.isnan(durations)]
+            else:
+                durations = (t for t in durations if not math.isnan(t))
+            phases[phase] = LatencySamples(durations)
+        return phases
+
+    @property
+    def sizes(self) -> LatencySamples:
+        """Sizes of the bodies of the responses in bytes, requests without response excluded."""
+        if np is not None:
+            sizes = np.frombuffer(self.size_column, dtype=np.float64)
+            return LatencySamples(sizes[~np.isnan(sizes)])
+        return LatencySamples(size for size in self.size_column if not math.isnan(size))
+
+    @property
+    def series(self) -> TimeSeries:
+        """The requests second by second, computed from the samples."""
+        series = TimeSeries()
+        for timestamp, latency, status_code in zip(self.timestamps, self.latencies, self.status_codes):
+            if not timestamp:
+                continue
+            series.record(timestamp + latency, latency, 200 <= status_code < 300)
+        return series
+
+    @property
+    def failures_status_codes(self) -> collections.Counter[int]:
+        """Number of failed requests by status code, those which got no response excluded."""
+        if np is not None:
+            codes = np.frombuffer(self.status_codes, dtype=np.uint16)[~self._success_mask()]
+            values, counts = np.unique(codes[codes != 0], return_counts=True)
+            return collections.Counter(dict(zip(values.tolist(), counts.tolist())))
+        return collections.Counter(code for code in self.status_codes if code and not 200 <= code < 300)
+
+    def corrected(self, expected_interval: float) -> LatencySamples:
+        """Latencies of the successful requests corrected for coordinated omission.
+
+        Open-model latencies are measured from the intended send time, otherwise
+        they are backfilled with the expected interval in seconds.
+        """
+        mask = self._success_mask()
+        latencies = self._select(self.latencies, mask)
+        if not self.open_model:
+            return LatencySamples(latencies).corrected(expected_interval)
+        # NOTE mad: the steps of an open-model journey after the first one have no intended send time
+        send_delays = self._select(self.send_delays, mask)
+        if np is not None:
+            return LatencySamples(latencies + np.nan_to_num(send_delays, nan=0.0))
+        return LatencySamples(
+            latency + (0.0 if math.isnan(delay) else delay) for latency, delay in zip(latencies, send_delays)
+        )
+
+
+Latencies = LatencyHistogram | LatencySamples
+Recorder = HistogramRecorder | SamplesRecorder
+
+RECORDERS: dict[str, typing.Type[HistogramRecorder] | typing.Type[SamplesRecorder]] = {
+    "histogram": HistogramRecorder,
+    "samples": SamplesRecorder,
+}
+
+
+###################
+# LIVE
+###################
+
+
+# NOTE mad: the live statistics are published every LIVE_TICK seconds and rolled over the
+# last LIVE_WINDOW complete seconds, slower requests all fall in the last bucket
+LIVE_TICK = 1.0
+LIVE_WINDOW = 10
+LIVE_MAX_LATENCY = 60.0
+
+
+def live_histogram() -> LatencyHistogram:
+    """Return an empty histogram of the latencies shown live."""
+    return LatencyHistogram(LIVE_MAX_LATENCY)
+
+
+@dataclass
+class LiveSnapshot:
+    """What the live dashboard shows of an endpoint at some point of a run.
+
+    Snapshots of the same endpoint taken in different processes can be merged.
+
+    Attributes:
+        in_flight (int): The number of requests sent and not answered yet.
+        rps (int): The number of requests answered during the last complete second.
+        requests (int): The number of requests answered over the window.
+        failures (int): The number of failed requests over the window.
+        successes (LatencyHistogram): The latencies of the successful requests over the window.
+    """
+
+    in_flight: int = 0
+    rps: int = 0
+    requests: int = 0
+    failures: int = 0
+    successes: LatencyHistogram = field(default_factory=live_histogram)
+
+    def merge(self, other: "LiveSnapshot") -> None:
+        """Add the statistics of another snapshot of the endpoint."""
+        self.in_flight += other.in_flight
+        self.rps += other.rps
+        self.requests += other.requests
+        self.failures += other.failures
+        self.successes.merge(other.successes)
+
+    @property
+    def error_rate(self) -> float:
+        """Share of failed requests over the window, in %."""
+        return self.failures / self.requests * 100 if self.requests else 0.0
+
+
+@dataclass
+class LiveSlot:
+    """The requests answered during one second of a run, as counted by `LiveStats`."""
+
+    second: int
+    requests: int = 0
+    failures: int = 0
+    successes: LatencyHistogram = field(default_factory=live_histogram)
+
+
+class LiveStats:
+    """Rolling statistics of the requests sent to an endpoint, cheap enough to be updated on each request.
+
+    Answered requests are counted in one slot per second and snapshots only read the slots of
+    the complete seconds, which are not written anymore, so that they can be taken from another
+    thread without holding the lock of the recording ones. Sent requests are counted with
+    `itertools.count`, whose increment is atomic, so that users do not take a lock to send.
+    """
+
+    def __init__(self) -> None:
+        self.slots: collections.deque[LiveSlot] = collections.deque(maxlen=LIVE_WINDOW + 1)
+        self.started = itertools.count()
+        self.started_reads = 0
+        self.finished = 0
+
+    def start(self) -> None:
+        """Count a request sent, from any thread."""
+        next(self.started)
+
+    def record(self, result: dict[str, int | float]) -> None:
+        """Count a request answered, from one thread at a time."""
+        self.finished += 1
+        second = int(time.monotonic())
+        if not self.slots or self.slots[-1].second != second:
+            self.slots.append(LiveSlot(second))
+        slot = self.slots[-1]
+        slot.requests += 1
+        if result["success"]:
+            slot.successes.record(result["elapsed_time"])
+        else:
+            slot.failures += 1
+
+    def snapshot(self) -> LiveSnapshot:
+        """Return the statistics of the last complete seconds, from a single thread."""
+        finished = self.finished
+        # NOTE mad: reading the counter increments it, so the reads are subtracted
+        started = next(self.started) - self.started_reads
+        self.started_reads += 1
+
+        second = int(time.monotonic())
+        snapshot = LiveSnapshot(in_flight=max(started - finished, 0))
+        for slot in list(self.slots):
+            if not second - LIVE_WINDOW <= slot.second < second:
+                continue
+            snapshot.requests += slot.requests
+            snapshot.failures += slot.failures
+            snapshot.successes.merge(slot.successes)
+            if slot.second == second - 1:
+                snapshot.rps = slot.requests
+        return snapshot
@@ -1,14 +1,16 @@
 """Represent all data conveied by the manifest."""
 
+import copy
 from dataclasses import dataclass, field
 import enum
 import os
 import http
 from typing import Any
-from urllib.parse import urlparse
+from urllib.parse import unquote, urlparse
 import re
 import typing
 import itertools
+import math
 
 from django.utils.http import urlencode
 from django.urls.exceptions import NoReverseMatch
@@ -35,6 +37,10 @@ class RawManifestDict(typing.TypedDict, total=False):
     scenes: typing.List[dict]
     manifest_origin: str
     ttype: str
+    load: dict
+    set_up_user: typing.Sequence[dict]
+    feeders: dict[str, str]
+    abort: dict
 
 
 class ManifestDict(typing.TypedDict):
@@ -46,6 +52,10 @@ class ManifestDict(typing.TypedDict):
     set_up_class: typing.Sequence[str | dict]
     set_up: typing.Sequence[str | dict]
     ttype: typing.Optional[str]
+    load: typing.NotRequired[typing.Optional[dict]]
+    set_up_user: typing.NotRequired[typing.Sequence[str | dict]]
+    feeders: typing.NotRequired[dict[str, str]]
+    abort: typing.NotRequired[typing.Optional[dict]]
 
 
 ########################
@@ -131,6 +141,18 @@ class DomArgument(enum.Enum):
     ATTRIBUTE = "attribute"
 
 
+######
+# LOAD
+######
+
+
+class LoadExecutor(enum.Enum):
+    """What the stages of Manifest["load"] set the target of."""
+
+    USERS = "users"
+    RPS = "rps"
+
+
 ##########################
 # SET UP TEST DATA, SET UP
 ##########################
@@ -206,6 +228,69 @@ class Case:
         return cls(case_id, items)
 
 
+##########################
+# SERVICE LEVEL OBJECTIVES
+##########################
+
+
+@dataclass(frozen=True)
+class SLO:
+    """Store the service level objectives a scene should meet under load.
+
+    Attributes:
+        percentiles (dict[float, float]): The maximum latency in ms by percentile, e.g. {95: 300}.
+        max_error_rate (float | None): The maximum share of failed requests, in %.
+        min_throughput (float | None): The minimum number of successful requests per second.
+
+    Class Methods:
+        from_dict(d: dict) -> SLO:
+            Create a SLO instance from a dict such as {p95: 300, max_error_rate: 1, min_throughput: 50}.
+    """
+
+    percentiles: dict[float, float] = field(default_factory=dict)
+    max_error_rate: float | None = None
+    min_throughput: float | None = None
+
+    regex_percentile = re.compile(r"^p(?P<percentile>\d{1,2}(?:\.\d+)?)$")
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "SLO":
+        """Return the objectives from a dict, percentiles being given as `p<percentile>` keys."""
+        percentiles: dict[float, float] = {}
+        others: dict[str, typing.Any] = {}
+        for key, value in d.items():
+            if not isinstance(value, (int, float)) or isinstance(value, bool) or value < 0:
+                raise ValueError(f"SLO '{key}' should be a non-negative number not '{value}'")
+            if re_match := re.match(cls.regex_percentile, key):
+                percentiles[float(re_match["percentile"])] = float(value)
+            elif key in ("max_error_rate", "min_throughput"):
+                others[key] = float(value)
+            else:
+                raise ValueError(f"Invalid SLO key '{key}'")
+        return cls(percentiles, **others)
+
+    @classmethod
+    def from_steps(cls, steps: typing.Sequence["SLO"]) -> "SLO":
+        """Return the objectives of a journey from those of its steps.
+
+        The latency of a journey sums those of its steps, so its targets are the sums of
+        theirs, for the percentiles all the steps declare. A journey fails at its first failed
+        step, so its maximum error rate sums theirs, when all declare one. Throughput is left out.
+        """
+        percentiles = {
+            p: sum(step.percentiles[p] for step in steps)
+            for p in steps[0].percentiles
+            if all(p in step.percentiles for step in steps)
+        }
+        error_rates = [step.max_error_rate for step in steps if step.max_error_rate is not None]
+        max_error_rate = min(sum(error_rates), 100.0) if len(error_rates) == len(steps) else None
+        return cls(percentiles, max_error_rate)
+
+
+# NOTE mad: the objectives of the scenes which do not declare any
+DEFAULT_SLO = SLO(percentiles={95: 500, 99: 5000})
+
+
 ########################
 # SCENES
 ########################
@@ -240,6 +325,61 @@ class Substituable:
                 return field_value
 
 
+@dataclass(frozen=True)
+class Feedable:
+    """Represent the field which need to be replaced by some value read by a feeder, for each virtual user of a load test."""
+
+    field_repr: str
+    regex_field = re.compile(r"^(?P<feeder>[a-z_]+)(?::(?P<field_name>\w+))?$")
+
+    def __post_init__(self) -> None:
+        if not re.match(self.regex_field, self.field_repr):
+            raise ValueError(f"Invalid field representation '{self.field_repr}'")
+
+    @property
+    def feeder(self) -> str:
+        """The name of the feeder the field is read from."""
+        return self.field_repr.partition(":")[0]
+
+    def feed(self, records: typing.Mapping[str, dict]) -> Any:
+        """Return the value of the record of the feeder, or the whole record, based on the field representation."""
+        feeder, _, field_name = self.field_repr.partition(":")
+        if not field_name:
+            return records[feeder]
+        return records[feeder][field_name]
+
+
+def feed_recursively(x: typing.Any, records: typing.Mapping[str, dict]) -> typing.Any:
+    """Replace the `Feedable` fields of a data structure by the values of the records."""
+    match x:
+        case Feedable():
+            return x.feed(records)
+        case dict(_):
+            return {key: feed_recursively(value, records) for key, value in x.items()}
+        case list(_):
+            return [feed_recursively(value, records) for value in x]
+        case _:
+            return x
+
+
+def iter_feedables(x: typing.Any) -> typing.Iterator[Feedable]:
+    """Yield the `Feedable` fields of a data structure."""
+    match x:
+        case Feedable():
+            yield x
+        case dict(_):
+            for value in x.values():
+                yield from iter_feedables(value)
+        case list(_) | tuple(_):
+            for value in x:
+                yield from iter_feedables(value)
+
+
+def has_feedable(x: typing.Any) -> bool:
+    """Whether a data structure holds `Feedable` fields."""
+    return next(iter_feedables(x), None) is not None
+
+
 @dataclass
 class Directive:
     """Store a given check to perform, before the substitution (this is part of a Scene, not a Take).
@@ -326,6 +466,8 @@ class Scene:
         data (dict[str, Any]): The data to be sent with the request.
         query_parameters (dict): Query parameters for the URL.
         url_parameters (dict): URL parameters for reverse URL lookup.
+        slo (SLO | None): The objectives of the scene under load.
+        weight (float): How often the scene is picked, relatively to the others, when mixed in a load test.
 
     Methods:
         shoot(case: Case) -> Take:
@@ -345,10 +487,14 @@ class Scene:
     query_parameters: dict = field(default_factory=dict)
     url_parameters: dict = field(default_factory=dict)
     actions: typing.Optional[list[SetUpInstruction]] = field(default_factory=list)
+    slo: SLO | None = None
+    weight: float = 1
 
 
     def __post_init__(self) -> None:
         self.method = http.HTTPMethod(self.method)
+        if not isinstance(self.weight, (int, float)) or self.weight <= 0:
+            raise ValueError(f"Scene weight should be a positive number not '{self.weight}'")
         # At this point we don't check url as we wait for subsitution
         # potentially occuring through data/query_parameters/url_parameters
 
@@ -356,6 +502,8 @@ class Scene:
     def from_dict(cls, d: dict) -> "Scene":
         """Return a scene from a dict."""
         d["directives"] = [Directive.from_dict(directive) for directive in d["directives"]]
+        if "slo" in d:
+            d["slo"] = SLO.from_dict(d["slo"])
         return cls(**d)
 
     @classmethod
@@ -368,6 +516,9 @@ class Scene:
                 return x
             case Substituable(_):
                 return x.shoot(case)
+            case Feedable(_):
+                # NOTE mad: fed for each virtual user, see `Take.feed`
+                return x
             case Directive(instruction, args):
                 return Check(instruction, cls.substitute_recursively(args, case))
             case dict(_):
@@ -386,9 +537,166 @@ class Scene:
             data=self.substitute_recursively(self.data, case),
             url_parameters=self.substitute_recursively(self.url_parameters, case),
             checks=self.substitute_recursively(self.directives, case),
+            slo=self.slo,
+            weight=self.weight,
         )
 
 
+################
+# LOAD PROFILE
+################
+
+
+@dataclass(frozen=True)
+class LoadStage:
+    """Store a stage of a load profile.
+
+    The target is reached linearly by the end of the stage, starting from the target
+    of the previous stage (0 for the first one). A ramp-up, a hold and a ramp-down
+    are therefore three stages with targets N, N and 0.
+
+    Attributes:
+        duration (float): The duration of the stage in seconds.
+        target (float): The number of users or requests per second at the end of the stage.
+    """
+
+    duration: float
+    target: float
+
+    regex_duration = re.compile(r"^(?P<value>\d+(?:\.\d+)?)\s*(?P<unit>ms|s|m|h)?$")
+    units = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+
+    @classmethod
+    def parse_duration(cls, x: int | float | str) -> float:
+        """Return a duration in seconds from a number of seconds or a string such as '90s', '5m' or '1h'."""
+        match x:
+            case bool(_):
+                raise TypeError(f"Cannot interpret '{x}' as a duration")
+            case int(n) | float(n):
+                duration = float(n)
+            case str(s) if re_match := re.match(cls.regex_duration, s.strip()):
+                duration = float(re_match["value"]) * cls.units[re_match["unit"] or "s"]
+            case _:
+                raise ValueError(f"Cannot interpret '{x}' as a duration")
+        if duration <= 0:
+            raise ValueError(f"Stage duration should be positive not '{x}'")
+        return duration
+
+    @classmethod
+    def from_dict(cls, d: dict) -> typing.Tuple[LoadExecutor, "LoadStage"]:
+        """Return a stage and what its target is from a dict such as {duration: 5m, users: 20}."""
+        if "duration" not in d:
+            raise ValueError(f"Load stage without duration\n{d}")
+        targets = {key: value for key, value in d.items() if key != "duration"}
+        executor, target = SingleKeyDict(targets).as_tuple()
+        if not isinstance(target, (int, float)) or target < 0:
+            raise ValueError(f"Load stage target should be a non-negative number not '{target}'")
+        return LoadExecutor(executor), cls(cls.parse_duration(d["duration"]), float(target))
+
+
+@dataclass(frozen=True)
+class LoadProfile:
+    """Store how the load evolves over wall-clock time during a load test.
+
+    Attributes:
+        executor (LoadExecutor): Whether stages target a number of concurrent users
+            (closed model) or of requests per second (open model).
+        stages (list[LoadStage]): The stages, run one after the other.
+        users (int): The maximum number of concurrent users. For the rps executor,
+            these are the users available to send the scheduled requests.
+
+    Class Methods:
+        from_dict(d: dict) -> LoadProfile:
+            Create a LoadProfile instance from the `load` section of a manifest.
+    """
+
+    executor: LoadExecutor
+    stages: list[LoadStage]
+    users: int
+
+    @property
+    def duration(self) -> float:
+        """The total duration of the profile in seconds."""
+        return sum(stage.duration for stage in self.stages)
+
+    def target_at(self, elapsed: float) -> float:
+        """Return the target after `elapsed` seconds, 0 once the profile is over."""
+        previous = 0.0
+        for stage in self.stages:
+            if elapsed < stage.duration:
+                return previous + (stage.target - previous) * elapsed / stage.duration
+            elapsed -= stage.duration
+            previous = stage.target
+        return 0.0
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "LoadProfile":
+        """Return a load profile from a dict such as {users: 50, stages: [{duration: 30s, rps: 100}]}.
+
+        The number of users defaults to the highest target, rounded up.
+        """
+        if not set(d.keys()) <= {"stages", "users"}:
+            raise ValueError(f"Invalid key(s) in load section {d.keys()}")
+        if not d.get("stages"):
+            raise ValueError("Load section without stages")
+
+        executors, stages = zip(*(LoadStage.from_dict(stage) for stage in d["stages"]))
+        if len(set(executors)) > 1:
+            raise ValueError("Load stages should all target either users or rps")
+
+        users = d.get("users", math.ceil(max(stage.target for stage in stages)))
+        if not isinstance(users, int) or users <= 0:
+            raise ValueError(f"Load users should be a positive integer not '{users}'")
+        return cls(executors[0], list(stages), users)
+
+
+@dataclass(frozen=True)
+class AbortPolicy:
+    """Store the limits beyond which a load run is stopped before its end.
+
+    The limits are checked against the requests of a sliding window covering the
+    last `duration` seconds, once the run lasted that long.
+
+    Attributes:
+        duration (float): For how long, in seconds, the limits should be crossed.
+        percentiles (dict[float, float]): The maximum latency in ms by percentile, e.g. {99: 2000}.
+        max_error_rate (float | None): The maximum share of failed requests, in %.
+        min_requests (int): The minimum number of requests in the window to check the limits.
+
+    Class Methods:
+        from_dict(d: dict) -> AbortPolicy:
+            Create an AbortPolicy instance from the `abort` section of a manifest.
+    """
+
+    duration: float = 10.0
+    percentiles: dict[float, float] = field(default_factory=dict)
+    max_error_rate: float | None = None
+    min_requests: int = 10
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "AbortPolicy":
+        """Return an abort policy from a dict such as {for: 10s, max_error_rate: 50, p99: 2000}."""
+        percentiles: dict[float, float] = {}
+        others: dict[str, typing.Any] = {}
+        for key, value in d.items():
+            if key == "for":
+                others["duration"] = LoadStage.parse_duration(value)
+                continue
+            if not isinstance(value, (int, float)) or isinstance(value, bool) or value < 0:
+                raise ValueError(f"Abort '{key}' should be a non-negative number not '{value}'")
+            if re_match := re.match(SLO.regex_percentile, key):
+                percentiles[float(re_match["percentile"])] = float(value)
+            elif key == "max_error_rate":
+                others[key] = float(value)
+            elif key == "min_requests":
+                others[key] = int(value)
+            else:
+                raise ValueError(f"Invalid abort key '{key}'")
+        if not percentiles and "max_error_rate" not in others:
+            raise ValueError("Abort section without limit")
+        return cls(percentiles=percentiles, **others)
+
+
 ################
 # MANIFEST
 ################
@@ -407,6 +715,11 @@ class Manifest:
         scenes (list[Scene]): The scenes to be executed.
         cases (dict[str, Case]): The test cases, indexed by case ID.
         manifest_origin (str): The origin of the manifest file.
+        load (LoadProfile | None): How the load evolves over time when run as a load test.
+        set_up_user (list[SetUpInstruction]): Instructions run for each virtual user of a load test.
+        feeders (dict[str, str]): The paths of the CSV or JSON lines files giving each virtual user
+            its own record, by name, relative to the manifest.
+        abort (AbortPolicy | None): When to stop a load test before its end.
 
     Class Methods:
         from_formatted_dict(d: dict) -> Manifest:
@@ -419,10 +732,23 @@ class Manifest:
     cases: dict[str, Case]
     manifest_origin: str
     ttype: str | None
+    load: LoadProfile | None = None
+    set_up_user: list[SetUpInstruction] = field(default_factory=list)
+    feeders: dict[str, str] = field(default_factory=dict)
+    abort: AbortPolicy | None = None
 
     @classmethod
     def from_formatted_dict(cls, d: ManifestDict) -> "Manifest":
-        """Return a manifest from a dict with expected keys."""
+        """Return a manifest from a dict with expected keys.
+
+        Raises:
+            ValueError: If a `!feed` field refers to a feeder not declared under `feeders`.
+        """
+        feeders = d.get("feeders", {})
+        for feedable in iter_feedables([d["scenes"], d.get("set_up_user", [])]):
+            if feedable.feeder not in feeders:
+                raise ValueError(f"'!feed {feedable.field_repr}' refers to the feeder '{feedable.feeder}', not declared under feeders")
+
         return cls(
             [
                 SetUpInstruction.from_object(instruction)
@@ -445,7 +771,14 @@ class Manifest:
             },
             # d[ManifestFormattedDictKeys.manifest_origin],
             d["manifest_origin"],
-            d.get("ttype")
+            d.get("ttype"),
+            LoadProfile.from_dict(load) if (load := d.get("load")) else None,
+            [SetUpInstruction.from_object(instruction) for instruction in d.get("set_up_user", [])],
+            {
+                name: os.path.join(os.path.dirname(d["manifest_origin"]), path)
+                for name, path in feeders.items()
+            },
+            AbortPolicy.from_dict(abort) if (abort := d.get("abort")) else None,
         )
     
     def iter_on_takes(
@@ -535,10 +868,14 @@ class Take:
         data (dict): The data to be sent with the request.
         query_parameters (dict): Query parameters for the URL.
         url_parameters (dict): URL parameters used in URL resolution.
+        slo (SLO | None): The objectives of the request under load.
+        weight (float): How often the request is picked when mixed in a load test.
 
     Notes:
         The `url` is expected to be either a valid URL or a registered viewname.
         If it's a viewname, it will be resolved using Django's `reverse` function.
+        When the url or query parameters hold `Feedable` fields, the URL is only built
+        once they are fed, the take showing the fields in its `url` meanwhile.
     """
 
     method: http.HTTPMethod
@@ -547,23 +884,57 @@ class Take:
     data: dict
     query_parameters: dict
     url_parameters: dict
+    slo: SLO | None = None
+    weight: float = 1
 
     def __post_init__(self) -> None:
         self.method = http.HTTPMethod(self.method)
 
+        self.url_template = self.url
+        if has_feedable(self.url_parameters) or has_feedable(self.query_parameters):
+            # NOTE mad: the url is built by `feed` for each virtual user, meanwhile the fields
+            # to feed are shown in it, so that the results of all the users share the endpoint
+            path = self.url if has_feedable(self.url_parameters) else self.resolve(self.url_parameters)
+            query = {
+                name: f"{{{value.field_repr}}}" if isinstance(value, Feedable) else value
+                for name, value in self.query_parameters.items()
+            }
+            self.url = path + ("?" + unquote(urlencode(query)) if query else "")
+        else:
+            self.url = self.resolve(self.url_parameters, self.query_parameters)
+        self.endpoint_url = self.url
+
+    def resolve(self, url_parameters: dict, query_parameters: dict | None = None) -> str:
+        """Return the URL of the take with its url and query parameters."""
         try:
             # First we try if the url is a django viewname
-            url_name = self.url
-            self.url = reverse(self.url, kwargs=self.url_parameters)
-            self.url_name = url_name
+            url = reverse(self.url_template, kwargs=url_parameters)
+            self.url_name = self.url_template
         except NoReverseMatch:
             # Otherwise we check it is a valid url
-            parsed = urlparse(self.url)
+            url = self.url_template
+            parsed = urlparse(url)
             if not (parsed.scheme and parsed.netloc):
-                raise ValueError(f"'{self.url}' could not be reversed and is not a valid url")
+                raise ValueError(f"'{url}' could not be reversed and is not a valid url")
 
-        if self.query_parameters:
+        if query_parameters:
             # NOTE mad: We use http.urlencode instead for compatibility
             # https://stackoverflow.com/questions/4995279/including-a-querystring-in-a-django-core-urlresolvers-reverse-call
             # https://gist.github.com/benbacardi/227f924ec1d9bedd242b
-            self.url += "?" + urlencode(self.query_parameters)
+            url += "?" + urlencode(query_parameters)
+        return url
+
+    @property
+    def endpoint(self) -> str:
+        """The method and url of the take, which identify its results in load tests, fed or not."""
+        return f"{self.method} {self.endpoint_url}"
+
+    def feed(self, records: typing.Mapping[str, dict]) -> "Take":
+        """Return a copy of the take whose data, url and query parameters are fed with the records of a virtual user."""
+        take = copy.copy(self)
+        take.data = feed_recursively(self.data, records)
+        if has_feedable(self.url_parameters) or has_feedable(self.query_parameters):
+            take.url_parameters = feed_recursively(self.url_parameters, records)
+            take.query_parameters = feed_recursively(self.query_parameters, records)
+            take.url = take.resolve(take.url_parameters, take.query_parameters)
+        return take
@@ -85,7 +85,11 @@ class ManifestParser:
             "scenes": ManifestParser._format_dict_scenes(d),
             "cases": ManifestParser._format_dict_cases(d),
             "manifest_origin": d["manifest_origin"],
-            "ttype": d.get("ttype")
+            "ttype": d.get("ttype"),
+            "load": d.get("load"),
+            "set_up_user": d.get("set_up_user", []),
+            "feeders": d.get("feeders", {}),
+            "abort": d.get("abort"),
         }
 
     @staticmethod
@@ -164,6 +168,15 @@ class ManifestParser:
         else:
             raise ConstructorError
 
+    @staticmethod
+    def _yaml_constructor_feed(
+        loader: yaml.SafeLoader, node: yaml.nodes.Node
+    ) -> scenery.manifest.Feedable:
+        if isinstance(node, yaml.nodes.ScalarNode):
+            return scenery.manifest.Feedable(loader.construct_scalar(node))
+        else:
+            raise ConstructorError
+
     @staticmethod
     def _yaml_constructor_common_item(loader: yaml.SafeLoader, node: yaml.nodes.Node) -> dict:
         if isinstance(node, yaml.nodes.ScalarNode):
@@ -183,7 +196,7 @@ class ManifestParser:
         """
         Read a YAML manifest stream with custom tags.
 
-        This method uses a custom YAML loader to handle special tags like !case and !common-item.
+        This method uses a custom YAML loader to handle special tags like !case, !common-item and !feed.
 
         Args:
             stream(str | StringIO): The stream of the YAML manifest to read.
@@ -197,6 +210,7 @@ class ManifestParser:
         Loader = yaml.FullLoader
         Loader.add_constructor("!case", ManifestParser._yaml_constructor_case)
         Loader.add_constructor("!common-item", ManifestParser._yaml_constructor_common_item)
+        Loader.add_constructor("!feed", ManifestParser._yaml_constructor_feed)
 
         # with open(filename) as f:
         #     content = yaml.load(f, Loader)
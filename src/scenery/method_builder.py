@@ -3,14 +3,13 @@ import collections
 import os
 import requests
 from typing import Callable
-import threading
-import time
-import http
 
 from scenery import logger
 from scenery.manifest import SetUpInstruction, Take, DirectiveCommand
 from scenery.response_checker import Checker, ResponseProtocol
 from scenery.set_up_handler import SetUpHandler
+from scenery.load_engine import ENGINES
+from scenery.load_metrics import RECORDERS
 from scenery.common import (
     SceneryTestCase,
     DjangoBackendTestCase,
@@ -160,7 +159,7 @@ class MethodBuilder:
             if isinstance(testcase, (DjangoFrontendTestCase,)) :
                 testcase.base_url = testcase.live_server_url
             if isinstance(testcase, (LoadTestCase,)):
-                testcase.data = collections.defaultdict(list)
+                testcase.data = collections.defaultdict(RECORDERS[testcase.store])
 
 
             for instruction in instructions:
@@ -185,7 +184,6 @@ class MethodBuilder:
         Returns:
             function: A test method that can be added to a Django test case.
         """
-
         # print("ON EST AL")
 
         def test(testcase: SceneryTestCase) -> None:
@@ -221,78 +219,49 @@ class MethodBuilder:
         return test
 
     @staticmethod
-    def build_test_load(take: Take) -> Callable:
-        def test(testcase: LoadTestCase) -> None:
-            
-            lock = threading.Lock()  # Thread synchronization
-
-            def make_request(testcase: LoadTestCase, session: requests.Session, take: Take, headers: dict[str, str]) -> dict[str, int|float]:
-                """Execute a single request and return response time and status"""
-
-                start_time = time.time()
-
-                if take.method == http.HTTPMethod.GET:
-                    response = session.get(
-                        testcase.base_url + take.url,
-                        data=take.data,
-                        headers=headers,
-                    )
-                elif take.method == http.HTTPMethod.POST:
-                    response = session.post(
-                        testcase.base_url + take.url,
-                        take.data,
-                        headers=headers,
-                    )
-                else:
-                    raise NotImplementedError(take.method)
+    def build_test_load(takes: list[Take], journey: str | None = None) -> Callable:
+        """Build a load test method from Take objects.
 
-                        
-                elapsed_time = time.time() - start_time
+        The returned test sends `requests_per_user` requests for each of the `users`,
+        or follows the stages of the load profile of the manifest, with the engine
+        selected on the test case, and collects the results in `testcase.data`.
+        When several takes are given, each request picks one of them by weight.
 
-                # print(response.status_code)
-
-
-                if not (200 <= response.status_code < 300):
-                    logger.warning(f"{response.status_code=}")
-                    logger.debug(f"{response.content.decode("utf8")=}")
-                return {
-                    'elapsed_time': elapsed_time,
-                    'status_code': response.status_code,
-                    'success': 200 <= response.status_code < 300
-                }
+        Args:
+            takes (list[scenery.manifest.Take]): The requests to send repeatedly.
+            journey (str | None): If given, each user walks through the takes in order
+                instead, and the end-to-end results are recorded under this name.
 
-            def _worker_task(testcase: LoadTestCase, take: Take, num_requests: int) -> None:
-                """Worker function executed by each thread"""
-                for _ in range(num_requests):
-                    result = make_request(testcase, testcase.session, take, testcase.headers)
-                    
-                    with lock:
-                        testcase.data[take.url].append(result)
+        Returns:
+            function: A test method that can be added to a LoadTestCase.
+        """
+        def test(testcase: LoadTestCase) -> None:
 
-            # logger.info(f"{ramp_up=}")
+            logger.info(f"{testcase.engine=}")
+            logger.info(f"{testcase.store=}")
             logger.info(f"{testcase.users=}")
-            logger.info(f"{testcase.requests_per_user=}")
-            logger.info(f"{take.url=}")
-            logger.info(f"{take.method=}")
-            logger.info(f"{take.data=}")
-
-            # Create threads for each simulated user
-            threads = []
-            for i in range(testcase.users):
-                thread = threading.Thread(
-                    target=_worker_task,
-                    args=(testcase, take, testcase.requests_per_user),
-                )
-                threads.append(thread)
-
-                # Optional: implement ramp-up by staggering thread starts
-                thread.start()
-                # if ramp_up > 0 and users > 1:
-                #     time.sleep(ramp_up / (users - 1))
-
-            # Wait for all threads to complete
-            for thread in threads:
-                thread.join()
-
-
-        return test
\ No newline at end of file
+            if testcase.load_profile:
+                logger.info(f"{testcase.load_profile=}")
+            else:
+                logger.info(f"{testcase.requests_per_user=}")
+            if testcase.rate:
+                logger.info(f"{testcase.rate=}")
+                logger.info(f"{testcase.arrival=}")
+            if journey:
+                logger.info(f"{journey=}")
+                logger.info(f"{testcase.think_time=}")
+            for take in takes:
+                logger.info(f"{take.url=}")
+                logger.info(f"{take.method=}")
+                logger.info(f"{take.data=}")
+                if len(takes) > 1 and not journey:
+                    logger.info(f"{take.weight=}")
+
+            engine = ENGINES[testcase.engine](testcase, takes, journey)
+            with engine.logging_requests(), engine.publishing():
+                engine.run()
+            testcase.abort_reason = engine.watchdog.reason
+            if testcase.abort_reason:
+                logger.warning(f"Load test aborted: {testcase.abort_reason}")
+
+        return test